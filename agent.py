@@ -6,30 +6,86 @@ import sys
 import uuid
 import weakref
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-import pystache
 import pytz
 from blinker import signal
 from tzlocal import get_localzone
 
 from agent_events import AgentEvents
+from command_router import command_router
 from event_queue import EventQueue
 from event_stream import EventStream
 from llm import LLMRequest
 from memory import Memory, MemoryStore
-from prompt import PromptTemplate
+from prompt import PromptTemplate, render_template
 from code_changes import HypotheticalScenario
 
 TIME_UPDATE_INTERVAL_SECONDS = 0.2
 MAX_PERCEPT_HISTORY_COUNT = 800
 
+# Prompt and memory templates. Kept at module level so that they're parsed once and
+# shared, rather than rebuilt on every turn. See prompt.compile_template().
+
+USER_MSG_MEMORY_TEMPLATE = \
+"""
+The user sent you this message:
+'''{{ Message }}'''
+
+User metadata:
+
+{{ UserInfo }}
+
+Time metadata:
+
+{{ TimeInfo }}
+"""
+
+RESPONSE_MEMORY_TEMPLATE = \
+"""
+You responded:
+'''{{ Message }}'''
+
+User metadata:
+
+{{ UserInfo }}
+
+Time metadata:
+
+{{ TimeInfo }}
+"""
+
+CHAT_SYSTEM_TEMPLATE = \
+"""
+You are AISH, a conversational AI agent. You are interacting with a user. You
+are implemented as a software system, of which LLMs are one part. You also have a memory
+that is a separate subcomponent independent of LLMs.
+
+"""
+
+CHAT_USER_TEMPLATE = \
+"""
+User metadata:
+
+{{ UserInfo }}
+
+The user sent you this message:
+'''{{ Message }}'''
+
+Time metadata:
+
+{{ TimeInfo }}
+
+Respond to the user's message.
+"""
+
 class Agent:
     def __init__(self, memory_filename="memory.json", percept_filename="agent_percepts.json", gui=None) -> None:
         self.memory = MemoryStore()
 
         self._percepts = EventStream()
-        self._percepts.load(percept_filename)
+        self._percept_filename = percept_filename
+        self._percepts.load(self._percept_filename)
 
         self._future_events = EventQueue()
         self._task = None
@@ -37,13 +93,12 @@ class Agent:
 
         signal('channel_raw_user_command').connect(self._log_raw_user_command)
 
-        # @todo instead of connecting different functions, connect one on_command function
-        # and route to the correct member function from there.
-        
+        # Every command is logged as a percept. command_router only calls the handler for
+        # the command that was sent.
         signal('channel_command').connect(self._log_parsed_user_command)
-        signal('channel_command').connect(self._on_cmd_show_logged_percepts)
-        signal('channel_command').connect(self._on_cmd_memorize_text)
-        signal('channel_command').connect(self._on_cmd_retrieve_memory)
+        command_router.register("show_logged_percepts", self._on_cmd_show_logged_percepts)
+        command_router.register("memorize_text", self._on_cmd_memorize_text)
+        command_router.register("recall_memory", self._on_cmd_retrieve_memory)
         signal('channel_user_text_message').connect(self._on_user_text_message)
 
         self._memory_filename = memory_filename
@@ -102,7 +157,14 @@ class Agent:
 
     def save_memories(self) -> None:
         self.memory.save(self._memory_filename)
-        self._percepts.save("agent_percepts.json")
+        self._percepts.save(self._percept_filename)
+
+
+    def memory_snapshots(self) -> Dict[str, object]:
+        """filename -> snapshot of the memories and percepts, for a WorkspaceSaver to write
+        out in the background."""
+        return {self._memory_filename: self.memory.snapshot(),
+                self._percept_filename: self._percepts.snapshot()}
 
 
     async def _go(self):
@@ -123,32 +185,36 @@ class Agent:
 
     
     def _filtered_percepts(self) -> List[str]:
-        filtered_result = ""
+        filtered_result = []
         print(f'*** len(percept_history): {len(self.percept_history())}')
         for e in self.percept_history()[-MAX_PERCEPT_HISTORY_COUNT:]:
             if e['type'] == "SessionStart":
-                filtered_result += f"<event>\nSession started - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']}\n</event>\n"
+                filtered_result.append(f"<event>\nSession started - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']}\n</event>\n")
             elif e['type'] == "SessionEnd":
-                filtered_result += f"<event>\nSession ended - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']}\n</event>\n"
+                filtered_result.append(f"<event>\nSession ended - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']}\n</event>\n")
             elif e['type'] == "UserEnteredCommand":
-                filtered_result += f"<event>\nUser sent you a text command - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']} user_text: {e['user_text']}\n</event>\n"
+                filtered_result.append(f"<event>\nUser sent you a text command - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']} user_text: {e['user_text']}\n</event>\n")
             elif e['type'] == "ParsedUserCommand":
-                filtered_result += f"<event>\nYou decided that the user's text input matched one of your command functions - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']} command_text: {e['command_text']}\n</event>\n"
+                filtered_result.append(f"<event>\nYou decided that the user's text input matched one of your command functions - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']} command_text: {e['command_text']}\n</event>\n")
             elif e['type'] == "TextMessageFromUser":
-                filtered_result += f"<event>\nUser sent you a text message - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']} user_text: {e['user_text']}\n</event>\n"
+                filtered_result.append(f"<event>\nUser sent you a text message - client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']} user_text: {e['user_text']}\n</event>\n")
             elif e['type'] == "RememberedText":
-                filtered_result += f"<event>\nYou recalled a text memory from your external memory store - memory_uid: {e['mem_uid']} vector similarity to query: {float(e['similarity'])} summary: {e['summary']}\n client_utc_time: {e['client_utc_time']}\n</event>\n"
+                filtered_result.append(f"<event>\nYou recalled a text memory from your external memory store - memory_uid: {e['mem_uid']} vector similarity to query: {float(e['similarity'])} summary: {e['summary']}\n client_utc_time: {e['client_utc_time']}\n</event>\n")
             elif e['type'] == "MemorizedText":
-                filtered_result += f"<event>\nYou memorized a text memory to your external memory store - memory_uid: {e['mem_uid']} contents_text: {e['text']}\nclient_utc_time: {e['client_utc_time']}\n</event>\n"
+                filtered_result.append(f"<event>\nYou memorized a text memory to your external memory store - memory_uid: {e['mem_uid']} contents_text: {e['text']}\nclient_utc_time: {e['client_utc_time']}\n</event>\n")
             elif e['type'] == "TextResponseFromAgentStart":
-                filtered_result += f"<event>\nYou started a streaming text response to the user - username: {e['user']} client_utc_time: client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']}\n</event>\n"
+                filtered_result.append(f"<event>\nYou started a streaming text response to the user - username: {e['user']} client_utc_time: client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']}\n</event>\n")
             elif e['type'] == "TextResponseFromAgentDone":
-                filtered_result += f"<event>\nYou finished streaming a text response to the user - username: {e['user']} client_utc_time: client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} response_text: {e['response_text']}\n</event>\n"
+                filtered_result.append(f"<event>\nYou finished streaming a text response to the user - username: {e['user']} client_utc_time: client_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} response_text: {e['response_text']}\n</event>\n")
+            elif e['type'] == "OpenedFile" and e.get('is_excerpt'):
+                filtered_result.append(f"<event>\nYou opened a large file. Only its first lines are shown - path: \"{e['path']}\" size_bytes: {e['size_bytes']}\nclient_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']}\nexcerpt:\n\"\"\"\n{e['contents']}\n\"\"\"\n</event>\n")
             elif e['type'] == "OpenedFile":
-                filtered_result += f"<event>\nYou opened a file - path: \"{e['path']}\"\nclient_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']}\ncontents:\n\"\"\"\n{e['contents']}\n\"\"\"\n</event>\n"
+                filtered_result.append(f"<event>\nYou opened a file - path: \"{e['path']}\"\nclient_utc_time: {e['client_utc_time']} client_timezone: {e['client_timezone']} client_local_time: {e['client_local_time']} client_platform: {e['client_platform']} username: {e['user']}\ncontents:\n\"\"\"\n{e['contents']}\n\"\"\"\n</event>\n")
             else:
-                filtered_result += json.dumps(e, indent=2) + "\n"
-        return filtered_result
+                filtered_result.append(json.dumps(e, indent=2) + "\n")
+        # Join once at the end. Repeated += on a growing string is quadratic in the
+        # worst case, and this runs over up to MAX_PERCEPT_HISTORY_COUNT events per turn.
+        return "".join(filtered_result)
 
 
     def _filter_chat_history_from_percepts(self) -> List[dict]:
@@ -169,10 +235,7 @@ class Agent:
         self.put_event(AgentEvents.create_event("ParsedUserCommand", command_text=command))
 
 
-    def _on_cmd_show_logged_percepts(self, command_text: str) -> None:
-        if command_text != "show_logged_percepts":
-            return
-        
+    def _on_cmd_show_logged_percepts(self, args: Optional[str]) -> None:
         if not self._gui or not self._gui():   # Could be not set, or weakref could be gone
             return
         
@@ -189,22 +252,14 @@ class Agent:
         ta.set_size(580, 600)
 
 
-    def _on_cmd_memorize_text(self, command_text: str) -> None:
-        print(f'*** _on_cmd_memorize_text: {command_text}')
-        if not command_text.startswith('memorize_text('):
-            return
-        
-        text_to_memorize = self._extract_parameter(command_text)
+    def _on_cmd_memorize_text(self, text_to_memorize: Optional[str]) -> None:
+        print(f'*** _on_cmd_memorize_text: {text_to_memorize}')
         if text_to_memorize:
             self.memorize_text(text_to_memorize)
 
 
-    def _on_cmd_retrieve_memory(self, command_text: str) -> None:
-        print(f'*** _on_cmd_retrieve_memory: {command_text}')
-        if not command_text.startswith('recall_memory('):
-            return
-        
-        search_text = self._extract_parameter(command_text)
+    def _on_cmd_retrieve_memory(self, search_text: Optional[str]) -> None:
+        print(f'*** _on_cmd_retrieve_memory: {search_text}')
         if search_text:
             results = self.recall_text_by_similarity(search_text)
 
@@ -242,21 +297,7 @@ class Agent:
         # We want to memorize the user text, but not the full percept history, and
         # other context. So, memorize now, before filling in the prompt template.
 
-        user_msg_memory_template = \
-"""
-The user sent you this message:
-'''{{ Message }}'''
-
-User metadata:
-
-{{ UserInfo }}
-
-Time metadata:
-
-{{ TimeInfo }}
-"""
-
-        user_msg_memory_text = pystache.render(user_msg_memory_template,
+        user_msg_memory_text = render_template(USER_MSG_MEMORY_TEMPLATE,
             **{
                 'Message': text,
                 'UserInfo': json.dumps(AgentEvents.get_user_metadata()),
@@ -270,13 +311,7 @@ Time metadata:
         # Now fill in the prompt template that we're going to send to an LLM to generate
         # a response to the user's message.
 
-        sys_template = PromptTemplate(
-"""
-You are AISH, a conversational AI agent. You are interacting with a user. You
-are implemented as a software system, of which LLMs are one part. You also have a memory
-that is a separate subcomponent independent of LLMs.
-
-""")
+        sys_template = PromptTemplate(CHAT_SYSTEM_TEMPLATE)
         try:
             percept_history_str = self._filtered_percepts()
         except TypeError as e:
@@ -293,21 +328,7 @@ that is a separate subcomponent independent of LLMs.
 
         sys_prompt = sys_template.fill(**{'Percepts': percept_history_str, 'Files': files_str})
 
-        user_template = PromptTemplate(
-"""
-User metadata:
-
-{{ UserInfo }}
-
-The user sent you this message:
-'''{{ Message }}'''
-
-Time metadata:
-
-{{ TimeInfo }}
-
-Respond to the user's message.
-""")
+        user_template = PromptTemplate(CHAT_USER_TEMPLATE)
         user_template.fill(
             **{
                 'Message': text,
@@ -368,20 +389,7 @@ Respond to the user's message.
         }
         self.put_event(event)
 
-        response_memory_template = \
-"""
-You responded:
-'''{{ Message }}'''
-
-User metadata:
-
-{{ UserInfo }}
-
-Time metadata:
-
-{{ TimeInfo }}
-"""        
-        memory_text = pystache.render(response_memory_template,
+        memory_text = render_template(RESPONSE_MEMORY_TEMPLATE,
                                       {
                                           'Message': llm_request.response_text,
                                           'UserInfo': json.dumps(AgentEvents.get_user_metadata()),
@@ -390,12 +398,3 @@ Time metadata:
                                       
         self.memorize_text(text=memory_text)
         self._ta_chat_answer = None
-
-
-    # @todo if this works, then use it in gui.py command handlers as well...
-    def _extract_parameter(self, command: str) -> str | None:
-        prefix, suffix = command.split("(", 1)
-        if suffix.endswith(")"):
-            return suffix[:-1].strip()
-        else:
-            return None
\ No newline at end of file
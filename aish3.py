@@ -29,15 +29,18 @@ from llm_chat_container import LLMChatContainer
 from gui_layout import RowLayout
 from command_console import CommandConsole
 from draw import draw_text
+from frame_profiler import profiler
 from session import Session
 from label import Label
 from textarea import TextArea
+import large_file_viewer  # Registers the LargeFileViewer control type
 from llm_agent_chat import LLMAgentChat
 from agent import Agent
 
 
-async def run(*, fullscreen: bool, width: int, height: int, workspace_filename: str, enable_voice_in: bool):
+async def run(*, fullscreen: bool, width: int, height: int, workspace_filename: str, enable_voice_in: bool, enable_profiler: bool = False, lazy_load: bool = False):
     logging.info('App start.')
+    profiler.set_enabled(enable_profiler)
 
     # sdl2.ext.init()
     sdl2.SDL_Init(sdl2.SDL_INIT_VIDEO | sdl2.SDL_INIT_EVENTS)
@@ -105,7 +108,12 @@ async def run(*, fullscreen: bool, width: int, height: int, workspace_filename:
                 client_session=session,
                 enable_voice_in=enable_voice_in,
                 enable_voice_out=False,
-                create_hook=setup_gui)
+                create_hook=setup_gui,
+                lazy_load=lazy_load)
+
+    # From here on, lay out changed containers once per frame, just before drawing.
+    gui.defer_layout = True
+    gui.autosave_interval = config.WORKSPACE_AUTOSAVE_INTERVAL_S
     
     running = True
     t_prev_update = time.time()
@@ -116,11 +124,14 @@ async def run(*, fullscreen: bool, width: int, height: int, workspace_filename:
 
     fps_smoothed = 0.0
     while running:
+        profiler.begin_frame()
+
         #
         # Handle any pending SDL events, to prevent GUI from becoming unresponsive.
         #
 
-        events = sdl2.ext.get_events()
+        with profiler.section("event_pump"):
+            events = sdl2.ext.get_events()
         if events:
             for event in events:
                 if event.type == sdl2.SDL_QUIT:
@@ -154,14 +165,16 @@ async def run(*, fullscreen: bool, width: int, height: int, workspace_filename:
                         renderer.present()
 
                 else:
-                    gui.handle_event(event)
+                    with profiler.section("handle_event"):
+                        gui.handle_event(event)
 
         else:
             #
             # Give a chance for the asyncio event loop to do some work...
             #
 
-            await asyncio.sleep(0.0001)
+            with profiler.section("asyncio"):
+                await asyncio.sleep(0.0001)
 
             #
             # Update our app GUI and draw scene
@@ -169,12 +182,14 @@ async def run(*, fullscreen: bool, width: int, height: int, workspace_filename:
 
             t_update = time.time()
             dt = t_update - t_prev_update
-            gui.update(dt)
+            with profiler.section("update"):
+                gui.update(dt)
             t_prev_update = t_update
 
             t0 = time.time()
             renderer.clear()
-            gui.draw()
+            with profiler.section("draw"):
+                gui.draw()
 
             t1 = time.time()
             elapsed = t1 - t0
@@ -184,7 +199,12 @@ async def run(*, fullscreen: bool, width: int, height: int, workspace_filename:
             draw_text(renderer, font_descriptor, fps_str, width - 100, 10)
             # print(fps_str)
 
-            renderer.present()
+            profiler.draw_overlay(renderer, font_descriptor, width - 440, 40)
+
+            with profiler.section("present"):
+                renderer.present()
+
+        profiler.end_frame()
 
     session.stop()
 
@@ -200,6 +220,8 @@ if __name__ == "__main__":
     parser.add_argument('--height', type=int, default=800, help='window height (default: 800)')
     parser.add_argument('--voice-in', action='store_true', help='Enable voice input.')
     parser.add_argument('--workspace', default='aish_workspace.json', help='workspace file (default: aish_workspace.json)')
+    parser.add_argument('--lazy-load', action='store_true', help='Only build workspace controls when they come into view.')
+    parser.add_argument('--profile', action='store_true', help='Enable the frame profiler from startup. Cmd+P shows its overlay, Shift+Cmd+P dumps a Chrome trace.')
     args = parser.parse_args()
 
     asyncio.run(
@@ -207,5 +229,7 @@ if __name__ == "__main__":
             width=args.width, 
             height=args.height, 
             workspace_filename=args.workspace, 
-            enable_voice_in=args.voice_in)
+            enable_voice_in=args.voice_in,
+            enable_profiler=args.profile,
+            lazy_load=args.lazy_load)
     )
\ No newline at end of file
@@ -0,0 +1,116 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fixed-size circular buffer for PCM audio.
+
+One thread (e.g. a PyAudio callback) writes, and one other thread reads. Reads return
+memoryviews into the buffer itself, so nothing is copied. A view stays valid until the
+writer comes all the way round the buffer again, so read, use, and let go of it, rather
+than keeping it. If the reader falls a whole buffer behind, the oldest audio is dropped
+and counted in n_overrun_bytes.
+
+Each write is stamped with when its audio was captured, so that the reader can tell how
+long audio waited in the buffer: t_last_read_captured."""
+
+from collections import deque
+import time
+from typing import Optional
+
+
+WRITE_TIME_HISTORY_COUNT = 1024     # Capture times kept for writes the reader hasn't reached
+
+
+class PCMRingBuffer:
+    def __init__(self, capacity_bytes: int):
+        assert(capacity_bytes > 0)
+        self.capacity = capacity_bytes
+        self._buf = bytearray(capacity_bytes)
+        self._view = memoryview(self._buf)
+
+        # Total bytes ever written and read. Only the writer changes _n_written, and only
+        # the reader changes _n_read, so neither needs a lock.
+        self._n_written = 0
+        self._n_read = 0
+        self.n_overrun_bytes = 0
+
+        # (_n_written at the end of a write, when it was captured). The writer appends, and
+        # the reader pops the writes it has read past. deque's append() and popleft() are
+        # atomic.
+        self._write_times = deque(maxlen=WRITE_TIME_HISTORY_COUNT)
+        self.t_last_read_captured: Optional[float] = None
+
+
+    def write(self, data, t_captured: Optional[float] = None) -> None:
+        """t_captured is when the end of data was captured, by time.perf_counter(). Default: now."""
+        if t_captured is None:
+            t_captured = time.perf_counter()
+        data = memoryview(data).cast('B')
+        n = len(data)
+        if n > self.capacity:
+            # Only the newest capacity bytes can fit. Count the rest as written, so that
+            # the reader sees them as overrun.
+            self._n_written += n - self.capacity
+            data = data[n - self.capacity:]
+            n = self.capacity
+
+        start = self._n_written % self.capacity
+        first = min(n, self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+
+        # Publish only once the bytes, and when they were captured, are in place.
+        self._write_times.append((self._n_written + n, t_captured))
+        self._n_written += n
+
+
+    def available(self) -> int:
+        """Bytes written but not yet read."""
+        return min(self._n_written - self._n_read, self.capacity)
+
+
+    def read(self, max_bytes: Optional[int] = None, multiple_of: int = 1) -> memoryview:
+        """Up to max_bytes of the oldest unread audio, as a view into the buffer. Stops at
+        the end of the buffer rather than wrapping, so call again until it returns an empty
+        view to get everything. Returns a whole multiple of multiple_of bytes, which, if
+        capacity is a multiple of it too, keeps every read aligned, e.g. to VAD windows.
+        Sets t_last_read_captured to when the last byte read was captured."""
+        n_written = self._n_written
+        if n_written - self._n_read > self.capacity:
+            # The writer lapped us. Skip to the oldest audio that's still there, keeping
+            # reads aligned.
+            n_lost = n_written - self._n_read - self.capacity
+            n_lost += -n_lost % multiple_of
+            self.n_overrun_bytes += n_lost
+            self._n_read += n_lost
+
+        start = self._n_read % self.capacity
+        n = min(n_written - self._n_read, self.capacity - start)
+        if max_bytes is not None:
+            n = min(n, max_bytes)
+        n -= n % multiple_of
+
+        self._n_read += n
+        if n > 0:
+            # The first write not wholly read before now holds the last byte read.
+            write_times = self._write_times
+            while write_times and write_times[0][0] < self._n_read:
+                write_times.popleft()
+            self.t_last_read_captured = write_times[0][1] if write_times else None
+        return self._view[start:start + n]
+
+
+    def clear(self) -> None:
+        """Drop everything unread. Reader only."""
+        self._n_read = self._n_written
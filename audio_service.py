@@ -70,7 +70,7 @@ class AudioService:
 
 
     @classmethod
-    def get_voice_output_stream(cls, handler: Callable):
+    def get_voice_output_stream(cls, handler: Callable, frames_per_buffer: int = pyaudio.paFramesPerBufferUnspecified):
         logging.debug('AudioService.get_voice_output_stream()')
         with cls._lock:
             logging.debug('AudioService.get_voice_output_stream(): GOT LOCK')
@@ -80,6 +80,7 @@ class AudioService:
                 channels=1,
                 format=pyaudio.paInt16,
                 output=True,
+                frames_per_buffer=frames_per_buffer,
                 stream_callback=handler
             )
         logging.debug('AudioService.get_voice_output_stream(): RELEASED LOCK')
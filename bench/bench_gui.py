@@ -0,0 +1,330 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Headless GUI rendering benchmarks.
+
+Builds a synthetic workspace through GUI.create_control (N TextAreas, M LLM chats, and
+one TextArea holding a large text), then times the things the main loop in aish3.py
+does every frame: GUI.draw, GUI.update and check_hit, as well as scrolling the large
+text, panning the viewport, and appending streamed text the way LLM responses arrive.
+
+Runs without a display, using SDL's dummy video driver and the software renderer.
+Results are printed as JSON, for regression tracking, e.g.
+
+    python bench/bench_gui.py --text-areas 50 --chats 5 --output gui_bench.json
+    python bench/bench_gui.py --quick
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be set before SDL is initialized.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_RENDER_DRIVER", "software")
+
+import sdl2
+import sdl2.ext
+import sdl2.sdlttf as ttf
+
+# Some modules print as they're imported, e.g. config.py. Keep stdout for the JSON.
+with contextlib.redirect_stdout(sys.stderr):
+    from frame_profiler import profiler
+    from gui import GUI, FontRegistry
+    from session import Session
+
+    # Importing these registers their control types with GUI.
+    import label
+    import llm_chat_container
+    import textarea
+
+
+WINDOW_WIDTH = 1400
+WINDOW_HEIGHT = 800
+
+_WORDS = ("the agent memory canvas text chat summary prompt stream token user "
+          "model latency file label window voice event percept note result").split()
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+def summarize(values):
+    return {"n": len(values),
+            "p50": statistics.median(values),
+            "p95": percentile(values, 95),
+            "mean": statistics.fmean(values),
+            "max": max(values)}
+
+
+def time_it(fn, repeats):
+    times = []
+    for i in range(repeats):
+        t_start = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - t_start)
+    return summarize(times)
+
+
+def make_text(rng, n_lines, line_chars):
+    lines = []
+    for _ in range(n_lines):
+        line = ""
+        while len(line) < line_chars:
+            line += rng.choice(_WORDS) + " "
+        lines.append(line.rstrip())
+    return "\n".join(lines)
+
+
+class Workspace:
+    def __init__(self, args):
+        sdl2.SDL_Init(sdl2.SDL_INIT_VIDEO | sdl2.SDL_INIT_EVENTS)
+        ttf.TTF_Init()
+
+        self.window = sdl2.ext.Window("AISH bench", size=(WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.renderer = sdl2.ext.Renderer(self.window, flags=sdl2.SDL_RENDERER_SOFTWARE)
+
+        font_filename = "FiraCode-Regular.ttf"
+        font_descriptor = FontRegistry().create_fontmanager(font_filename, 12, string_key="default")
+        FontRegistry().create_fontmanager(font_filename, 24, string_key="large-label")
+
+        self.session = Session()
+        self.gui = GUI(self.renderer, font_descriptor, client_session=self.session)
+        rng = random.Random(args.seed)
+
+        # Lay the controls out on a grid, so that some are on screen and most are not.
+        parent = self.gui.content()
+        self.text_areas = []
+        n_columns = 8
+        for i in range(args.text_areas):
+            x, y = 20 + (i % n_columns) * 260, 20 + (i // n_columns) * 220
+            ta = self.gui.create_control("TextArea", w=240, h=200, x=x, y=y)
+            ta.set_text(make_text(rng, args.lines, args.line_chars))
+            parent.add_child(ta)
+            self.text_areas.append(ta)
+
+        self.chats = []
+        y_chats = 20 + ((args.text_areas + n_columns - 1) // n_columns) * 220
+        for i in range(args.chats):
+            chat = self.gui.create_control("LLMChatContainer", x=20 + i * 560, y=y_chats)
+            chat.utterances[-1].set_text(make_text(rng, args.lines, args.line_chars))
+            parent.add_child(chat)
+            self.chats.append(chat)
+
+        # One large text, on screen, for scrolling.
+        self.large_text_area = self.gui.create_control("TextArea", w=600, h=700, x=WINDOW_WIDTH - 640, y=20)
+        self.large_text_area.set_text(make_text(rng, args.large_text_lines, args.line_chars))
+        parent.add_child(self.large_text_area)
+
+        # Empty, on screen, for streaming appends.
+        self.stream_text_area = self.gui.create_control("TextArea", w=600, h=400, x=20, y=20)
+        parent.add_child(self.stream_text_area)
+
+        parent.sizeToChildren()
+
+        # As in aish3.run(), once the workspace is built.
+        self.gui.defer_layout = True
+
+        self.world_rect = parent.get_world_rect()
+        self.n_controls = 0
+        GUI._depth_first_traversal(parent, lambda c: self._count_control())
+
+
+    def _count_control(self):
+        self.n_controls += 1
+
+
+    def all_text_areas(self):
+        return self.text_areas + [self.large_text_area, self.stream_text_area]
+
+
+    def frame(self):
+        """Same per-frame work as the main loop in aish3.run()."""
+        profiler.begin_frame()
+        with profiler.section("update"):
+            self.gui.update(1.0 / 60)
+        self.renderer.clear()
+        with profiler.section("draw"):
+            self.gui.draw()
+        with profiler.section("present"):
+            self.renderer.present()
+        profiler.end_frame()
+
+
+    def close(self):
+        self.session.stop()
+        ttf.TTF_Quit()
+        sdl2.ext.quit()
+
+
+def run_benchmarks(ws: Workspace, args):
+    gui = ws.gui
+    repeats = args.repeats
+    results = {}
+
+    def draw_cold(i):
+        # Every TextArea has to rebuild its cached text texture.
+        for ta in ws.all_text_areas():
+            ta.set_needs_redraw()
+        ws.renderer.clear()
+        gui.draw()
+        ws.renderer.present()
+
+    def draw_warm(i):
+        ws.renderer.clear()
+        gui.draw()
+        ws.renderer.present()
+
+    results["draw_cold"] = time_it(draw_cold, max(1, repeats // 10))
+    results["draw_warm"] = time_it(draw_warm, repeats)
+    results["update"] = time_it(lambda i: gui.update(1.0 / 60), repeats)
+
+    rng = random.Random(args.seed)
+    wr = ws.world_rect
+    points = [(rng.randint(wr.x, wr.x + wr.w), rng.randint(wr.y, wr.y + wr.h)) for _ in range(args.hit_points)]
+
+    def check_hits(i):
+        for wx, wy in points:
+            gui.check_hit(wx, wy)
+
+    check_hit = time_it(check_hits, max(1, repeats // 10))
+    check_hit["per_call_mean"] = check_hit["mean"] / len(points)
+    results["check_hit"] = check_hit
+
+    # Scroll the large text down a line per frame, then back up.
+    ta = ws.large_text_area
+    ta.y_scroll = 0
+
+    def scroll_frame(i):
+        ta.scroll_by(dy=ta.row_spacing if i < repeats // 2 else -ta.row_spacing)
+        ws.frame()
+
+    results["scroll_frame"] = time_it(scroll_frame, repeats)
+
+    # Pan the viewport, as when dragging the canvas.
+    wx0, wy0 = gui.get_view_pos()
+
+    def pan_frame(i):
+        gui.set_view_pos(wx0 + 4 * i, wy0 + 2 * i)
+        ws.frame()
+
+    results["pan_frame"] = time_it(pan_frame, repeats)
+    gui.set_view_pos(wx0, wy0)
+
+    # Append streamed chunks, one per frame, as in Agent._on_chat_response_next.
+    stream_ta = ws.stream_text_area
+    words = make_text(rng, args.stream_chunks // 8 + 1, 60).replace("\n", " \n").split(" ")
+    chunks = [" " + w for w in words[:args.stream_chunks]]
+
+    def append_frame(i):
+        stream_ta.text_buffer.move_point_to_end()
+        stream_ta.text_buffer.insert(chunks[i])
+        stream_ta.set_needs_redraw()
+        ws.frame()
+
+    t_start = time.perf_counter()
+    stream_append = time_it(append_frame, len(chunks))
+    stream_append["chunks_per_second"] = len(chunks) / (time.perf_counter() - t_start)
+    results["stream_append_frame"] = stream_append
+
+    # Grow a chat by a message per frame, as when sending. Each add re-lays out the chat
+    # and its ancestors. With deferred layout, that's once per frame.
+    chat = ws.chats[0] if ws.chats else None
+    if chat is not None:
+        passes_before = gui.layout_passes
+
+        def chat_append_frame(i):
+            chat.add_child(gui.create_control("ChatMessageUI", role="User", text=f"message {i}"))
+            ws.frame()
+
+        n_appends = max(1, repeats // 2)
+        chat_append = time_it(chat_append_frame, n_appends)
+        chat_append["layout_passes_per_frame"] = (gui.layout_passes - passes_before) / n_appends
+        results["chat_append_frame"] = chat_append
+
+    # What Cmd+S or an autosave costs the UI thread. Serializing and writing happen on
+    # the saver's worker thread.
+    results["save_snapshot"] = time_it(lambda i: gui.snapshot_workspace(), max(1, repeats // 10))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless GUI rendering benchmarks.')
+    parser.add_argument('--text-areas', type=int, default=40, help='number of TextAreas (default: 40)')
+    parser.add_argument('--chats', type=int, default=4, help='number of LLM chats (default: 4)')
+    parser.add_argument('--lines', type=int, default=20, help='lines of text per TextArea and chat (default: 20)')
+    parser.add_argument('--line-chars', type=int, default=60, help='characters per line (default: 60)')
+    parser.add_argument('--large-text-lines', type=int, default=5000, help='lines in the large TextArea (default: 5000)')
+    parser.add_argument('--repeats', type=int, default=60, help='timed frames per benchmark (default: 60)')
+    parser.add_argument('--hit-points', type=int, default=200, help='points per check_hit run (default: 200)')
+    parser.add_argument('--stream-chunks', type=int, default=200, help='streamed chunks to append (default: 200)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--profile', action='store_true', help='also report per-section frame profiler percentiles')
+    parser.add_argument('--quick', action='store_true', help='small workspace and few repeats, for smoke testing')
+    parser.add_argument('--output', default=None, help='write JSON results to this file')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.text_areas, args.chats, args.lines = 8, 1, 10
+        args.large_text_lines, args.repeats, args.hit_points, args.stream_chunks = 500, 10, 50, 20
+
+    profiler.set_enabled(args.profile)
+
+    # The GUI prints a lot while building controls. Keep stdout for the JSON.
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_start = time.perf_counter()
+        ws = Workspace(args)
+        build_time = time.perf_counter() - t_start
+        try:
+            results = run_benchmarks(ws, args)
+        finally:
+            ws.close()
+
+    result = {
+        "benchmark": "gui",
+        "config": vars(args),
+        "environment": {"python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "sdl_video_driver": os.environ.get("SDL_VIDEODRIVER"),
+                        "sdl_render_driver": os.environ.get("SDL_RENDER_DRIVER")},
+        "n_controls": ws.n_controls,
+        "build_workspace_time": build_time,
+        "layout_requests": ws.gui.layout_requests,
+        "layout_passes": ws.gui.layout_passes,
+        "results": results,
+    }
+    if args.profile:
+        result["profile"] = profiler.report()
+
+    s_result = json.dumps(result, indent=2)
+    print(s_result)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(s_result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure end-to-end agent turn latency against the offline LLM stand-in.
+
+A turn is what happens when the user types into the command console: CommandListener
+asks the LLM whether the text is a command, and when it isn't, a chat response is
+streamed back. Runs without network access, e.g.
+
+    python bench/bench_llm_turn.py --turns 20 --ttft-ms 300 --tokens-per-second 50
+    python bench/bench_llm_turn.py --replay llm_recording.jsonl --speedup 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+def summarize(values):
+    return {"p50": statistics.median(values),
+            "p95": percentile(values, 95),
+            "mean": statistics.fmean(values),
+            "max": max(values)}
+
+
+async def run_turns(n_turns: int):
+    from blinker import signal
+    from command_listener import CommandListener
+    from llm import LLMRequest
+    from prompt import LiteralPrompt
+
+    listener = CommandListener(session=None)
+    results = []
+
+    for i in range(n_turns):
+        done = asyncio.Event()
+        turn = {}
+        t_start = time.perf_counter()
+
+        def on_response_done(llm_request: LLMRequest):
+            turn["turn_time"] = time.perf_counter() - t_start
+            turn["response_ttft"] = llm_request.metrics["ttft"]
+            turn["tokens_per_second"] = llm_request.metrics["tokens_per_second"]
+            done.set()
+
+        def on_response_error(llm_request: LLMRequest, error: str):
+            turn["error"] = error
+            done.set()
+
+        def on_user_text_message(text: str):
+            turn["command_detection_time"] = time.perf_counter() - t_start
+            rq = LLMRequest(prompt=LiteralPrompt(text),
+                            handlers=[("stop", on_response_done), ("error", on_response_error)])
+            rq.send_nowait()
+
+        def on_command(command: str):
+            # The stand-in answered with a non-empty "command". Count the turn as done.
+            turn["command_detection_time"] = time.perf_counter() - t_start
+            turn["turn_time"] = turn["command_detection_time"]
+            done.set()
+
+        signal('channel_user_text_message').connect(on_user_text_message)
+        signal('channel_command').connect(on_command)
+        listener.parse_user_command(f"Turn {i}: tell me about the canvas.")
+        await done.wait()
+        signal('channel_user_text_message').disconnect(on_user_text_message)
+        signal('channel_command').disconnect(on_command)
+        results.append(turn)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark agent turn latency with the offline LLM stand-in.')
+    parser.add_argument('--turns', type=int, default=10, help='number of turns (default: 10)')
+    parser.add_argument('--ttft-ms', type=float, default=300, help='synthetic time to first token (default: 300)')
+    parser.add_argument('--tokens-per-second', type=float, default=50, help='synthetic token rate (default: 50)')
+    parser.add_argument('--n-tokens', type=int, default=64, help='synthetic tokens per response (default: 64)')
+    parser.add_argument('--replay', default=None, help='replay streams from this JSONL recording instead')
+    parser.add_argument('--speedup', type=float, default=1.0, help='replay time scale (default: 1.0)')
+    parser.add_argument('--output', default=None, help='write JSON results to this file')
+    args = parser.parse_args()
+    if args.speedup <= 0:
+        parser.error('--speedup must be positive')
+
+    # Must be set before llm is imported.
+    os.environ["AISH_LLM_BACKEND"] = "standin"
+
+    import llm_standin
+    llm_standin.set_backend(llm_standin.StandInBackend(
+        mode="replay" if args.replay else "synthetic",
+        recording_path=args.replay,
+        ttft=args.ttft_ms / 1000.0,
+        tokens_per_second=args.tokens_per_second,
+        n_tokens=args.n_tokens,
+        speedup=args.speedup,
+        # CommandListener treats an empty answer as "not a command", so the turn
+        # continues on to a chat response.
+        scripts=[("looking for a COMMAND", "")]))
+
+    turns = asyncio.run(run_turns(args.turns))
+    ok_turns = [t for t in turns if "error" not in t]
+
+    result = {
+        "benchmark": "llm_turn",
+        "turns": len(turns),
+        "errors": len(turns) - len(ok_turns),
+        "config": vars(args),
+    }
+    if ok_turns:
+        result["turn_time"] = summarize([t["turn_time"] for t in ok_turns])
+        result["command_detection_time"] = summarize([t["command_detection_time"] for t in ok_turns])
+        responses = [t for t in ok_turns if "response_ttft" in t]
+        if responses:
+            result["response_ttft"] = summarize([t["response_ttft"] for t in responses])
+            result["tokens_per_second"] = summarize([t["tokens_per_second"] for t in responses])
+
+    s_result = json.dumps(result, indent=2)
+    print(s_result)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(s_result)
+
+
+if __name__ == "__main__":
+    main()
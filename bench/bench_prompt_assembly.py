@@ -0,0 +1,159 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure how long the Agent takes to assemble a chat prompt from a large percept history.
+
+Covers the per-turn work in Agent._on_user_text_message before the LLM request is sent:
+formatting the percept history, extracting chat history, and filling the prompt and
+memory templates. Template fills are also timed with plain pystache.render(), which
+re-parses the template on every call, for comparison. No network access is needed, e.g.
+
+    python bench/bench_prompt_assembly.py --percepts 800 --repeats 50
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pystache
+
+# Some modules print as they're imported, e.g. config.py. Keep stdout for the JSON.
+with contextlib.redirect_stdout(sys.stderr):
+    import agent
+    from agent import Agent
+    from agent_events import AgentEvents
+    from event_stream import EventStream
+    from prompt import PromptTemplate, render_template
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+def summarize(values):
+    return {"p50": statistics.median(values),
+            "p95": percentile(values, 95),
+            "mean": statistics.fmean(values),
+            "max": max(values)}
+
+
+def make_percepts(n_percepts: int, message_chars: int, seed: int):
+    rng = random.Random(seed)
+    words = "the agent memory canvas text chat summary prompt stream token user file".split()
+
+    def message():
+        text = ""
+        while len(text) < message_chars:
+            text += rng.choice(words) + " "
+        return text.strip()
+
+    events = []
+    for i in range(n_percepts):
+        kind = i % 4
+        if kind == 0:
+            events.append(AgentEvents.create_event("TextMessageFromUser", user_text=message()))
+        elif kind == 1:
+            events.append(AgentEvents.create_event("TextResponseFromAgentStart"))
+        elif kind == 2:
+            events.append(AgentEvents.create_event("TextResponseFromAgentDone", response_text=message()))
+        else:
+            events.append(AgentEvents.create_event("MemorizedText", mem_uid=str(i), text=message()))
+    return events
+
+
+def make_agent(events):
+    # Skip Agent.__init__. It loads the memory store and percept log from disk, and
+    # connects signal handlers, none of which we want here.
+    a = Agent.__new__(Agent)
+    a._percepts = EventStream()
+    a._percepts._events = events
+    a._files = [{"object_type": "file", "path": f"src/file_{i}.py", "contents": ""} for i in range(20)]
+    return a
+
+
+def time_it(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        t_start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t_start)
+    return summarize(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Agent prompt assembly on large percept histories.')
+    parser.add_argument('--percepts', type=int, default=agent.MAX_PERCEPT_HISTORY_COUNT,
+                        help=f'number of percept events (default: {agent.MAX_PERCEPT_HISTORY_COUNT})')
+    parser.add_argument('--message-chars', type=int, default=400, help='characters per message (default: 400)')
+    parser.add_argument('--repeats', type=int, default=50, help='timed repeats per step (default: 50)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--output', default=None, help='write JSON results to this file')
+    args = parser.parse_args()
+
+    a = make_agent(make_percepts(args.percepts, args.message_chars, args.seed))
+    data = {'Message': "Tell me about the canvas.",
+            'UserInfo': json.dumps(AgentEvents.get_user_metadata()),
+            'TimeInfo': json.dumps(AgentEvents.get_time_metadata())}
+
+    def assemble_prompt():
+        percepts_str = a._filtered_percepts()
+        files_str = "".join(f'File: "{f["path"]}"\n\n' for f in a._files)
+        sys_prompt = PromptTemplate(agent.CHAT_SYSTEM_TEMPLATE).fill(Percepts=percepts_str, Files=files_str)
+        user_prompt = PromptTemplate(agent.CHAT_USER_TEMPLATE).fill(**data)
+        chat_history = a._filter_chat_history_from_percepts()
+        return [{'role': 'system', 'content': sys_prompt}] + chat_history + [{'role': 'user', 'content': user_prompt}]
+
+    def fill_templates():
+        render_template(agent.USER_MSG_MEMORY_TEMPLATE, data)
+        render_template(agent.CHAT_USER_TEMPLATE, data)
+        render_template(agent.RESPONSE_MEMORY_TEMPLATE, data)
+
+    def fill_templates_uncached():
+        pystache.render(agent.USER_MSG_MEMORY_TEMPLATE, data)
+        pystache.render(agent.CHAT_USER_TEMPLATE, data)
+        pystache.render(agent.RESPONSE_MEMORY_TEMPLATE, data)
+
+    # _filtered_percepts() prints. Keep that out of the timings and the output.
+    with contextlib.redirect_stdout(io.StringIO()):
+        messages = assemble_prompt()
+        result = {
+            "benchmark": "prompt_assembly",
+            "config": vars(args),
+            "prompt_chars": sum(len(m['content']) for m in messages),
+            "n_messages": len(messages),
+            "filtered_percepts": time_it(a._filtered_percepts, args.repeats),
+            "chat_history": time_it(a._filter_chat_history_from_percepts, args.repeats),
+            "assemble_prompt": time_it(assemble_prompt, args.repeats),
+            "fill_templates": time_it(fill_templates, args.repeats),
+            "fill_templates_uncached": time_it(fill_templates_uncached, args.repeats),
+        }
+
+    s_result = json.dumps(result, indent=2)
+    print(s_result)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(s_result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Speech-to-text latency and throughput benchmarks.
+
+Replays a WAV file through VoiceTranscriber, as if it were the microphone, and reports
+how long transcripts take to come back (from capturing the audio they end on), and how
+much faster than real time the whole pipeline runs.
+
+The default "null" backend transcribes nothing, and answers each chunk at once, so it
+measures VoiceTranscriber's own overhead: ring buffer, speech gate, audio thread and
+hand-off to the GUI thread. Use --backend vosk (with VOSK_MODEL_PATH set) to time local
+recognition, or assemblyai for the remote service. Without --wav, a synthetic voiced
+signal is used, which is only good for the null backend. Results are printed as JSON,
+e.g.
+
+    python bench/bench_stt.py --wav speech.wav --backend vosk --speed 0 --output stt_bench.json
+    python bench/bench_stt.py --quick
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+# Some modules print as they're imported, e.g. config.py. Keep stdout for the JSON.
+with contextlib.redirect_stdout(sys.stderr):
+    from record_audio import WavStreamWriter, N_SAMPLES_PER_SECOND, N_SAMPLE_BYTES
+    from session import Session
+    from stt_backends import STTBackend, register_stt_backend
+    from transcribe_audio import VoiceTranscriber
+
+
+class NullBackend(STTBackend):
+    """Answers every chunk straight away with a partial, and a final on close."""
+    name = "null"
+
+    def __init__(self, sample_rate):
+        super().__init__(sample_rate)
+        self._streamed_ms = 0.0
+
+
+    def stream(self, pcm):
+        self._streamed_ms += 1000 * len(pcm) / (N_SAMPLE_BYTES * self.sample_rate)
+        self._emit("...", False, self._streamed_ms)
+
+
+    def close(self):
+        self._emit("...", True, self._streamed_ms)
+
+
+register_stt_backend(NullBackend.name, NullBackend)
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+
+def summarize(values):
+    if not values:
+        return {"n": 0}
+    return {"n": len(values),
+            "p50": statistics.median(values),
+            "p95": percentile(values, 95),
+            "mean": statistics.fmean(values),
+            "max": max(values)}
+
+
+def write_synthetic_wav(filename, seconds):
+    """Bursts of buzzy, syllable-modulated tone, with pauses between them."""
+    t = np.arange(int(seconds * N_SAMPLES_PER_SECOND)) / N_SAMPLES_PER_SECOND
+    voiced = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 20))
+    envelope = (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)) * (np.sin(2 * np.pi * 0.25 * t) > -0.3)
+    signal = voiced * envelope + 0.002 * np.random.default_rng(0).standard_normal(len(t))
+    writer = WavStreamWriter(filename)
+    writer.write((signal / np.abs(signal).max() * 12000).astype(np.int16).tobytes())
+    writer.close()
+
+
+def run_once(args, wav_filename):
+    session = Session()
+    vt = VoiceTranscriber(session=session, stt_backend=args.backend, replay_wav=wav_filename, replay_speed=args.speed)
+
+    t_start = time.perf_counter()
+    vt.start_recording()
+    n_frames = vt.stream.n_frames
+    gate = vt._speech_gate
+
+    # Play the GUI thread's part, at 60 fps, until the file has been fed in.
+    while not vt.stream.finished.is_set():
+        vt.update()
+        time.sleep(1 / 60)
+    vt.stop_recording()
+    vt.update()
+    wall_time = time.perf_counter() - t_start
+
+    audio_seconds = n_frames / N_SAMPLES_PER_SECOND
+    return {
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall_time,
+        "real_time_factor": audio_seconds / wall_time,
+        "audio_to_text": list(vt.latency_stats.audio_to_text),
+        "text_to_gui": list(vt.latency_stats.text_to_gui),
+        "speech_gate": gate.get_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Speech-to-text latency and throughput benchmarks.')
+    parser.add_argument('--wav', default=None, help='16 kHz, 16-bit mono WAV to replay (default: synthetic)')
+    parser.add_argument('--seconds', type=float, default=20.0, help='length of the synthetic audio (default: 20)')
+    parser.add_argument('--backend', default=NullBackend.name, help='STT backend: null, vosk or assemblyai (default: null)')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed, times real time; 0 for flat out (default: 1)')
+    parser.add_argument('--repeats', type=int, default=3, help='times to replay the file (default: 3)')
+    parser.add_argument('--quick', action='store_true', help='short synthetic audio, replayed flat out once, for smoke testing')
+    parser.add_argument('--output', default=None, help='write JSON results to this file')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.seconds, args.speed, args.repeats = 4.0, 0.0, 1
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        wav_filename = args.wav
+        if wav_filename is None:
+            wav_filename = os.path.join(tmp_dir, "synthetic.wav")
+            write_synthetic_wav(wav_filename, args.seconds)
+
+        # Config and friends print while importing and running. Keep stdout for the JSON.
+        with contextlib.redirect_stdout(io.StringIO()):
+            runs = [run_once(args, wav_filename) for _ in range(args.repeats)]
+
+    result = {
+        "benchmark": "stt",
+        "config": vars(args),
+        "environment": {"python": platform.python_version(),
+                        "platform": platform.platform()},
+        "results": {
+            "real_time_factor": summarize([r["real_time_factor"] for r in runs]),
+            "audio_to_text": summarize([x for r in runs for x in r["audio_to_text"]]),
+            "text_to_gui": summarize([x for r in runs for x in r["text_to_gui"]]),
+        },
+        "speech_gate": runs[-1]["speech_gate"],
+    }
+
+    s_result = json.dumps(result, indent=2)
+    print(s_result)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(s_result)
+
+
+if __name__ == "__main__":
+    main()
@@ -46,6 +46,7 @@ class CandlestickPlot(GUIControl):
             self.rows = None
         
         self.draw_bounds = True
+        self.cache_layer = True
         self.scroll = [0, 0]
         self.top_pad = 15
         self.bottom_pad = 15
@@ -74,12 +75,18 @@ class CandlestickPlot(GUIControl):
             self.closes = [float(row[5]) for row in self.rows]
             self.highs = [float(row[3]) for row in self.rows]
             self.lows = [float(row[4]) for row in self.rows]
+        self.set_needs_redraw()
 
 
 
     def draw(self):
+        # The plot only changes when it's scrolled or loads data, so keep it in a layer.
+        if not self._draw_layer(self._draw_plot):
+            self._draw_plot()
 
-        wr = self.get_world_rect()
+
+    def _draw_plot(self):
+        wr = self.get_view_rect()
         y0 = wr.y + self.top_pad
 
         if self.rows is not None:
@@ -113,7 +120,7 @@ class CandlestickPlot(GUIControl):
                     tick_width = 8
 
                 if draw_number:
-                    draw_text(self.renderer, self.font_manager, f'{p:0.1f}', wr.x + self.left_pad - 45, y - 8)
+                    draw_text(self.renderer, self.font_descriptor, f'{p:0.1f}', wr.x + self.left_pad - 45, y - 8)
 
                 sdl2.SDL_RenderDrawLine(self.renderer.sdlrenderer, wr.x + self.left_pad, y, wr.x + self.left_pad - tick_width, y)
 
@@ -163,7 +170,7 @@ class CandlestickPlot(GUIControl):
             sdl2.SDL_SetRenderDrawColor(self.renderer.sdlrenderer, r, g, b, 255)
 
             # Draw the bounding rectangle
-            wr = self.get_world_rect()
+            wr = self.get_view_rect()
             sdl2.SDL_RenderDrawRect(self.renderer.sdlrenderer, wr)
 
             # Reset to the old color
@@ -183,6 +190,6 @@ class CandlestickPlot(GUIControl):
     def scroll_by(self, dx=0, dy=0):
         self.scroll[0] = max(0, self.scroll[0] + dx)  # adjust x_scroll by dx
         self.scroll[1] = max(0, self.scroll[1] + dy)  # adjust y_scroll by dy
-        # self.set_needs_redraw()
+        self.set_needs_redraw()
 
 GUI.register_control_type("CandlestickPlot", CandlestickPlot)
@@ -100,9 +100,14 @@ EXAMPLES:
             else:
                 signal('channel_user_text_message').send(command_text)
 
+        def on_completion_error(llm_request: LLMRequest, error: str):
+            logging.error(f"**** COMMAND DETECTION: Chat completion failed: {error}")
+            self._completion_text = None
+
         llm_request = LLMRequest(prompt=LiteralPrompt(system + "\n" + user),  # @todo make template
                                  handlers=[("start", on_completion_start),
                                            ("next", on_completion_next),
-                                           ("stop", on_completion_done)])
+                                           ("stop", on_completion_done),
+                                           ("error", on_completion_error)])
         llm_request.send_nowait()
         
\ No newline at end of file
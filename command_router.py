@@ -0,0 +1,115 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Routes commands sent on the channel_command signal to their handlers.
+
+CommandListener sends commands like "pan_screen_left(650)" or "stop_listening". The
+router parses each one once, into a name and an argument string, and calls only the
+handlers registered for that name, found with a dict lookup. So a command costs the
+same however many other commands there are. How long each command's handlers take is
+kept for get_stats().
+
+Bound methods are held weakly, as blinker holds signal receivers, so registering a
+GUI or Agent's handlers doesn't keep it alive."""
+
+from collections import deque
+import logging
+import time
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import weakref
+
+from blinker import signal
+
+
+LATENCY_HISTORY_COUNT = 200     # Dispatch times kept per command, for get_stats()
+
+CommandHandler = Callable[[Optional[str]], None]
+
+
+def parse_command(command_text: str) -> Tuple[str, Optional[str]]:
+    """"open_file(foo.txt)" -> ("open_file", "foo.txt"). "stop_listening" ->
+    ("stop_listening", None). The argument is None if the parentheses aren't closed."""
+    name, paren, rest = command_text.strip().partition("(")
+    if not paren or not rest.endswith(")"):
+        return name.strip(), None
+    return name.strip(), rest[:-1].strip()
+
+
+class CommandRouter:
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[], Optional[CommandHandler]]]] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._n_dispatched: Dict[str, int] = {}
+
+
+    def register(self, name: str, handler: CommandHandler) -> None:
+        """handler(args) is called with the text between the command's parentheses, or None."""
+        if hasattr(handler, "__self__"):
+            ref = weakref.WeakMethod(handler)
+        else:
+            ref = lambda: handler
+        self._handlers.setdefault(name, []).append(ref)
+
+
+    def unregister(self, name: str, handler: CommandHandler) -> None:
+        refs = self._handlers.get(name, [])
+        refs[:] = [r for r in refs if r() is not None and r() != handler]
+
+
+    def dispatch(self, command_text: str) -> bool:
+        """Returns whether any handler was registered for the command."""
+        name, args = parse_command(command_text)
+        refs = self._handlers.get(name)
+        if not refs:
+            logging.info(f'CommandRouter: no handler for command "{name}"')
+            return False
+
+        handlers = [r() for r in refs]
+        if None in handlers:
+            refs[:] = [r for r in refs if r() is not None]
+            handlers = [h for h in handlers if h is not None]
+        if not handlers:
+            return False
+
+        t_start = time.perf_counter()
+        for handler in handlers:
+            try:
+                handler(args)
+            except Exception:
+                # One broken handler shouldn't stop the others.
+                logging.exception(f'CommandRouter: handler for "{name}" failed')
+
+        latencies = self._latencies.get(name)
+        if latencies is None:
+            latencies = self._latencies[name] = deque(maxlen=LATENCY_HISTORY_COUNT)
+        latencies.append(time.perf_counter() - t_start)
+        self._n_dispatched[name] = self._n_dispatched.get(name, 0) + 1
+        return True
+
+
+    def get_stats(self) -> Dict[str, dict]:
+        """Per command dispatched: how many times, and how long its handlers took, in ms.
+        The times are over the last n_samples dispatches, at most LATENCY_HISTORY_COUNT."""
+        stats = {}
+        for name, latencies in sorted(self._latencies.items()):
+            ordered = sorted(latencies)
+            def p(percent):
+                return 1000 * ordered[min(len(ordered) - 1, int(percent / 100.0 * len(ordered)))]
+            stats[name] = {"n": self._n_dispatched[name], "n_samples": len(ordered),
+                           "p50_ms": p(50), "p95_ms": p(95), "max_ms": 1000 * ordered[-1]}
+        return stats
+
+
+command_router = CommandRouter()
+signal('channel_command').connect(command_router.dispatch)
@@ -39,6 +39,24 @@ app_config_path.mkdir(exist_ok=True, mode=0o700)  # rwx------ permissions
 GUI_INSET_X = 2
 GUI_INSET_Y = 2
 
+# open_file() shows files bigger than this in a memory-mapped LargeFileViewer, and the
+# agent only gets the first LARGE_FILE_EXCERPT_BYTES of them.
+LARGE_FILE_THRESHOLD_BYTES = 8 * 1024 * 1024
+LARGE_FILE_EXCERPT_BYTES = 4096
+
+# GUI.save() keeps the previous workspace file as a numbered backup, and deletes backups
+# older than the newest WORKSPACE_MAX_BACKUPS. aish3 autosaves the workspace this often.
+WORKSPACE_MAX_BACKUPS = 10
+WORKSPACE_AUTOSAVE_INTERVAL_S = 60
+
+# Synthesized speech is cached in TTS_CACHE_DIR, and the least recently used entries are
+# deleted once it holds more than TTS_CACHE_MAX_BYTES. 64 MB is ~12 minutes of 44.1 kHz speech.
+TTS_CACHE_DIR = app_config_path / "tts_cache"
+TTS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Speech-to-text engine for voice input: "assemblyai", or "vosk" to run locally. See stt_backends.py.
+STT_BACKEND = os.getenv("AISH_STT_BACKEND", "assemblyai")
+
 def setup_logging():
     formatter = logging.Formatter("%(asctime)s [%(levelname)s]: %(message)s")
 
@@ -13,7 +13,7 @@
 # limitations under the License.
 
 
-from typing import Dict, Optional, Tuple
+from typing import Optional, Tuple
 
 import sdl2
 import sdl2.ext
@@ -21,29 +21,12 @@ import sdl2.sdlttf as ttf
 
 from gui.fonts import FontDescriptor, FontRegistry
 from text_edit_buffer import TextEditBuffer
-
-# Key: (font_name, font_size, char)
-_char_width_cache: Dict[Tuple[str, int, str], int] = {}
-
+import text_metrics
 
 def get_char_width(font_descriptor: FontDescriptor, char: str) -> int:
-    global _char_width_cache
-
-    font_manager = FontRegistry().get_fontmanager(font_descriptor)
-    assert(font_manager is not None)
-    font_name = font_manager.default_font
-    font_size = font_manager.size
-    key = (font_name, font_size, char)
-
-    if key in _char_width_cache:
-        return _char_width_cache[key]
-
-    text_surface = font_manager.render(char)
-    char_width = text_surface.w
-    sdl2.SDL_FreeSurface(text_surface)
-
-    _char_width_cache[key] = char_width
-    return char_width
+    metrics = FontRegistry().get_metrics(font_descriptor)
+    assert(metrics is not None)
+    return metrics.advance(char)
 
 
 def draw_rectangle(renderer: 'sdl2.ext.Renderer', rect: sdl2.SDL_Rect) -> None:
@@ -201,14 +184,7 @@ def draw_cursor(renderer: 'sdl2.ext.Renderer',
 
     cursor_height = row_spacing
     
-    x_offset = 0
-    for char in line_unexpanded[:col_unexpanded]:
-        if char == '\t':
-            width = text_buffer.get_tab_spaces() * get_char_width(font_descriptor, ' ')
-        else:
-            width = get_char_width(font_descriptor, char)
-
-        x_offset += width
+    x_offset = text_metrics.column_to_x(font_descriptor, line_unexpanded, col_unexpanded, text_buffer.get_tab_spaces())
 
     x_cursor = x + x_offset - x_scroll
     y_cursor = y + row * row_spacing - y_scroll 
@@ -1,6 +1,8 @@
 import json
 from typing import List
 
+from workspace_writer import write_atomically
+
 class EventStream:
     def __init__(self):
         self._events = []
@@ -15,9 +17,12 @@ class EventStream:
         return self._events
 
 
+    def snapshot(self) -> List[dict]:
+        return list(self._events)
+
+
     def save(self, filename: str):
-        with open(filename, "w") as f:
-            json.dump(self._events, f, indent=2)
+        write_atomically(filename, json.dumps(self.snapshot(), indent=2))
 
 
     def load(self, filename: str):
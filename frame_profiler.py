@@ -0,0 +1,207 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Frame-time profiler.
+
+Code marks the phases of a frame with profiler.section(name, category). The profiler
+keeps a rolling history of per-frame totals for each section, which the overlay draws
+as percentiles, and the raw section timings of recent frames, which can be dumped in
+Chrome trace format and opened in chrome://tracing or https://ui.perfetto.dev.
+
+Times for nested sections are inclusive. E.g. "draw:LLMChatContainer" includes the
+draw time of the chat's TextAreas, which are also counted under "draw:TextArea".
+
+The profiler is off by default, and then section() costs one attribute check."""
+
+import contextlib
+from collections import deque
+import json
+import logging
+import os
+import time
+from typing import Deque, Dict, List, Optional
+
+import sdl2
+
+
+PROFILER_HISTORY_FRAMES = 300   # Frames of per-section totals used for percentiles
+PROFILER_TRACE_FRAMES = 600     # Frames of raw section timings kept for the trace dump
+FRAME_BUDGET_SECONDS = 1.0 / 60
+OVERLAY_MAX_ROWS = 16
+OVERLAY_LINE_SPACING = 16
+OVERLAY_WIDTH = 420
+
+_NULL_SECTION = contextlib.nullcontext()
+
+
+class _Section:
+    __slots__ = ("_profiler", "_key", "_name", "_category", "_args", "_t_start")
+
+    def __init__(self, profiler: "FrameProfiler", name: str, category: str, args: Optional[Dict]):
+        self._profiler = profiler
+        self._key = f"{category}:{name}"
+        self._name = name
+        self._category = category
+        self._args = args
+
+
+    def __enter__(self):
+        self._t_start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler._record(self._key, self._name, self._category, self._args,
+                               self._t_start, time.perf_counter())
+        return False
+
+
+class FrameProfiler:
+    def __init__(self,
+                 history_frames: int = PROFILER_HISTORY_FRAMES,
+                 trace_frames: int = PROFILER_TRACE_FRAMES,
+                 frame_budget: float = FRAME_BUDGET_SECONDS):
+        self.enabled = False
+        self.show_overlay = False
+        self.frame_budget = frame_budget
+
+        self._history_frames = history_frames
+        self._t_epoch = time.perf_counter()
+
+        self._t_frame_start: Optional[float] = None
+        self._frame_totals: Dict[str, float] = {}
+        self._frame_events: List[Dict] = []
+
+        self._history: Dict[str, Deque[float]] = {}
+        self._trace: Deque[List[Dict]] = deque(maxlen=trace_frames)
+        self._n_frames = 0
+
+
+    @property
+    def n_frames(self) -> int:
+        return self._n_frames
+
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._t_frame_start = None
+        self._frame_totals = {}
+        self._frame_events = []
+
+
+    def toggle_overlay(self) -> None:
+        """Show or hide the overlay. Showing it turns profiling on."""
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay and not self.enabled:
+            self.set_enabled(True)
+
+
+    def section(self, name: str, category: str = "frame", **args):
+        """Context manager that times one phase of the current frame. Keyword arguments
+        are attached to the trace event, e.g. the uid of the control being drawn."""
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name, category, args or None)
+
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._t_frame_start = time.perf_counter()
+        self._frame_totals = {}
+        self._frame_events = []
+
+
+    def end_frame(self) -> None:
+        if not self.enabled or self._t_frame_start is None:
+            return
+        t_end = time.perf_counter()
+        self._record("frame:frame", "frame", "frame", {"frame": self._n_frames}, self._t_frame_start, t_end)
+
+        for key, total in self._frame_totals.items():
+            if key not in self._history:
+                self._history[key] = deque(maxlen=self._history_frames)
+            self._history[key].append(total)
+
+        self._trace.append(self._frame_events)
+        self._n_frames += 1
+        self._t_frame_start = None
+        self._frame_totals = {}
+        self._frame_events = []
+
+
+    def _record(self, key: str, name: str, category: str, args: Optional[Dict], t_start: float, t_end: float) -> None:
+        self._frame_totals[key] = self._frame_totals.get(key, 0.0) + (t_end - t_start)
+
+        event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": 0,
+                 "ts": (t_start - self._t_epoch) * 1e6,
+                 "dur": (t_end - t_start) * 1e6}
+        if args:
+            event["args"] = args
+        self._frame_events.append(event)
+
+
+    def percentiles(self, key: str) -> Optional[Dict[str, float]]:
+        """p50, p95, p99 and max of the per-frame totals for key ("category:name"),
+        in seconds. None if key hasn't been seen."""
+        samples = self._history.get(key)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+
+        def p(percent):
+            return ordered[min(len(ordered) - 1, int(percent / 100.0 * len(ordered)))]
+
+        return {"p50": p(50), "p95": p(95), "p99": p(99), "max": ordered[-1]}
+
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles for every section, slowest p95 first."""
+        results = {key: self.percentiles(key) for key in self._history}
+        return dict(sorted(results.items(), key=lambda item: item[1]["p95"], reverse=True))
+
+
+    def dump_chrome_trace(self, filename: str) -> str:
+        """Write the recent frames in Chrome trace event format. Returns the filename."""
+        events = [event for frame_events in self._trace for event in frame_events]
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        logging.info(f'FrameProfiler: wrote {len(self._trace)} frames ({len(events)} events) to "{os.path.abspath(filename)}"')
+        return filename
+
+
+    def draw_overlay(self, renderer, font_descriptor, x: int, y: int) -> None:
+        if not self.show_overlay:
+            return
+        from draw import draw_text, set_color  # circular ref: gui -> gui_container -> frame_profiler
+
+        lines = [f'Frame profile (ms, last {min(self._n_frames, self._history_frames)} frames)',
+                 f'{"section":<28}{"p50":>7}{"p95":>7}{"p99":>7}']
+        over_budget = []
+        for key, ps in list(self.report().items())[:OVERLAY_MAX_ROWS]:
+            over_budget.append(ps["p95"] > self.frame_budget)
+            lines.append(f'{key[:27]:<28}{ps["p50"] * 1000:7.2f}{ps["p95"] * 1000:7.2f}{ps["p99"] * 1000:7.2f}')
+
+        background = sdl2.SDL_Rect(x - 5, y - 5, OVERLAY_WIDTH, len(lines) * OVERLAY_LINE_SPACING + 10)
+        old_color = set_color(renderer, (0, 0, 0, 255))
+        sdl2.SDL_RenderFillRect(renderer.sdlrenderer, background)
+        set_color(renderer, old_color)
+
+        for i, line in enumerate(lines):
+            # Sections whose p95 alone blows the frame budget are drawn in red.
+            color = (255, 80, 80, 255) if i >= 2 and over_budget[i - 2] else (255, 255, 255, 255)
+            draw_text(renderer, font_descriptor, line, x, y + i * OVERLAY_LINE_SPACING, color=color)
+
+
+profiler = FrameProfiler()
@@ -15,6 +15,7 @@
 from .fonts import FontRegistry
 from .gui_control import GUIControl
 from .gui_container import GUIContainer
+from .lazy_control import LazyControl
 from .gui import GUI
 
 
@@ -1,8 +1,10 @@
+import ctypes
 import json
 import os
 from typing import Dict, Union, Tuple, Optional
 
 from sdl2.ext import Color, FontManager
+import sdl2.sdlttf as ttf
 
 
 # Either a name, or a tuple of (filename, size, color)
@@ -43,9 +45,38 @@ def font_descriptor_from_json_str(json_string: str) -> FontDescriptor:
         return "default"
 
 
+class FontMetrics:
+    """Metrics for one open font, in pixels. Glyph advances are measured once per
+    character and cached. They match the width of the surface FontManager.render()
+    returns for that character, which is how draw_text() advances."""
+
+    def __init__(self, ttf_font: ttf.TTF_Font):
+        self.ttf_font = ttf_font
+        self.line_height = ttf.TTF_FontHeight(ttf_font)
+        self.ascent = ttf.TTF_FontAscent(ttf_font)
+        self.descent = ttf.TTF_FontDescent(ttf_font)
+        self.line_skip = ttf.TTF_FontLineSkip(ttf_font)
+        self._advances: Dict[str, int] = {}
+
+
+    def advance(self, char: str) -> int:
+        advance = self._advances.get(char)
+        if advance is None:
+            w, h = ctypes.c_int(), ctypes.c_int()
+            ttf.TTF_SizeUTF8(self.ttf_font, char.encode("utf-8"), ctypes.byref(w), ctypes.byref(h))
+            advance = w.value
+            self._advances[char] = advance
+        return advance
+
+
+    def text_width(self, text: str) -> int:
+        return sum(self.advance(char) for char in text)
+
+
 class FontRegistry:
     _instance = None
     _registry: Dict[FontDescriptor, FontManager]
+    _metrics: Dict[FontDescriptor, FontMetrics]
     _default_path = os.path.abspath(os.path.join(__file__, '../../res/fonts'))
 
 
@@ -53,6 +84,7 @@ class FontRegistry:
         if not cls._instance:
             cls._instance = super(FontRegistry, cls).__new__(cls)
             cls._instance._registry = {}
+            cls._instance._metrics = {}
         return cls._instance
 
 
@@ -75,3 +107,22 @@ class FontRegistry:
 
     def get_fontmanager(self, font_descriptor: FontDescriptor) -> Optional[FontManager]:
         return self._instance._registry.get(font_descriptor)
+
+
+    def get_ttf_font(self, font_descriptor: FontDescriptor) -> Optional[ttf.TTF_Font]:
+        """The TTF font handle behind a registered font. It's owned by the registry's
+        FontManager and shared, so don't close it."""
+        metrics = self.get_metrics(font_descriptor)
+        return metrics.ttf_font if metrics is not None else None
+
+
+    def get_metrics(self, font_descriptor: FontDescriptor) -> Optional[FontMetrics]:
+        metrics = self._instance._metrics.get(font_descriptor)
+        if metrics is None:
+            font_manager = self.get_fontmanager(font_descriptor)
+            if font_manager is None:
+                return None
+            ttf_font = font_manager.fonts[font_manager.default_font][font_manager.size]
+            metrics = FontMetrics(ttf_font)
+            self._instance._metrics[font_descriptor] = metrics
+        return metrics
@@ -14,12 +14,14 @@
 
 from agent import Agent
 from agent_events import AgentEvents
-from blinker import signal
 from collections import deque
 # from command_console import CommandConsole  # circular ref
 from command_listener import CommandListener
+from command_router import command_router
+from config import LARGE_FILE_THRESHOLD_BYTES, TTS_CACHE_DIR
 import ctypes
 import datetime
+import heapq
 import json
 import logging
 import pytz
@@ -32,15 +34,24 @@ import os
 
 from .fonts import FontRegistry
 from .gui_container import GUIContainer
+from .lazy_control import LazyControl
 # from .gui_control import GUIControl  # circular ref
 from rect_utils import rect_union
 from transcribe_audio import VoiceTranscriber
+from tts_cache import TTSCache
 import utils
-from voice_out import VoiceOut
+from voice_out import Utterance, VoiceOut
+from workspace_reader import read_workspace
+from workspace_writer import WorkspaceSaver
 from draw import draw_marker_point, draw_text, set_color
+from frame_profiler import profiler
 from platform_utils import is_cmd_pressed
 
 
+MAX_LAYOUT_ROUNDS = 8
+LAZY_LOAD_MARGIN = 256  # Materialize lazily loaded controls this close to the viewport (pixels)
+
+
 class GUI:
     VOICE_IN_STATE_NOT_LISTENING = 0
     VOICE_IN_STATE_LISTENING_FOR_WAKEWORD = 1
@@ -86,7 +97,8 @@ class GUI:
                 client_session=None, 
                 enable_voice_in=False, 
                 enable_voice_out=False,
-                create_hook: Optional[callable]=None):        
+                create_hook: Optional[callable]=None,
+                lazy_load=False):        
         
         if enable_voice_in:
             try:
@@ -103,7 +115,16 @@ class GUI:
         self.session.gui = weakref.ref(self)
         
         self.session.command_listener = CommandListener(self.session)
-        signal("channel_command").connect(self._on_command)
+        command_router.register("stop_listening", self._on_cmd_stop_listening)
+        command_router.register("create_new_chat_with_llm", self._on_cmd_create_new_chat_with_llm)
+        command_router.register("create_new_text_area", self._on_cmd_create_new_text_area)
+        command_router.register("create_new_label", self._on_cmd_create_new_label)
+        command_router.register("open_file", self._on_cmd_open_file)
+        command_router.register("get_focused_control", self._on_cmd_get_focused_control)
+        command_router.register("pan_screen_left", self._on_cmd_pan_screen_left)
+        command_router.register("pan_screen_right", self._on_cmd_pan_screen_right)
+        command_router.register("pan_screen_down", self._on_cmd_pan_screen_down)
+        command_router.register("pan_screen_up", self._on_cmd_pan_screen_up)
 
         self.renderer = renderer
         self.font_descriptor = font_descriptor
@@ -112,6 +133,15 @@ class GUI:
         # assert(self.renderer)
         # assert(self.font_descriptor)
 
+        # When defer_layout is set, GUIContainer.updateLayout() only schedules the container
+        # here, and resolve_layouts() lays out everything pending at once, before drawing.
+        # Otherwise, layout runs immediately, cascading up through every ancestor.
+        self.defer_layout = False
+        self._pending_layouts = {}
+        self.layout_requests = 0            # updateLayout() calls on containers
+        self.layout_passes = 0              # Container layouts actually run
+        self.layout_passes_last_resolve = 0
+
         self._content = GUIContainer(gui=self, inset=(0, 0), name="GUI Content Root", can_focus=False, z_order=0)
                 
         # May be self.content or any depth of descendant of self.content
@@ -123,16 +153,32 @@ class GUI:
         self.set_view_pos(0, 0)
         self._viewport_bookmarks = {}
 
+        # When lazy_load is set, load() only builds the top-level controls' bounding rects,
+        # as LazyControls. Each is materialized when it comes near the viewport, or when
+        # find_controls() searches the workspace.
+        self.lazy_load = lazy_load
+        self._lazy_controls: List[LazyControl] = []
+        self._lazy_checked_view_rect = None
+
+        # save() snapshots the workspace here, and the saver writes it on a worker thread.
+        # When autosave_interval (seconds) is set, update() saves that often, if anything
+        # has changed.
+        self._saver = WorkspaceSaver(json_encoder=GUI.JSONEncoder)
+        self.autosave_interval: Optional[float] = None
+        self._t_last_save = time.time()
+
         self.workspace_filename = workspace_filename
         if self.workspace_filename is not None:
             self.load()
 
         if enable_voice_out:
-            self._voice_out = VoiceOut(on_speech_done=[self._on_speech_done])
+            self._voice_out = VoiceOut(on_speech_done=[self._on_speech_done], cache=TTSCache(TTS_CACHE_DIR))
         else:
             self._voice_out = None
-        self._saying_text = None
-        self._next_texts_to_say = []
+        # Utterances begun, and finished playing. Only the main thread changes the first,
+        # and only VoiceOut's worker the second.
+        self._n_utterances_begun = 0
+        self._n_utterances_done = 0
 
 
         # Voice Input
@@ -161,6 +207,7 @@ class GUI:
         self._clickstream = deque(maxlen=2)
 
         self._content._inset = (0, 0)
+        self._content._invalidate_world_transform()
 
         self.listening_indicator: "GUIControl" = None  
         self.command_console: "CommandConsole" = None
@@ -265,6 +312,12 @@ class GUI:
     
 
     def on_quit(self):
+        # Don't lose a save that's still being written.
+        self._saver.close()
+
+        if self._voice_out is not None:
+            self._voice_out.close()
+
         # Do depth-first traversal
         q = [self.content()]
         while len(q) > 0:
@@ -277,31 +330,37 @@ class GUI:
 
     def say(self, text):
         logging.debug(f'GUI.say({text})')
+        utterance = self.begin_saying()
+        if utterance is not None:
+            utterance.feed(text)
+            utterance.end()
 
-        if self._saying_text is None:
-            self._saying_text = text
 
-            if self.voice_in_enabled:
-                if self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_SPEECH:
-                    self._voice_in.stop_recording()
-                elif self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_WAKEWORD and self._voice_wakeup is not None:
-                    self._voice_wakeup.stop()
-                    self._voice_wakeup = None
+    def begin_saying(self) -> Optional[Utterance]:
+        """Starts an utterance whose text is given a piece at a time, with feed(), e.g. as
+        an LLM response streams in, and finished with end(). It's spoken a sentence at a
+        time, after any that were begun before it. Returns None if voice out is off."""
+        if self._voice_out is None:
+            return None
 
-            # if self._voice_out:
-            #     self._voice_out.say(text)
+        if self._n_utterances_begun == self._n_utterances_done and self.voice_in_enabled:
+            # Don't listen to ourselves.
+            if self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_SPEECH:
+                self._voice_in.stop_recording()
+            elif self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_WAKEWORD and self._voice_wakeup is not None:
+                self._voice_wakeup.stop()
+                self._voice_wakeup = None
 
-        else:
-            self._next_texts_to_say.append(text)
+        self._n_utterances_begun += 1
+        return self._voice_out.begin()
 
 
     def _on_speech_done(self):
-        self._saying_text = None
+        self._n_utterances_done += 1
 
-        if self.voice_in_enabled:
-            # If we were actively listening before text_buffer_set_textsaying speech, then return to active listening...
-            if len(self._next_texts_to_say) == 0 and \
-                self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_SPEECH and \
+        if self.voice_in_enabled and self._n_utterances_done == self._n_utterances_begun:
+            # If we were actively listening before saying speech, then return to active listening...
+            if self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_SPEECH and \
                 not self._voice_in.is_recording():
 
                 self._voice_in.start_recording()
@@ -310,8 +369,7 @@ class GUI:
                 #     self.command_listener = VoiceCommandListener(session=self.session, on_command=self._on_command)
 
             # If we were waiting for the wakeup phrase, then go back to doing that
-            elif len(self._next_texts_to_say) == 0 and \
-                self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_WAKEWORD and \
+            elif self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_WAKEWORD and \
                 self._voice_wakeup is None:
 
                 self._start_listening_wakeword()
@@ -331,116 +389,104 @@ class GUI:
         #     self.command_listener = VoiceCommandListener(session=self.session, on_command=self._on_command)
 
 
-    def _on_command(self, command: str) -> None:
-        logging.info(f'GUI._on_command({command})')
+    # Command handlers, called by command_router with the text between the command's
+    # parentheses, or None.
 
+    @staticmethod
+    def _command_arg(args: Optional[str]) -> str:
         # @todo make sanitization routines
-        command = command.replace('"', "")
-        command = command.replace("'", "")
+        if args is None:
+            return ""
+        return args.replace('"', "").replace("'", "").strip()
+
 
+    def _mouse_world_pos(self):
         vx, vy = self.get_mouse_position()
+        return self.view_to_world(vx, vy)
 
-        if command == "stop_listening":
-            logging.info('Command: stop listening')
-            self._should_stop_voice_in = True
-
-        elif command == "create_new_chat_with_llm":
-            wx, wy = self.view_to_world(vx, vy)
-            self.cmd_new_llm_chat(wx, wy)
-
-        elif command == "create_new_text_area":                        
-            wx, wy = self.view_to_world(vx, vy)
-            self.cmd_new_text_area(wx=wx, wy=wy)    # @todo: how to specify initial text @bug
-
-        elif command.startswith("create_new_label"):
-            # Get the optional text
-            text = ""
-            if command.startswith("create_new_label("):
-                i_start = len("create_new_label(")
-                i_end = command.find(")")
-                if i_end > i_start:
-                    text = command[i_start:i_end]
-
-            wx, wy = self.view_to_world(vx, vy)
-            self.cmd_new_label(wx, wy, text=text)
-
-        elif command.startswith("open_file("):
-                i_start = len("open_file(")
-                i_end = command.find(")")
-                if i_end > i_start:
-                    path_string = command[i_start:i_end].strip()
-                    if not os.path.exists(path_string):
-                        contents = f"File '{path_string}' not found."
-                    else:
-                        # @todo: move this into agent
-                        try:
-                            with open(path_string, 'r') as f:
-                                contents = f.read()
-                                if self.agent:
-                                    self.agent.put_event(AgentEvents.create_event("OpenedFile", path=path_string, contents=contents))
-                                    self.agent._files.append({'object_type': 'file', 'path': path_string, 'contents': contents})
-                        except:
-                            contents = f"Unknown error opening file '{path_string}'."
-
-                    # Create a new TextArea to show the results
-                    wx, wy = self.view_to_world(vx, vy)
-                    ta = self.cmd_new_text_area(text=contents, wx=wx, wy=wy) 
-                    ta.set_size(700, 600)
-
-        elif command == "get_focused_control":
-            # Get the focused control
-            focused_control = self.get_focus()
-            if focused_control:
-                contents = focused_control.uid
-            else:
-                contents = "None"
 
-            wx, wy = self.view_to_world(vx, vy)
-            self.cmd_new_text_area(text=contents, wx=wx, wy=wy)
-                    
+    def _on_cmd_stop_listening(self, args: Optional[str]) -> None:
+        logging.info('Command: stop listening')
+        self._should_stop_voice_in = True
+
+
+    def _on_cmd_create_new_chat_with_llm(self, args: Optional[str]) -> None:
+        wx, wy = self._mouse_world_pos()
+        self.cmd_new_llm_chat(wx, wy)
+
+
+    def _on_cmd_create_new_text_area(self, args: Optional[str]) -> None:
+        wx, wy = self._mouse_world_pos()
+        self.cmd_new_text_area(wx=wx, wy=wy)    # @todo: how to specify initial text @bug
+
+
+    def _on_cmd_create_new_label(self, args: Optional[str]) -> None:
+        wx, wy = self._mouse_world_pos()
+        self.cmd_new_label(wx, wy, text=self._command_arg(args))
+
+
+    def _on_cmd_open_file(self, args: Optional[str]) -> None:
+        path_string = self._command_arg(args)
+        if not path_string:
+            return
+
+        wx, wy = self._mouse_world_pos()
+        if not os.path.exists(path_string):
+            contents = f"File '{path_string}' not found."
+        elif os.path.getsize(path_string) > LARGE_FILE_THRESHOLD_BYTES:
+            self.cmd_open_large_file(path_string, wx, wy)
+            return
         else:
-            pan_screen_prefix = "pan_screen_"
-            if command.startswith(pan_screen_prefix):
-                dx_pixels = 400
-                dy_pixels = 300
-
-                pan_screen_left = pan_screen_prefix + "left("
-                if command.startswith(pan_screen_left):
-                    dy_pixels = 0
-                    i_start = len(pan_screen_left)
-                    i_end = command.find(")")
-                    if i_end > i_start:
-                        dx_pixels = int(command[i_start:i_end])
-                    dx_pixels = -dx_pixels
-
-                pan_screen_right = pan_screen_prefix + "right("
-                if command.startswith(pan_screen_right):
-                    dy_pixels = 0
-                    i_start = len(pan_screen_right)
-                    i_end = command.find(")")
-                    if i_end > i_start:
-                        dx_pixels = int(command[i_start:i_end])
-
-                pan_screen_down = pan_screen_prefix + "down("
-                if command.startswith(pan_screen_down):
-                    dx_pixels = 0
-                    i_start = len(pan_screen_down)
-                    i_end = command.find(")")
-                    if i_end > i_start:
-                        dy_pixels = int(command[i_start:i_end])
-
-                pan_screen_up = pan_screen_prefix + "up("
-                if command.startswith(pan_screen_up):
-                    dx_pixels = 0
-                    i_start = len(pan_screen_up)
-                    i_end = command.find(")")
-                    if i_end > i_start:
-                        dy_pixels = int(command[i_start:i_end])
-                    dy_pixels = -dy_pixels
+            # @todo: move this into agent
+            try:
+                with open(path_string, 'r') as f:
+                    contents = f.read()
+                    if self.agent:
+                        self.agent.put_event(AgentEvents.create_event("OpenedFile", path=path_string, contents=contents))
+                        self.agent._files.append({'object_type': 'file', 'path': path_string, 'contents': contents})
+            except:
+                contents = f"Unknown error opening file '{path_string}'."
 
+        # Create a new TextArea to show the results
+        ta = self.cmd_new_text_area(text=contents, wx=wx, wy=wy)
+        ta.set_size(700, 600)
+
+
+    def _on_cmd_get_focused_control(self, args: Optional[str]) -> None:
+        focused_control = self.get_focus()
+        if focused_control:
+            contents = focused_control.uid
+        else:
+            contents = "None"
+
+        wx, wy = self._mouse_world_pos()
+        self.cmd_new_text_area(text=contents, wx=wx, wy=wy)
+
+
+    def _on_cmd_pan_screen_left(self, args: Optional[str]) -> None:
+        self._pan_screen(args, -1, 0)
 
-                wx, wy = self.get_view_pos()
-                self.set_view_pos(wx + dx_pixels, wy + dy_pixels)
+
+    def _on_cmd_pan_screen_right(self, args: Optional[str]) -> None:
+        self._pan_screen(args, 1, 0)
+
+
+    def _on_cmd_pan_screen_down(self, args: Optional[str]) -> None:
+        self._pan_screen(args, 0, 1)
+
+
+    def _on_cmd_pan_screen_up(self, args: Optional[str]) -> None:
+        self._pan_screen(args, 0, -1)
+
+
+    def _pan_screen(self, args: Optional[str], x_sign: int, y_sign: int) -> None:
+        n_pixels = 400 if x_sign else 300
+        arg = self._command_arg(args)
+        if arg:
+            n_pixels = int(arg)
+
+        wx, wy = self.get_view_pos()
+        self.set_view_pos(wx + x_sign * n_pixels, wy + y_sign * n_pixels)
 
 
 
@@ -560,11 +606,8 @@ class GUI:
                     dy = xy1[1] - xy0[1]
 
                     if self._drag_control:
-                        new_r = sdl2.SDL_Rect(self._drag_control.bounding_rect.x + dx,
-                                               self._drag_control.bounding_rect.y + dy,
-                                               self._drag_control.bounding_rect.w,
-                                               self._drag_control.bounding_rect.h)
-                        self._drag_control.bounding_rect = new_r
+                        self._drag_control.set_position(self._drag_control.bounding_rect.x + dx,
+                                                        self._drag_control.bounding_rect.y + dy)
                     else:
                         self.set_view_pos(self._viewport_pos[0] - dx, self._viewport_pos[1] - dy)
 
@@ -604,6 +647,26 @@ class GUI:
         return textArea
 
 
+    def cmd_open_large_file(self, path: str, wx: int, wy: int) -> "LargeFileViewer":
+        """Show a file that's too big to read into a TextArea. It's memory-mapped and
+        paged in as it's scrolled. The agent gets the path and an excerpt, not the
+        whole contents. Expects wx, and wy to be world (workspace) coordinates."""
+
+        logging.info(f'Command: open large file "{path}"')
+
+        parent = self.content()
+        x, y = parent.world_to_local(wx, wy)
+        viewer = self.create_control("LargeFileViewer", path=path, w=700, h=600, x=x, y=y)
+        parent.add_child(viewer)
+
+        if self.agent:
+            excerpt = viewer.mapped_file.excerpt()
+            self.agent.put_event(AgentEvents.create_event("OpenedFile", path=path, contents=excerpt,
+                                                          size_bytes=viewer.mapped_file.size, is_excerpt=True))
+            self.agent._files.append({'object_type': 'file', 'path': path, 'contents': excerpt})
+        return viewer
+
+
     def cmd_new_llm_chat(self, wx: int, wy: int) -> None:
         """Expects wx, and wy to be world (workspace) coordinates."""
         
@@ -750,6 +813,14 @@ class GUI:
                 self.cmd_new_llm_chat(wx, wy)
                 return True  # event was handled
 
+            # Cmd+P toggles the frame profiler overlay. Shift+Cmd+P dumps a Chrome trace.
+            if keySym == sdl2.SDLK_p:
+                if shiftPressed:
+                    profiler.dump_chrome_trace(utils.unique_filename("aish_frame_trace.json"))
+                else:
+                    profiler.toggle_overlay()
+                return True
+
             # Cmd+R say something
             if keySym == sdl2.SDLK_r:
                 self.say("One, one-thousand. Two one-thousand. Three one-thousand. Do not call logging or print from this function! It's time-critical! You've touched upon a fascinating aspect of language models and artificial intelligence in general. While language models like mine lack true understanding and consciousness, they can indeed produce remarkably coherent and contextually relevant text, often to the point of surprising users.")
@@ -869,11 +940,6 @@ class GUI:
             #     self.voice_transcript._visible = False
 
 
-        # Do we have queued text to say?
-        if self._saying_text is None and len(self._next_texts_to_say) > 0:
-            self._saying_text = self._next_texts_to_say.pop(0)
-            self._voice_out.say(self._saying_text)
-
         # Voice In
         if self._voice_in_state == GUI.VOICE_IN_STATE_LISTENING_FOR_SPEECH and self._voice_in is not None:
             
@@ -897,10 +963,53 @@ class GUI:
                 self._voice_in_state = GUI.VOICE_IN_STATE_LISTENING_FOR_WAKEWORD
                 # self.say("Okay")
 
+        if self.autosave_interval is not None and self.workspace_filename is not None and \
+            time.time() - self._t_last_save >= self.autosave_interval:
+            self.save(skip_if_unchanged=True, save_memories=False)
+
         # Update components
         for c in self.content():
             if hasattr(c, 'on_update'):
-                c.on_update(dt)
+                with profiler.section(c.__class__.__name__, "update"):
+                    c.on_update(dt)
+
+
+    def schedule_layout(self, container: "GUIContainer") -> None:
+        self.layout_requests += 1
+        self._pending_layouts[container] = None
+
+
+    def resolve_layouts(self) -> int:
+        """Run every scheduled container layout once, deepest containers first, so that
+        each parent sizes itself to children that are already laid out. Returns the number
+        of layout passes run."""
+        n_passes = 0
+        with profiler.section("layout"):
+            # Laying out can schedule more, e.g. when a child's size changes. Don't spin forever.
+            for _ in range(MAX_LAYOUT_ROUNDS):
+                if not self._pending_layouts:
+                    break
+                pending = self._pending_layouts
+                self._pending_layouts = {}
+
+                heap = []
+                queued = set()
+                for container in pending:
+                    heapq.heappush(heap, (-len(self.get_ancestor_chain(container)), len(queued), container))
+                    queued.add(container)
+
+                while heap:
+                    depth, _, container = heapq.heappop(heap)
+                    container._layout_now()
+                    n_passes += 1
+
+                    parent = container.parent
+                    if parent is not None and parent not in queued:
+                        heapq.heappush(heap, (depth + 1, len(queued), parent))
+                        queued.add(parent)
+
+        self.layout_passes_last_resolve = n_passes
+        return n_passes
 
 
     def draw(self):
@@ -908,6 +1017,12 @@ class GUI:
         # print(f'Viewport pos: {self._viewport_pos}')
         # print(f'content rect: {self.content().bounding_rect}')
         
+        if self._lazy_controls:
+            self._materialize_lazy_controls_in_view()
+
+        if self._pending_layouts:
+            self.resolve_layouts()
+
         if self._content:
             self._content.draw()
 
@@ -983,6 +1098,7 @@ class GUI:
                 self._focused_control != control:
 
                     self._focused_control._change_focus(False)
+                    self._focused_control.mark_dirty()  # Focus is drawn
                     self._focused_control = None
 
             # Focus is switching -- we need to update the FocusRing stack. It's gnarlier, but also
@@ -1003,12 +1119,14 @@ class GUI:
             
             # Set focus on the control.
             self._focused_control = control
+            control.mark_dirty()
                     
             return self._focused_control._change_focus(True)
         else:
             # Make sure it's not focused.
             if self._focused_control == control:
                 self._focused_control = None
+            control.mark_dirty()
             return control._change_focus(False)
         
 
@@ -1118,40 +1236,51 @@ class GUI:
         return None
     
 
-    def save(self):
-        # logging.debug("Control positions before saving...")
-        # self.debug_dump_control_uids_and_coords()
-
+    def snapshot_workspace(self) -> dict:
+        """The workspace as plain JSON-able values, ready to be written out."""
         utc_now = datetime.datetime.now(pytz.utc)
         local_timezone = get_localzone()
         local_now = utc_now.astimezone(local_timezone)
 
+        self.resolve_layouts()
+        return {
+            "version": "0.2",
+            "saved_at_utc": utc_now.isoformat(),
+            "saved_at_local": local_now.isoformat(),
+            "gui": self.__json__(),
+            "viewport_bookmarks": dict(self._viewport_bookmarks),
+            "viewport_pos": self._viewport_pos
+        }
+
+
+    def save(self, wait: bool=False, skip_if_unchanged: bool=False, save_memories: bool=True):
+        """Snapshot the workspace, and the agent's memories and percepts, and write them in
+        the background. The previous files are kept as backups. If wait is True, return only
+        once they've been written."""
+        # logging.debug("Control positions before saving...")
+        # self.debug_dump_control_uids_and_coords()
+
         logging.info("Saving GUI...")
+        t_start = time.perf_counter()
+        with profiler.section("snapshot", "save"):
+            snapshot = self.snapshot_workspace()
+        self._saver.submit(self.workspace_filename, snapshot, skip_if_unchanged=skip_if_unchanged)
+        self._t_last_save = time.time()
+        logging.info(f"Snapshot of workspace taken in {1000 * (time.perf_counter() - t_start):.1f} ms. "
+                     f"Saving to \"{os.path.abspath(self.workspace_filename)}\" in the background.")
 
-        unique_filename = utils.unique_filename(self.workspace_filename)
-        if unique_filename != self.workspace_filename:
-            logging.info(f"Backing up existing workspace file to \"{os.path.abspath(unique_filename)}\"")
-            os.rename(self.workspace_filename, unique_filename)
-        logging.info(f"Saving workspace file to \"{os.path.abspath(self.workspace_filename)}\"")
-
-        with open(self.workspace_filename, "w") as f:
-            print(self._viewport_bookmarks)
-            print(f'Viewport pos: {self._viewport_pos}')
-
-            gui_json = {
-                "version": "0.2",
-                "saved_at_utc": utc_now.isoformat(),
-                "saved_at_local": local_now.isoformat(),
-                "gui": self.__json__(),
-                "viewport_bookmarks": self._viewport_bookmarks,
-                "viewport_pos": self._viewport_pos
-            }
-            json.dump(gui_json, f, indent=2, cls=GUI.JSONEncoder)
+        if save_memories and self.agent:
+            with profiler.section("snapshot_memories", "save"):
+                memory_snapshots = self.agent.memory_snapshots()
+            for filename, memory_snapshot in memory_snapshots.items():
+                self._saver.submit(filename, memory_snapshot, skip_if_unchanged=skip_if_unchanged)
+
+        if wait:
+            self._saver.wait()
 
-        if self.agent:
-            self.agent.save_memories()
 
-        logging.info("GUI saved.")
+    def get_save_stats(self) -> dict:
+        return self._saver.get_stats()
 
 
     def load(self):
@@ -1163,10 +1292,13 @@ class GUI:
         print(f'self.workspace_filename: {self.workspace_filename}')
         try:
             with open(self.workspace_filename, "r") as f:
-                gui_json = json.load(f)
-                content_json = gui_json["gui"]["content"]
-                gui_class = GUI.control_class(content_json["class"])
-                self._content = gui_class.from_json(content_json, gui=self)
+                if self.lazy_load:
+                    gui_json = self._load_lazily(f)
+                else:
+                    gui_json = json.load(f)
+                    content_json = gui_json["gui"]["content"]
+                    gui_class = GUI.control_class(content_json["class"])
+                    self._content = gui_class.from_json(content_json, gui=self)
                 self._viewport_bookmarks = gui_json.get("viewport_bookmarks", {})
                 
                 vx, vy = gui_json.get("viewport_pos", (0, 0))
@@ -1192,6 +1324,85 @@ class GUI:
         return True
 
 
+    def _load_lazily(self, f) -> dict:
+        """Stream the workspace in, building a LazyControl for each top-level control
+        instead of the control itself. Returns the rest of the workspace JSON."""
+        t_start = time.perf_counter()
+        children = []
+
+        def on_content_child(child_json):
+            try:
+                child_class = GUI.control_class(child_json["class"])
+            except KeyError:
+                logging.warning(f'Could not find class {child_json["class"]}')
+                return
+
+            if child_class.lazy_loadable:
+                children.append(LazyControl(child_json, gui=self))
+            else:
+                child = child_class.from_json(child_json, gui=self)
+                if child is not None:
+                    children.append(child)
+
+        gui_json = read_workspace(f, on_content_child)
+
+        content_json = gui_json["gui"]["content"]
+        gui_class = GUI.control_class(content_json["class"])
+        self._content = gui_class.from_json(content_json, gui=self)
+        for child in children:
+            self._content.add_child(child, updateLayout=False)
+        self._content.updateLayout()
+
+        self._lazy_controls = [c for c in children if isinstance(c, LazyControl)]
+        self._lazy_checked_view_rect = None
+        logging.info(f'GUI: indexed {len(self._lazy_controls)} lazily loaded controls in {time.perf_counter() - t_start:.3f} s')
+        return gui_json
+
+
+    def materialize_lazy_controls(self, world_rect: Optional[sdl2.SDL_Rect] = None) -> int:
+        """Build the real controls for lazily loaded placeholders. Only those that overlap
+        world_rect, if it's given. Returns how many were built."""
+        n_materialized = 0
+        still_lazy = []
+        for lazy in self._lazy_controls:
+            if lazy.parent is None:
+                continue  # Removed from the workspace before it was ever looked at
+            if world_rect is None or sdl2.SDL_HasIntersection(lazy.get_world_rect(), world_rect):
+                with profiler.section(lazy.get_class_name(), "materialize"):
+                    lazy.materialize()
+                n_materialized += 1
+            else:
+                still_lazy.append(lazy)
+
+        self._lazy_controls = still_lazy
+        return n_materialized
+
+
+    def _materialize_lazy_controls_in_view(self) -> None:
+        w, h = ctypes.c_int(0), ctypes.c_int(0)
+        if self.renderer is not None:
+            sdl2.SDL_GetRendererOutputSize(self.renderer.sdlrenderer, ctypes.byref(w), ctypes.byref(h))
+
+        vx, vy = self.get_view_pos()
+        view_rect = (vx - LAZY_LOAD_MARGIN, vy - LAZY_LOAD_MARGIN, w.value + 2 * LAZY_LOAD_MARGIN, h.value + 2 * LAZY_LOAD_MARGIN)
+        if view_rect == self._lazy_checked_view_rect:
+            return
+
+        self._lazy_checked_view_rect = view_rect
+        self.materialize_lazy_controls(sdl2.SDL_Rect(*view_rect))
+
+
+    def find_controls(self, predicate: "callable") -> "List[GUIControl]":
+        """All controls in the workspace for which predicate(control) is True. Lazily
+        loaded controls are materialized first, so that they can be searched."""
+        if self._lazy_controls:
+            self.materialize_lazy_controls()
+
+        found = []
+        GUI._depth_first_traversal(self.content(), lambda c: found.append(c) if predicate(c) else None)
+        return found
+
+
     def _depth_first_traversal(c: "GUIControl", f: "callable") -> None:
         if hasattr(c, "children"):
             for child in c.children:
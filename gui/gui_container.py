@@ -19,6 +19,7 @@ import sdl2
 
 from config import GUI_INSET_X, GUI_INSET_Y
 from draw import draw_marker_point
+from frame_profiler import profiler
 
 import gui
 from gui_layout import ColumnLayout
@@ -127,7 +128,17 @@ class GUIContainer(GUIControl):
     def draw(self):
         if not self._visible:
             return
-        
+
+        # Screen-relative children don't move with the viewport, so they can't be cached
+        # in a layer that does.
+        if self.cache_layer and not any(c.is_screen_relative() for c in self.children):
+            if self._draw_layer(self._draw_contents):
+                return
+
+        self._draw_contents()
+
+
+    def _draw_contents(self):
         vr = self.get_view_rect()
 
         # Draw own bounding rect
@@ -159,7 +170,8 @@ class GUIContainer(GUIControl):
         # Draw children
         for child in self:
             if child._visible:
-                child.draw()
+                with profiler.section(child.__class__.__name__, "draw"):
+                    child.draw()
 
         # @debug @todo make this a runtime flag
         # DEBUG_DRAW
@@ -171,6 +183,12 @@ class GUIContainer(GUIControl):
 
 
 
+    def release_layer(self):
+        super().release_layer()
+        for child in self.children:
+            child.release_layer()
+
+
     def get_children(self):
         return self.children if self.children else []
 
@@ -181,6 +199,7 @@ class GUIContainer(GUIControl):
         child.parent = self
         self.children.append(child)
         child.z_order = len(self.children)  # Set z-order based on the number of children
+        self.mark_dirty()
 
         if updateLayout:
             self.updateLayout()
@@ -192,22 +211,51 @@ class GUIContainer(GUIControl):
             self.gui.set_focus(child, False)
 
         child.parent = None
+        child.release_layer()
         self._update_z_order()  # Update z-order after removing a child
+        self.mark_dirty()
 
         child.parent = None
         self.updateLayout()
 
 
+    def replace_child(self, old_child, new_child):
+        """Put new_child where old_child is, keeping its z-order."""
+        i = self.children.index(old_child)
+        if self.gui.get_focus() == old_child:
+            self.gui.set_focus(old_child, False)
+
+        old_child.parent = None
+        old_child.release_layer()
+
+        self.children[i] = new_child
+        new_child.parent = self
+        new_child.z_order = old_child.z_order
+        self.mark_dirty()
+        self.updateLayout()
+
+
     def updateLayout(self):
         # print(f'GUIContainer.updateLayout(): self={self}')
-        if self.layout is not None:
-            self.layout.update()
+        if self.gui.defer_layout:
+            # Parents are laid out after us when the GUI resolves pending layouts.
+            self.gui.schedule_layout(self)
+            return
 
-        self.sizeToChildren()
+        self.gui.layout_requests += 1
+        self._layout_now()
 
         if self.parent is not None:
             self.parent.updateLayout()
 
+
+    def _layout_now(self):
+        self.gui.layout_passes += 1
+        if self.layout is not None:
+            self.layout.update()
+
+        self.sizeToChildren()
+
     def _update_z_order(self):
         for index, child in enumerate(self.children):
             child.z_order = index
@@ -217,6 +265,7 @@ class GUIContainer(GUIControl):
             self.children.remove(child)
             self.children.append(child)
             self._update_z_order()
+            self.mark_dirty()
 
     # I've had so many problems with this sizeToChildren code.
     # Frankly, as a linear-algebra-comfortable game developer, it's a bit embarassing
@@ -15,11 +15,16 @@
 
 import sdl2
 from config import GUI_INSET_X, GUI_INSET_Y
+from frame_profiler import profiler
 import uuid
 import weakref
 
 
 class GUIControl:
+    # Whether GUI.load() may leave this control as a LazyControl until it's in view.
+    # Controls that must run while off-screen should set this to False.
+    lazy_loadable = True
+
     @classmethod
     def from_json(cls, json, **kwargs):
         assert(json["class"] == cls.__name__)
@@ -115,13 +120,68 @@ class GUIControl:
         # assert(self.font_descriptor)
 
         self._can_focus = can_focus
+
+        # World coordinates of our content area origin, and our most senior screen-relative
+        # ancestor. Computed on demand, and cleared for the whole subtree when we or an
+        # ancestor move or are reparented.
+        self._world_transform = None
         self.parent = None
+
+        # Retained-mode drawing. A control is dirty when it looks different from the last
+        # time it was drawn. Controls with cache_layer set draw themselves (and their
+        # children) into a texture, which is only re-rendered when they're dirty.
+        self._dirty = True
+        self.cache_layer = False
+        self._layer_texture = None
+        self._layer_size = None
+
         self.set_bounds(x, y, w, h)
         self.pulse_busy = False
         self.editor = None
         self._pre_event_snoops = []
 
 
+    @property
+    def parent(self):
+        return self._parent
+
+
+    @parent.setter
+    def parent(self, parent):
+        self._parent = parent
+        self._invalidate_world_transform()
+
+
+    def _invalidate_world_transform(self):
+        # If our transform isn't cached, neither is any descendant's, since theirs are
+        # computed from ours.
+        if self._world_transform is None:
+            return
+        self._world_transform = None
+        for child in getattr(self, "children", None) or ():
+            child._invalidate_world_transform()
+
+
+    def _get_world_transform(self):
+        transform = self._world_transform
+        if transform is None:
+            ox = self.bounding_rect.x + self._inset[0]
+            oy = self.bounding_rect.y + self._inset[1]
+            screen_relative_ancestor = None
+
+            parent = self._parent
+            if parent is not None:
+                parent_ox, parent_oy, screen_relative_ancestor = parent._get_world_transform()
+                ox += parent_ox
+                oy += parent_oy
+                if screen_relative_ancestor is None and parent.is_screen_relative():
+                    screen_relative_ancestor = parent
+
+            transform = (ox, oy, screen_relative_ancestor)
+            self._world_transform = transform
+        return transform
+
+
     @property
     def uid(self):
         return self._uid
@@ -150,6 +210,85 @@ class GUIControl:
             self.bounding_rect.h = h
         else:
             self.bounding_rect = sdl2.SDL_Rect(x, y, w, h)
+        self._invalidate_world_transform()
+        self.mark_dirty()
+
+
+    def mark_dirty(self):
+        """This control looks different from the last time it was drawn. Ancestors are
+        marked too, because any cached layer that contains this control is now stale."""
+        control = self
+        while control is not None:
+            control._dirty = True
+            control = control.parent
+
+
+    def is_dirty(self) -> bool:
+        return self._dirty
+
+
+    def set_needs_redraw(self):
+        """Controls that cache what they draw override this to drop their cache. They
+        must still call this to mark themselves dirty."""
+        self.mark_dirty()
+
+
+    def _draw_layer(self, draw_contents) -> bool:
+        """Draw through this control's cached layer: a texture holding what draw_contents()
+        draws, re-rendered only when this control is dirty, and otherwise just copied to
+        the screen. Returns False, having drawn nothing, if there's no renderer or it
+        doesn't support render targets. The caller should then draw directly."""
+        if self.renderer is None:
+            return False
+        sdlrenderer = self.renderer.sdlrenderer
+        w, h = self.bounding_rect.w, self.bounding_rect.h
+        if w <= 0 or h <= 0:
+            return True
+
+        if self._layer_texture is not None and self._layer_size != (w, h):
+            self.release_layer()
+
+        if self._layer_texture is None:
+            texture = sdl2.SDL_CreateTexture(sdlrenderer, sdl2.SDL_PIXELFORMAT_ARGB8888, sdl2.SDL_TEXTUREACCESS_TARGET, w, h)
+            if not texture:
+                return False
+            sdl2.SDL_SetTextureBlendMode(texture, sdl2.SDL_BLENDMODE_BLEND)
+            self._layer_texture = texture
+            self._layer_size = (w, h)
+            self._dirty = True
+
+        if self._dirty:
+            with profiler.section(self.__class__.__name__, "layer"):
+                old_target = sdl2.SDL_GetRenderTarget(sdlrenderer)
+                sdl2.SDL_SetRenderTarget(sdlrenderer, self._layer_texture)
+
+                r, g, b, a = sdl2.Uint8(), sdl2.Uint8(), sdl2.Uint8(), sdl2.Uint8()
+                sdl2.SDL_GetRenderDrawColor(sdlrenderer, r, g, b, a)
+                sdl2.SDL_SetRenderDrawColor(sdlrenderer, 0, 0, 0, 0)
+                sdl2.SDL_RenderClear(sdlrenderer)
+                sdl2.SDL_SetRenderDrawColor(sdlrenderer, r.value, g.value, b.value, a.value)
+
+                # Draw as if the viewport were at our top-left corner, so that everything
+                # lands in the layer at its offset from us.
+                wr = self.get_world_rect()
+                view_pos = self.gui.get_view_pos()
+                self.gui.set_view_pos(wr.x, wr.y)
+                try:
+                    draw_contents()
+                finally:
+                    self.gui.set_view_pos(*view_pos)
+                    sdl2.SDL_SetRenderTarget(sdlrenderer, old_target)
+            self._dirty = False
+
+        sdl2.SDL_RenderCopy(sdlrenderer, self._layer_texture, None, self.get_view_rect())
+        return True
+
+
+    def release_layer(self):
+        if self._layer_texture is not None:
+            sdl2.SDL_DestroyTexture(self._layer_texture)
+            self._layer_texture = None
+            self._layer_size = None
 
 
     def _on_quit(self):
@@ -168,6 +307,11 @@ class GUIControl:
                                            y,
                                            self.bounding_rect.w,
                                            self.bounding_rect.h)
+        self._invalidate_world_transform()
+
+        # Our own pixels are unchanged, but we've moved within our parent's.
+        if self.parent is not None:
+            self.parent.mark_dirty()
 
 
     def get_size(self):
@@ -179,6 +323,7 @@ class GUIControl:
                                            self.bounding_rect.y,
                                            w,
                                            h)
+        self.mark_dirty()
         if updateLayout:
             self.updateLayout()
             if self.parent is not None:
@@ -203,13 +348,8 @@ class GUIControl:
         Returns:
             A tuple containing the x and y coordinates in world space.
         """
-        wx = lx + self._inset[0] + self.bounding_rect.x
-        wy = ly + self._inset[1] + self.bounding_rect.y
-
-        for a in self.gui.get_ancestor_chain(self):
-            wx += a.bounding_rect.x + a._inset[0]
-            wy += a.bounding_rect.y + a._inset[1]
-        return wx, wy
+        ox, oy, _ = self._get_world_transform()
+        return lx + ox, ly + oy
 
 
     def world_to_local(self, wx: int, wy: int) -> "tuple[int, int]":
@@ -225,15 +365,8 @@ class GUIControl:
         Returns:
             A tuple containing the x and y coordinates in local space of this control.
         """
-        lx, ly = wx, wy
-        for a in self.gui.get_ancestor_chain(self):
-            lx -= (a.bounding_rect.x + a._inset[0])
-            ly -= (a.bounding_rect.y + a._inset[1])
-
-        lx -= (self.bounding_rect.x + self._inset[0])
-        ly -= (self.bounding_rect.y + self._inset[1])
-
-        return lx, ly
+        ox, oy, _ = self._get_world_transform()
+        return wx - ox, wy - oy
 
 
     def get_world_rect(self):
@@ -257,13 +390,7 @@ class GUIControl:
         if self.is_screen_relative():
             return self.bounding_rect
         else:
-            ancestors = self.gui.get_ancestor_chain(self)
-            most_senior_screen_relative_ancestor = None
-            for ancestor in ancestors:  # ordered from root on down to control's direct parent
-                if ancestor.is_screen_relative():
-                    most_senior_screen_relative_ancestor = ancestor
-                    break
-                
+            _, _, most_senior_screen_relative_ancestor = self._get_world_transform()
             if most_senior_screen_relative_ancestor is not None:
                 x, y = self.gui.local_to_local(self.parent, 
                                                most_senior_screen_relative_ancestor, 
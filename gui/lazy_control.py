@@ -0,0 +1,59 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gui
+from .gui_control import GUIControl
+
+
+class LazyControl(GUIControl):
+    """Stands in for a saved control that hasn't been built yet. It only knows the saved
+    control's bounding rect, so it takes up the right space in its parent, but it draws
+    nothing and can't be focused or dragged. materialize() builds the real control from
+    the saved JSON and swaps it in. Until then, saving writes the saved JSON back out."""
+
+    def __init__(self, json, **kwargs):
+        kwargs = GUIControl._enrich_kwargs(json, **kwargs)
+        kwargs["draggable"] = False
+        super().__init__(can_focus=False, **kwargs)
+        self._json = json
+        self.z_order = json.get("z_order", 0)
+
+
+    def __json__(self):
+        json = dict(self._json)
+        json["bounding_rect"] = (self.bounding_rect.x, self.bounding_rect.y, self.bounding_rect.w, self.bounding_rect.h)
+        json["z_order"] = self.z_order
+        return json
+
+
+    def get_class_name(self) -> str:
+        return self._json["class"]
+
+
+    def is_materialized(self) -> bool:
+        return self._json is None
+
+
+    def materialize(self) -> "GUIControl":
+        """Replace this placeholder in its parent with the real control, and return it."""
+        assert(not self.is_materialized())
+
+        control_class = gui.GUI.control_class(self._json["class"])
+        control = control_class.from_json(self.__json__(), gui=self.gui)
+        self._json = None
+
+        if self.parent is not None:
+            self.parent.replace_child(self, control)
+        return control
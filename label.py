@@ -20,6 +20,7 @@ from typing import Optional
 import sdl2
 from gui.fonts import json_str_from_font_descriptor
 from draw import draw_text, get_char_width
+from frame_profiler import profiler
 from gui import GUI, GUIControl
 from gui.fonts import FontDescriptor, font_descriptor_from_json_str
 from platform_utils import is_cmd_pressed
@@ -89,6 +90,7 @@ class Label(GUIControl):
 
 
     def set_needs_redraw(self):
+        super().set_needs_redraw()
         if self.combined_text_texture is not None:
             sdl2.SDL_DestroyTexture(self.combined_text_texture)
             self.combined_text_texture = None
@@ -98,12 +100,13 @@ class Label(GUIControl):
         r = self.get_view_rect()
 
         if self.combined_text_texture is None:
-            surf = sdl2.SDL_CreateRGBSurface(0, self.bounding_rect.w, self.bounding_rect.h, 32, 0, 0, 0, 0)
+            with profiler.section(self.__class__.__name__, "texture"):
+                surf = sdl2.SDL_CreateRGBSurface(0, self.bounding_rect.w, self.bounding_rect.h, 32, 0, 0, 0, 0)
 
-            draw_text(self.renderer, self.font_descriptor, self._text, r.x, r.y, bounding_rect=r, dst_surface=surf)
+                draw_text(self.renderer, self.font_descriptor, self._text, r.x, r.y, bounding_rect=r, dst_surface=surf)
 
-            self.combined_text_texture = sdl2.SDL_CreateTextureFromSurface(self.renderer.sdlrenderer, surf)
-            sdl2.SDL_FreeSurface(surf)
+                self.combined_text_texture = sdl2.SDL_CreateTextureFromSurface(self.renderer.sdlrenderer, surf)
+                sdl2.SDL_FreeSurface(surf)
 
         assert(self.combined_text_texture is not None)
         sdl2.SDL_RenderCopy(self.renderer.sdlrenderer, self.combined_text_texture, None, r)
@@ -0,0 +1,317 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Read-only viewer for files too large to load into a TextArea.
+
+The file is memory-mapped, and a background thread builds an index of line start
+offsets. The viewer draws whatever rows are on screen straight from the mapping, so
+only the pages being looked at are ever read. Rows past the indexed part of the file
+appear as the index grows."""
+
+from array import array
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import Optional
+
+import sdl2
+
+from config import LARGE_FILE_EXCERPT_BYTES
+from gui import GUI
+from platform_utils import is_cmd_pressed
+from textarea import TextArea
+
+
+LARGE_FILE_MAX_LINE_BYTES = 4096               # Longer lines are cut off for display
+LARGE_FILE_INDEX_CHUNK_BYTES = 4 * 1024 * 1024 # Index is published to readers once per chunk
+
+
+class MappedFile:
+    def __init__(self, path: str, start_indexing: bool = True):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+
+        # mmap can't map an empty file.
+        self._mmap: Optional[mmap.mmap] = None
+        if self.size > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._lock = threading.Lock()
+        self._line_starts = array('q', [0])
+        self._indexed_bytes = 0
+        self._indexed = threading.Event()
+        self._closing = False
+        self.index_time: Optional[float] = None
+
+        self._index_thread = None
+        if start_indexing:
+            self._index_thread = threading.Thread(target=self._build_index, name="MappedFileIndexer", daemon=True)
+            self._index_thread.start()
+
+
+    def _build_index(self) -> None:
+        t_start = time.perf_counter()
+        mm = self._mmap
+        pos = 0
+        while mm is not None and pos < self.size and not self._closing:
+            chunk_end = min(pos + LARGE_FILE_INDEX_CHUNK_BYTES, self.size)
+            chunk_starts = []
+            i = mm.find(b'\n', pos, chunk_end)
+            while i != -1:
+                chunk_starts.append(i + 1)
+                i = mm.find(b'\n', i + 1, chunk_end)
+
+            with self._lock:
+                self._line_starts.extend(chunk_starts)
+                self._indexed_bytes = chunk_end
+            pos = chunk_end
+
+        self.index_time = time.perf_counter() - t_start
+        self._indexed.set()
+        logging.info(f'MappedFile: indexed {self.get_line_count()} lines of "{self.path}" ({self.size} bytes) in {self.index_time:.3f} s')
+
+
+    def wait_until_indexed(self, timeout: Optional[float] = None) -> bool:
+        if self._index_thread is None:
+            self._build_index()
+        return self._indexed.wait(timeout)
+
+
+    def is_indexed(self) -> bool:
+        return self._indexed.is_set()
+
+
+    def get_indexed_bytes(self) -> int:
+        return self._indexed_bytes
+
+
+    def get_line_count(self) -> int:
+        """Lines found so far. Final once is_indexed() is True."""
+        with self._lock:
+            return len(self._line_starts)
+
+
+    def get_line(self, row: int) -> str:
+        with self._lock:
+            if not 0 <= row < len(self._line_starts):
+                raise IndexError("Row index out of range")
+            start = self._line_starts[row]
+            if row + 1 < len(self._line_starts):
+                end = self._line_starts[row + 1] - 1
+            else:
+                end = None
+
+        if self._mmap is None:
+            return ""
+
+        if end is None:
+            # Last line found so far. Its end may not be indexed yet.
+            end = self._mmap.find(b'\n', start, start + LARGE_FILE_MAX_LINE_BYTES)
+            if end == -1:
+                end = self.size
+
+        end = min(end, start + LARGE_FILE_MAX_LINE_BYTES)
+        return self._mmap[start:end].decode('utf-8', errors='replace').rstrip('\r')
+
+
+    def excerpt(self, max_bytes: int = LARGE_FILE_EXCERPT_BYTES) -> str:
+        """The start of the file, cut at a line boundary if there is one."""
+        if self._mmap is None:
+            return ""
+        data = self._mmap[:max_bytes]
+        if len(data) < self.size:
+            i_newline = data.rfind(b'\n')
+            if i_newline > 0:
+                data = data[:i_newline]
+        return data.decode('utf-8', errors='replace')
+
+
+    def close(self) -> None:
+        self._closing = True
+        if self._index_thread is not None and self._index_thread is not threading.current_thread():
+            self._index_thread.join()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+class MappedTextBuffer:
+    """The read-only part of TextEditBuffer's interface that TextArea needs for drawing,
+    backed by a MappedFile. There is no cursor, selection or editing."""
+
+    def __init__(self, mapped_file: MappedFile, tab_spaces=4):
+        self.mapped_file = mapped_file
+        self.TAB_SPACES = tab_spaces
+
+
+    def get_text(self, expand_tabs=False):
+        return self.mapped_file.excerpt()
+
+
+    def expand_tabs(self, text):
+        return text.replace('\t', ' ' * self.TAB_SPACES)
+
+
+    def get_line(self, row, expand_tabs=True):
+        line = self.mapped_file.get_line(row)
+        return self.expand_tabs(line) if expand_tabs else line
+
+
+    def get_line_count(self):
+        return self.mapped_file.get_line_count()
+
+
+    def get_tab_spaces(self):
+        return self.TAB_SPACES
+
+
+    def get_point(self):
+        return 0
+
+
+    def get_row_col(self, point):
+        return 0, 0
+
+
+    def get_selection(self):
+        return None
+
+
+class LargeFileViewer(TextArea):
+    @classmethod
+    def from_json(cls, json, **kwargs):
+        assert(json["class"] == cls.__name__)
+        kwargs = super(TextArea, cls)._enrich_kwargs(json, **kwargs)
+
+        gui = kwargs.get('gui')
+
+        if not os.path.exists(json["path"]):
+            # Moved or deleted since the workspace was saved. Leave a note in its place.
+            instance = gui.create_control("TextArea", **kwargs)
+            instance.set_text(f"File '{json['path']}' not found.")
+            return instance
+
+        instance = gui.create_control(json["class"], path=json["path"], **kwargs)
+        instance.y_scroll = json.get("y_scroll", 0)
+        return instance
+
+
+    def __init__(self, path: str, **kwargs):
+        self.mapped_file = MappedFile(path)
+        super().__init__(text_buffer=MappedTextBuffer(self.mapped_file), **kwargs)
+        self.is_editable = False
+        self._drawn_line_count = 0
+
+
+    def __json__(self):
+        json = super(TextArea, self).__json__()
+        if json is not None:
+            json["class"] = self.__class__.__name__
+            json["path"] = self.mapped_file.path
+            json["y_scroll"] = self.y_scroll
+        return json
+
+
+    def _change_focus(self, am_getting_focus: bool) -> bool:
+        # Read-only: don't take transcribed speech as input, like TextArea does.
+        return super(TextArea, self)._change_focus(am_getting_focus)
+
+
+    def get_text(self) -> str:
+        return self.text_buffer.get_text()
+
+
+    def set_text(self, text: str) -> None:
+        pass
+
+
+    def point_at(self, wx, wy):
+        # No cursor to place.
+        return None
+
+
+    def on_update(self, dt):
+        # Show rows as the background indexer finds them, if they'd be on screen.
+        line_count = self.text_buffer.get_line_count()
+        if line_count != self._drawn_line_count:
+            rows_in_view_end = (self.y_scroll + self.bounding_rect.h) // self.row_spacing + 1
+            if self._drawn_line_count < rows_in_view_end:
+                self.set_needs_redraw()
+            self._drawn_line_count = line_count
+
+
+    def _scroll_to_row(self, row):
+        last_row = max(0, self.text_buffer.get_line_count() - 1)
+        row = max(0, min(row, last_row))
+        self.scroll_by(dy=row * self.row_spacing - self.y_scroll)
+
+
+    def handle_event(self, event):
+        if self._pre_handle_event(event):
+            return True
+
+        if event.type == sdl2.SDL_TEXTINPUT:
+            return True
+
+        if event.type == sdl2.SDL_KEYDOWN:
+            cmdPressed: bool = is_cmd_pressed(event)
+            keySymbol = event.key.keysym.sym
+            first_row, end_row = self.visible_row_range()
+            page_rows = max(1, end_row - first_row - 1)
+
+            if cmdPressed and keySymbol == sdl2.SDLK_BACKSPACE:
+                if self.gui.get_focus() is self and self.parent == self.gui.content():
+                    self.parent.remove_child(self)
+                    self.mapped_file.close()
+                    return True
+
+            elif keySymbol == sdl2.SDLK_UP:
+                self._scroll_to_row(0 if cmdPressed else first_row - 1)
+                return True
+
+            elif keySymbol == sdl2.SDLK_DOWN:
+                self._scroll_to_row(self.text_buffer.get_line_count() if cmdPressed else first_row + 1)
+                return True
+
+            elif keySymbol == sdl2.SDLK_PAGEUP:
+                self._scroll_to_row(first_row - page_rows)
+                return True
+
+            elif keySymbol == sdl2.SDLK_PAGEDOWN:
+                self._scroll_to_row(first_row + page_rows)
+                return True
+
+            elif keySymbol == sdl2.SDLK_HOME:
+                self._scroll_to_row(0)
+                return True
+
+            elif keySymbol == sdl2.SDLK_END:
+                self._scroll_to_row(self.text_buffer.get_line_count())
+                return True
+
+            return self.parent_handle_event(event)
+
+        # Mouse: resizing and wheel scrolling are the same as TextArea.
+        return super().handle_event(event)
+
+
+    def _on_quit(self):
+        self.mapped_file.close()
+
+
+GUI.register_control_type("LargeFileViewer", LargeFileViewer)
@@ -1,20 +1,100 @@
 import asyncio
+from collections import deque
+import logging
+import os
+import random
+import time
 from prompt import LiteralPrompt, Prompt
-from typing import Callable, Dict, List, Literal, Optional, Tuple
+from typing import Callable, Deque, Dict, List, Literal, Optional, Tuple
 
-from litellm import acompletion
+# AISH_LLM_BACKEND=standin swaps the provider for the offline stand-in in llm_standin.py.
+LLM_BACKEND = os.getenv("AISH_LLM_BACKEND", "litellm")
+if LLM_BACKEND == "standin":
+    from llm_standin import acompletion
+else:
+    from litellm import acompletion
+
+# If set, every completed stream is appended to this JSONL file, for replay by llm_standin.
+LLM_RECORD_PATH = os.getenv("AISH_LLM_RECORD_PATH")
+
+
+DEFAULT_MODEL = 'gpt-4o'
+
+# Retry policy. We only retry while waiting for the first token. Once text has been
+# handed to "next" handlers we can't transparently restart the stream.
+MAX_RETRIES = 3
+RETRY_BASE_DELAY_SECONDS = 0.5
+RETRY_MAX_DELAY_SECONDS = 8.0
+
+# How long we wait for the first token of an attempt, and between subsequent chunks,
+# before we consider the provider stalled.
+TTFT_TIMEOUT_SECONDS = 20.0
+STREAM_STALL_TIMEOUT_SECONDS = 30.0
+
+# Hedging: if the first attempt hasn't produced a token within the p95 time-to-first-token
+# for this model, fire a second, identical request and keep whichever answers first.
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY_SECONDS = 4.0
+LATENCY_HISTORY_COUNT = 200
+
+
+class LLMLatencyStats:
+    """Rolling time-to-first-token history per model, used to pick the hedge delay."""
+
+    def __init__(self, maxlen: int = LATENCY_HISTORY_COUNT):
+        self._maxlen = maxlen
+        self._ttfts: Dict[str, Deque[float]] = {}
+
+
+    def record_ttft(self, model: str, ttft: float) -> None:
+        if model not in self._ttfts:
+            self._ttfts[model] = deque(maxlen=self._maxlen)
+        self._ttfts[model].append(ttft)
+
+
+    def percentile(self, model: str, p: float) -> Optional[float]:
+        samples = self._ttfts.get(model)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        i = min(len(ordered) - 1, int(p / 100.0 * len(ordered)))
+        return ordered[i]
+
+
+    def hedge_delay(self, model: str) -> float:
+        p95 = self.percentile(model, 95)
+        return p95 if p95 is not None else HEDGE_DEFAULT_DELAY_SECONDS
+
+
+latency_stats = LLMLatencyStats()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, for the given 0-based retry attempt."""
+    cap = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+    return random.uniform(0.0, cap)
+
+
+def _chunk_text(chunk) -> Optional[str]:
+    delta = chunk.choices[0].delta
+    if hasattr(delta, 'content'):
+        return delta.content
+    return None
 
 
 class LLMRequest:
     def __init__(self,
-                 prompt: Prompt = LiteralPrompt(""), 
+                 prompt: Prompt = LiteralPrompt(""),
                  previous_messages: List[Dict[str, str]] = [],
                  tools: Optional[List[Dict]] = [],
                  tool_choice: Optional[str] = None,
                  handlers: List[Tuple[Literal["start", "next", "stop", "error"], Callable]] = [],
                  respond_with_json: bool = False,
-                 custom_data: Dict = {}):
-        
+                 custom_data: Dict = {},
+                 max_retries: int = MAX_RETRIES,
+                 ttft_timeout: float = TTFT_TIMEOUT_SECONDS,
+                 hedge: bool = False):
+
         self._completion = None
         self._task = None
         self._s_response = ""
@@ -23,13 +103,17 @@ class LLMRequest:
         self._custom_data = custom_data
         self._tools = tools
         self._tool_choice = tool_choice
+        self._max_retries = max_retries
+        self._ttft_timeout = ttft_timeout
+        self._hedge = hedge
+        self._metrics = {}
 
         self.set_prompt(prompt)
 
         self._handlers = {"start": [], "next": [], "stop": [], "error": []}
         for kind, callback in handlers:
             self._handlers[kind].append(callback)
-    
+
 
     @property
     def response_text(self):
@@ -39,12 +123,23 @@ class LLMRequest:
     @property
     def task(self):
         return self._task
-    
+
 
     @property
     def custom_data(self):
         return self._custom_data
-    
+
+
+    @property
+    def metrics(self) -> Dict:
+        """Latency metrics for the last send: model, attempts, hedged, ttft, retry_time,
+        total_time, n_tokens and tokens_per_second. Times are in seconds. ttft is timed
+        from the start of the attempt that succeeded. retry_time is what the failed
+        attempts before it, and their backoff, took. total_time includes both. Tokens are
+        counted as streamed content chunks, which is one token per chunk for the OpenAI
+        API."""
+        return self._metrics
+
 
     def set_prompt(self, prompt: Prompt):
         self._prompt = prompt
@@ -57,18 +152,13 @@ class LLMRequest:
         # print('**** LEAVE LLMRequest.send()')
         return self._task
 
-    
+
     def is_done(self):
         return self._task is None or self._task.done()
-    
 
-    async def _go(self):
-        # print('**** LLMRequest.go()')
-        self._s_response = ""
-        for cb in self._handlers["start"]:
-            cb(self)
 
-        model = 'gpt-4o'
+    def _completion_args(self) -> Dict:
+        model = DEFAULT_MODEL
         # model = 'claude-3-opus-20240229'
         if not self._previous_messages:
             chat_messages = [{'role': 'system', 'content': ''},
@@ -82,19 +172,142 @@ class LLMRequest:
             args["response_format"] = {"type": "json_object"}
         if self._tools is not None and len(self._tools) > 0:
             args["tools"] = self._tools
+        return args
+
+
+    async def _open_stream(self, args: Dict):
+        """Start one completion and wait for its first content chunk.
+        Returns (chunk_iterator, first_text). first_text is None for an empty response."""
+        completion = await acompletion(**args)
+        chunks = completion.__aiter__()
+        async for chunk in chunks:
+            chunk_text = _chunk_text(chunk)
+            if chunk_text:
+                return chunks, chunk_text
+        return chunks, None
+
+
+    async def _first_token(self, args: Dict):
+        """Run one attempt (plus an optional hedge) until the first token arrives.
+        Raises asyncio.TimeoutError if nothing arrives within the TTFT timeout, or the
+        last provider error if every in-flight request failed."""
+        loop = asyncio.get_running_loop()
+        t_start = loop.time()
+        deadline = t_start + self._ttft_timeout
+        hedge_at = t_start + latency_stats.hedge_delay(args["model"]) if self._hedge else None
+
+        in_flight = {asyncio.ensure_future(self._open_stream(args))}
+        last_error = None
+        try:
+            while True:
+                t_wake = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(in_flight,
+                                             timeout=max(0.0, t_wake - loop.time()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    in_flight.discard(attempt)
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    last_error = attempt.exception()
+                    logging.warning(f'LLMRequest: attempt failed: {last_error!r}')
+
+                now = loop.time()
+                if hedge_at is not None and now >= hedge_at:
+                    logging.info(f'LLMRequest: no token after {now - t_start:.2f}s. Sending hedged request.')
+                    self._metrics["hedged"] = True
+                    in_flight.add(asyncio.ensure_future(self._open_stream(args)))
+                    hedge_at = None
+                elif not in_flight:
+                    raise last_error
+                elif now >= deadline:
+                    raise asyncio.TimeoutError(f"No token within {self._ttft_timeout:.1f}s")
+        finally:
+            for attempt in in_flight:
+                attempt.cancel()
+
+
+    def _report_error(self, error: str) -> None:
+        logging.error(f'LLMRequest failed: {error}')
+        for cb in self._handlers["error"]:
+            cb(self, error)
+
+
+    async def _go(self):
+        # print('**** LLMRequest.go()')
+        self._s_response = ""
+        for cb in self._handlers["start"]:
+            cb(self)
+
+        args = self._completion_args()
+        self._metrics = {"model": args["model"], "attempts": 0, "hedged": False}
+
+        t_start = time.perf_counter()
+        for attempt in range(self._max_retries + 1):
+            self._metrics["attempts"] = attempt + 1
+            t_attempt = time.perf_counter()
+            try:
+                chunks, first_text = await self._first_token(args)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+                if attempt < self._max_retries:
+                    delay = backoff_delay(attempt)
+                    logging.warning(f'LLMRequest: attempt {attempt + 1} failed ({e!r}). Retrying in {delay:.2f}s.')
+                    await asyncio.sleep(delay)
+        else:
+            self._metrics["total_time"] = time.perf_counter() - t_start
+            self._report_error(f"LLM request failed after {self._max_retries + 1} attempts: {error!r}")
+            return
+
+        # TTFT is the successful attempt's, so that failed attempts and backoff don't
+        # skew the latency stats that hedging is based on. They're in retry_time.
+        t_first = time.perf_counter()
+        ttft = t_first - t_attempt
+        self._metrics["ttft"] = ttft
+        self._metrics["retry_time"] = t_attempt - t_start
+        latency_stats.record_ttft(args["model"], ttft)
+
+        n_tokens = 0
+        timed_chunks = []
+        try:
+            chunk_text = first_text
+            while chunk_text is not None:
+                if chunk_text:
+                    n_tokens += 1
+                if LLM_RECORD_PATH:
+                    timed_chunks.append((time.perf_counter() - t_attempt, chunk_text))
+                self._s_response += chunk_text
+                for cb in self._handlers["next"]:
+                    cb(self, chunk_text)
+                await asyncio.sleep(0.001)
+
+                chunk_text = None
+                while chunk_text is None:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), STREAM_STALL_TIMEOUT_SECONDS)
+                    except StopAsyncIteration:
+                        break
+                    # print(f"\n**** {chunk}\n")
+                    chunk_text = _chunk_text(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._metrics["total_time"] = time.perf_counter() - t_start
+            self._report_error(f"LLM stream interrupted: {e!r}")
+            return
+
+        t_done = time.perf_counter()
+        self._metrics["n_tokens"] = n_tokens
+        self._metrics["total_time"] = t_done - t_start
+        streaming_time = t_done - t_first
+        self._metrics["tokens_per_second"] = n_tokens / streaming_time if streaming_time > 0 else 0.0
+        logging.debug(f'LLMRequest metrics: {self._metrics}')
 
-        self._completion = await acompletion(**args)
-        async for chunk in self._completion:
-            # print(f"\n**** {chunk}\n")
-            delta = chunk.choices[0].delta
-            # print(f"\n**** {delta}\n")
-            if hasattr(delta, 'content'):
-                chunk_text = chunk.choices[0].delta.content
-                if chunk_text is not None:
-                    self._s_response += chunk_text
-                    for cb in self._handlers["next"]:
-                        cb(self, chunk_text)
-            await asyncio.sleep(0.001)
+        if LLM_RECORD_PATH:
+            import llm_standin
+            llm_standin.append_recording(LLM_RECORD_PATH, args, timed_chunks)
 
         for cb in self._handlers["stop"]:
             cb(self)
@@ -48,6 +48,9 @@ PANEL_HEIGHT = 120
 
 class LLMAgentChat(LLMChatContainer):
 
+    # The agent runs whether or not the chat is on screen.
+    lazy_loadable = False
+
     @classmethod
     def create(cls, **kwargs):
         return cls(**kwargs)
@@ -349,6 +352,13 @@ Message:
                         ta_answer.set_needs_redraw()
 
 
+                def on_passthrough_response_error(llm_request: LLMRequest, error: str):
+                    ta_answer = self.utterances[-1].text_area
+                    ta_answer.text_buffer.move_point_to_end()
+                    ta_answer.text_buffer.insert(f"\n[{error}]")
+                    ta_answer.set_needs_redraw()
+
+
                 def on_passthrough_response_done(llm_request: LLMRequest):
                     event = {
                         "version": 0.1,
@@ -365,7 +375,8 @@ Message:
                                          previous_messages=prev_messages,
                                          handlers=[("start", on_passthrough_response_start),
                                                    ("next", on_passthrough_response_next),
-                                                    ("stop", on_passthrough_response_done)])
+                                                    ("stop", on_passthrough_response_done),
+                                                    ("error", on_passthrough_response_error)])
                 llm_request.send_nowait()
 
                 event = {
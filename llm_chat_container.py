@@ -95,7 +95,7 @@ class LLMChatContainer(GUIContainer):
             return self.text_area.text_buffer.get_text()
         
         def set_text(self, text):
-            self.text_area.text_buffer.set_text(text)
+            self.text_area.set_text(text)
 
 
     @classmethod
@@ -105,6 +105,7 @@ class LLMChatContainer(GUIContainer):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.draw_bounds = True
+        self.cache_layer = True  # Chats are mostly static. Only redraw them when they change.
         self.set_layout(ColumnLayout())
         self.system = None
         self.utterances = []
@@ -122,6 +123,7 @@ class LLMChatContainer(GUIContainer):
             for utterance in self.utterances:
                 self.add_child(utterance)
         self.accumulated_response_text = None
+        self._spoken_response = None
         self.busy_colormap = matplotlib.colormaps['summer']
         self._t_busy = 0.0
 
@@ -295,7 +297,8 @@ class LLMChatContainer(GUIContainer):
                                  previous_messages=previous_messages,
                                  handlers=[("start", self.on_llm_response_start),
                                            ("next", self.on_llm_response_chunk),
-                                           ("stop", self.on_llm_response_done)])
+                                           ("stop", self.on_llm_response_done),
+                                           ("error", self.on_llm_response_error)])
         llm_request.send_nowait()
 
     def on_llm_response_start(self, llm_request: LLMRequest) -> None:
@@ -307,6 +310,10 @@ class LLMChatContainer(GUIContainer):
             assert(isinstance(answer, self.ChatMessageUI) and role == "Assistant")
             self.current_response_destination = answer
 
+        # Speak the answer as it streams in, if voice out is on.
+        self._end_spoken_response()
+        self._spoken_response = self.gui.begin_saying()
+
     def on_llm_response_chunk(self, llm_request: LLMRequest, chunk_text: Optional[str]) -> None:
         if chunk_text is not None:
             answer_text_area = self.current_response_destination.text_area
@@ -314,13 +321,32 @@ class LLMChatContainer(GUIContainer):
             answer_text_area.text_buffer.insert(chunk_text)
             answer_text_area.set_needs_redraw()
             self.accumulated_response_text += chunk_text
+            if self._spoken_response is not None:
+                self._spoken_response.feed(chunk_text)
 
     def on_llm_response_done(self, llm_request: LLMRequest) -> None:
         self.current_response_destination = None
         self.pulse_busy = False
         self._t_busy = 0.0
+        self._end_spoken_response()
+
+    def on_llm_response_error(self, llm_request: LLMRequest, error: str) -> None:
+        if self.current_response_destination is not None:
+            answer_text_area = self.current_response_destination.text_area
+            answer_text_area.text_buffer.move_point_to_end()
+            answer_text_area.text_buffer.insert(f"\n[{error}]")
+            answer_text_area.set_needs_redraw()
+
+        self.current_response_destination = None
+        self.pulse_busy = False
+        self._t_busy = 0.0
+        self._end_spoken_response()
+
 
-        # self.gui.say(self.accumulated_response_text)
+    def _end_spoken_response(self) -> None:
+        if self._spoken_response is not None:
+            self._spoken_response.end()
+            self._spoken_response = None
 
 
     def on_update(self, dt):
@@ -0,0 +1,210 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline stand-in for litellm.acompletion, for load tests and deterministic benchmarks.
+
+Select it by setting AISH_LLM_BACKEND=standin (see .env.example). It either replays
+streams recorded with AISH_LLM_RECORD_PATH, or synthesizes token streams with a
+configurable time-to-first-token and token rate. No network access is needed."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+STANDIN_MODE = os.getenv("AISH_LLM_STANDIN_MODE", "synthetic")  # "synthetic" or "replay"
+STANDIN_RECORDING_PATH = os.getenv("AISH_LLM_STANDIN_RECORDING", "llm_recording.jsonl")
+STANDIN_TTFT_SECONDS = float(os.getenv("AISH_LLM_STANDIN_TTFT_MS", "300")) / 1000.0
+STANDIN_TOKENS_PER_SECOND = float(os.getenv("AISH_LLM_STANDIN_TOKENS_PER_SECOND", "50"))
+STANDIN_N_TOKENS = int(os.getenv("AISH_LLM_STANDIN_N_TOKENS", "64"))
+STANDIN_JITTER = float(os.getenv("AISH_LLM_STANDIN_JITTER", "0.0"))  # fraction of each delay
+STANDIN_SPEEDUP = float(os.getenv("AISH_LLM_STANDIN_SPEEDUP", "1.0"))  # replay time scale
+STANDIN_SEED = int(os.getenv("AISH_LLM_STANDIN_SEED", "0"))
+
+_WORDS = ("the agent memory canvas text chat summary prompt stream token user "
+          "model latency file label window voice event percept note result").split()
+
+
+class _Delta:
+    def __init__(self, content: Optional[str]):
+        self.content = content
+        self.role = "assistant"
+
+
+class _Choice:
+    def __init__(self, content: Optional[str]):
+        self.delta = _Delta(content)
+        self.index = 0
+
+
+class StandInChunk:
+    """Just enough of litellm's streaming chunk shape for LLMRequest."""
+
+    def __init__(self, content: Optional[str]):
+        self.choices = [_Choice(content)]
+
+
+def request_key(args: Dict) -> str:
+    """Stable key for a completion request, so recordings can be matched on replay."""
+    keyed = {"model": args.get("model"), "messages": args.get("messages"),
+             "response_format": args.get("response_format"), "tools": args.get("tools")}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def append_recording(path: str, args: Dict, timed_chunks: List[Tuple[float, str]]) -> None:
+    """Append one finished stream to a JSONL recording. timed_chunks holds
+    (seconds since request start, chunk text) pairs."""
+    record = {"key": request_key(args), "model": args.get("model"), "chunks": timed_chunks}
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+class StandInBackend:
+    def __init__(self,
+                 mode: str = STANDIN_MODE,
+                 recording_path: Optional[str] = STANDIN_RECORDING_PATH,
+                 ttft: float = STANDIN_TTFT_SECONDS,
+                 tokens_per_second: float = STANDIN_TOKENS_PER_SECOND,
+                 n_tokens: int = STANDIN_N_TOKENS,
+                 jitter: float = STANDIN_JITTER,
+                 speedup: float = STANDIN_SPEEDUP,
+                 seed: int = STANDIN_SEED,
+                 scripts: Optional[List[Tuple[str, str]]] = None):
+        """scripts is an optional list of (substring, response_text) pairs. In synthetic
+        mode, a request whose last message contains substring streams response_text
+        (split into words) instead of random words. speedup scales replayed time only.
+        Synthetic timing is set by ttft and tokens_per_second."""
+        if speedup <= 0:
+            raise ValueError(f"StandInBackend: speedup must be positive, not {speedup}")
+
+        self.mode = mode
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.n_tokens = n_tokens
+        self.jitter = jitter
+        self.speedup = speedup
+        self._rng = random.Random(seed)
+        self._scripts = scripts or []
+
+        self._recordings: Dict[str, List[Tuple[float, str]]] = {}
+        self._recording_order: List[List[Tuple[float, str]]] = []
+        self._i_next_recording = 0
+        if mode == "replay":
+            self.load_recording(recording_path)
+
+
+    def load_recording(self, path: str) -> None:
+        with open(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                chunks = [(float(t), text) for t, text in record["chunks"]]
+                self._recordings.setdefault(record["key"], chunks)
+                self._recording_order.append(chunks)
+        logging.info(f'StandInBackend: loaded {len(self._recording_order)} recorded streams from "{path}"')
+
+
+    def _pick_recording(self, args: Dict) -> List[Tuple[float, str]]:
+        # Prefer an exact match. Prompts that embed timestamps never match exactly, so
+        # otherwise replay recordings in file order, wrapping around.
+        chunks = self._recordings.get(request_key(args))
+        if chunks is not None:
+            return chunks
+
+        if not self._recording_order:
+            raise RuntimeError("StandInBackend: no recorded streams to replay")
+        chunks = self._recording_order[self._i_next_recording % len(self._recording_order)]
+        self._i_next_recording += 1
+        return chunks
+
+
+    def _scripted_texts(self, args: Dict) -> Optional[List[str]]:
+        messages = args.get("messages") or [{}]
+        last_content = messages[-1].get("content") or ""
+        for substring, response_text in self._scripts:
+            if substring in last_content:
+                return re.findall(r"\s*\S+", response_text)
+        return None
+
+
+    def _synthesize(self, args: Dict) -> List[Tuple[float, str]]:
+        texts = self._scripted_texts(args)
+        if texts is None:
+            words = [self._rng.choice(_WORDS) for _ in range(self.n_tokens)]
+            if (args.get("response_format") or {}).get("type") == "json_object":
+                texts = re.findall(r"\s*\S+", json.dumps({"response": " ".join(words)}))
+            else:
+                texts = re.findall(r"\s*\S+", " ".join(words))
+
+        if not texts:
+            # An empty answer still takes a round trip.
+            return [(self.ttft, "")]
+
+        t = self.ttft
+        dt = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        timed_chunks = []
+        for text in texts:
+            timed_chunks.append((t, text))
+            t += dt
+        return timed_chunks
+
+
+    def _jittered(self, delay: float) -> float:
+        if self.jitter <= 0:
+            return delay
+        return max(0.0, delay * (1.0 + self._rng.uniform(-self.jitter, self.jitter)))
+
+
+    async def _stream(self, timed_chunks: List[Tuple[float, str]], speedup: float = 1.0):
+        # Leading role-only chunk, like the OpenAI API sends.
+        yield StandInChunk(None)
+
+        t_prev = 0.0
+        for t, text in timed_chunks:
+            delay = self._jittered(max(0.0, t - t_prev)) / speedup
+            t_prev = t
+            await asyncio.sleep(delay)
+            yield StandInChunk(text)
+
+
+    async def acompletion(self, **kwargs):
+        if self.mode == "replay":
+            return self._stream(self._pick_recording(kwargs), self.speedup)
+        return self._stream(self._synthesize(kwargs))
+
+
+_backend: Optional[StandInBackend] = None
+
+
+def get_backend() -> StandInBackend:
+    global _backend
+    if _backend is None:
+        _backend = StandInBackend()
+    return _backend
+
+
+def set_backend(backend: StandInBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+async def acompletion(**kwargs):
+    """Drop-in replacement for litellm.acompletion(stream=True, ...)."""
+    return await get_backend().acompletion(**kwargs)
@@ -1,11 +1,47 @@
 import asyncio
+from collections import deque
 from embeddings import cos_similarity, embed
 import json
 from llm import LLMRequest
+import logging
 import numpy as np
 from prompt import PromptTemplate
-from typing import List, Optional, Tuple
+from typing import Deque, Dict, List, Optional, Tuple
 import uuid
+from workspace_writer import write_atomically
+
+
+# New memories are summarized in batches. A batch is sent once it holds
+# SUMMARY_BATCH_MAX_ITEMS memories or SUMMARY_BATCH_MAX_CHARS characters of text, or
+# SUMMARY_BATCH_WINDOW_SECONDS after its first memory arrived, whichever comes first.
+SUMMARY_BATCH_MAX_ITEMS = 16
+SUMMARY_BATCH_MAX_CHARS = 24000
+SUMMARY_BATCH_WINDOW_SECONDS = 0.5
+SUMMARY_MAX_BATCHES_IN_FLIGHT = 4
+SUMMARY_MAX_ATTEMPTS = 2
+
+BATCH_SUMMARY_TEMPLATE = \
+"""
+You are a conversational AI agent. You are being asked to memorize some TEXTs and store each one as a memory.
+For each TEXT, considering its content, generate a sentence that paraphrases and summarizes it. This summary
+will be used to generate an embedding for this summary sentence that can later be used with vector similarity
+search to retrieve the TEXT memory. If there is a key point to a TEXT, make sure its summary includes that
+key point. Do not include text like "Summary:" in a summary.
+
+Respond with exactly one line per TEXT, in the same order as the TEXTs. Each line is a JSON object with
+the TEXT's id and its single-sentence summary, like this:
+
+{"id": "1", "summary": "..."}
+
+Do not emit any other text.
+
+{{#Items}}
+<TEXT id="{{ Id }}">
+{{ Content }}
+</TEXT>
+
+{{/Items}}
+"""
 
 
 class Memory:
@@ -26,39 +62,13 @@ class Memory:
         self._keywords = keywords
 
         self._summary_task_done = False
-        self.summary_prompt_template = PromptTemplate(
-"""
-You are a conversational AI agent. You are being asked to memorize some TEXT and store it as a memory.
-Considering the content of the TEXT, generate a sentence that paraphrases and summarizes it. This summary
-will be used to generate an embedding for this summary sentence that can later be used with vector similarity
-search to retrieve the TEXT memory. If there is a key point to the TEXT, make sure the summary includes that 
-key point. Respond with a single sentence. Do not emit any other text or punctuation. Do not include text like "Summary:"
-
-TEXT:
-
-{{ Content }}
-""")
+        self._summary_attempts = 0
 
         if summary_sentence:
             self._summary_sentence = summary_sentence
         else:
-            # Get summary sentence for embedding
-            data = {"Content": text}
-            self.summary_prompt_template.fill(**data)
-            rq_summary = LLMRequest(prompt=self.summary_prompt_template,
-                                    handlers=[("stop", self._on_summary_ready)],
-                                    custom_data={"mem_uid": self._uid})
-            
-            print('** SEND SUMMARY REQUEST')
-            rq_summary.send_nowait()
-
-
-    def _on_summary_ready(self, llm_request: LLMRequest) -> str:
-        print(f'** RECEIVED MEMORY SUMMARY: {llm_request.response_text}')
-        print(f'** UPDATING SUMMARY for Memory {self._uid}')
-        
-        self._summary_sentence = llm_request.response_text
-        self._summary_embedding = embed(self._summary_sentence)[0]
+            # Get summary sentence for embedding. This is batched with other new memories.
+            summarizer.submit(self)
 
 
     @property
@@ -104,6 +114,175 @@ TEXT:
         self._summary_embedding = new_summary_embedding
 
 
+class MemorySummarizer:
+    """Queue of memories waiting for a summary sentence and embedding.
+
+    Pending memories are sent to the LLM in batches, one multi-item prompt per batch.
+    The response is parsed line by line as it streams in, so each memory gets its
+    summary_sentence as soon as its line is complete. When the batch finishes, or fails
+    part way, its summaries are embedded with a single embed() call. Memories the LLM skipped are
+    retried in a later batch, up to SUMMARY_MAX_ATTEMPTS times."""
+
+    def __init__(self,
+                 max_items: int = SUMMARY_BATCH_MAX_ITEMS,
+                 max_chars: int = SUMMARY_BATCH_MAX_CHARS,
+                 window: float = SUMMARY_BATCH_WINDOW_SECONDS,
+                 max_in_flight: int = SUMMARY_MAX_BATCHES_IN_FLIGHT):
+        self._max_items = max_items
+        self._max_chars = max_chars
+        self._window = window
+        self._max_in_flight = max_in_flight
+
+        self._pending: Deque[Memory] = deque()
+        self._pending_chars = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._n_in_flight = 0
+        self._stats = {"batches": 0, "summarized": 0, "retried": 0, "failed": 0}
+
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Counts of batches sent, and memories summarized, retried and given up on."""
+        return self._stats
+
+
+    def submit(self, memory: Memory) -> None:
+        self._pending.append(memory)
+        self._pending_chars += len(memory.text)
+
+        if self._pending_chars >= self._max_chars or len(self._pending) >= self._max_items:
+            self.flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self._window, self.flush)
+
+
+    def flush(self) -> None:
+        """Send pending memories now, in as many batches as the in-flight limit allows.
+        Whatever is left is sent as earlier batches finish."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending and self._n_in_flight < self._max_in_flight:
+            self._send_batch(self._take_batch())
+
+
+    def _take_batch(self) -> List[Memory]:
+        batch = [self._pending.popleft()]
+        n_chars = len(batch[0].text)
+        while self._pending and len(batch) < self._max_items:
+            n_next_chars = len(self._pending[0].text)
+            if n_chars + n_next_chars > self._max_chars:
+                break
+            batch.append(self._pending.popleft())
+            n_chars += n_next_chars
+        self._pending_chars -= n_chars
+        return batch
+
+
+    def _send_batch(self, batch: List[Memory]) -> None:
+        # Short ids keep the prompt and response small. They're only unique within a batch.
+        by_id = {str(i + 1): memory for i, memory in enumerate(batch)}
+
+        prompt = PromptTemplate(BATCH_SUMMARY_TEMPLATE)
+        prompt.fill(Items=[{"Id": item_id, "Content": memory.text} for item_id, memory in by_id.items()])
+
+        rq = LLMRequest(prompt=prompt,
+                        handlers=[("next", self._on_batch_next),
+                                  ("stop", self._on_batch_done),
+                                  ("error", self._on_batch_error)],
+                        custom_data={"memories": by_id, "summarized": {}, "i_parsed": 0})
+
+        self._n_in_flight += 1
+        self._stats["batches"] += 1
+        print(f'** SEND SUMMARY REQUEST for {len(batch)} memories')
+        rq.send_nowait()
+
+
+    def _parse_response(self, llm_request: LLMRequest, final: bool) -> None:
+        data = llm_request.custom_data
+        response = llm_request.response_text
+
+        # Only parse complete lines until the stream is done.
+        i_end = len(response) if final else response.rfind("\n") + 1
+        if i_end <= data["i_parsed"]:
+            return
+        lines = response[data["i_parsed"]:i_end].splitlines()
+        data["i_parsed"] = i_end
+
+        for line in lines:
+            line = line.strip().rstrip(",")
+            if not line.startswith("{"):
+                continue    # Blank lines, or a code fence the LLM added anyway
+            try:
+                item = json.loads(line)
+            except ValueError:
+                logging.warning(f'MemorySummarizer: could not parse summary line: {line}')
+                continue
+
+            item_id = str(item.get("id"))
+            summary = item.get("summary")
+            memory = data["memories"].get(item_id)
+            if memory is None or item_id in data["summarized"] or not isinstance(summary, str) or not summary.strip():
+                continue
+
+            memory.summary_sentence = summary.strip()
+            data["summarized"][item_id] = memory
+            print(f'** RECEIVED MEMORY SUMMARY for Memory {memory.uid}: {memory.summary_sentence}')
+
+
+    def _on_batch_next(self, llm_request: LLMRequest, chunk_text: str) -> None:
+        if "\n" in chunk_text:
+            self._parse_response(llm_request, final=False)
+
+
+    def _on_batch_done(self, llm_request: LLMRequest) -> None:
+        self._parse_response(llm_request, final=True)
+        self._finish_batch(llm_request)
+
+
+    def _on_batch_error(self, llm_request: LLMRequest, error: str) -> None:
+        # Lines that streamed in before the error still count.
+        self._finish_batch(llm_request)
+
+
+    def _finish_batch(self, llm_request: LLMRequest) -> None:
+        self._n_in_flight -= 1
+        data = llm_request.custom_data
+
+        summarized = list(data["summarized"].values())
+        if summarized:
+            embeddings = embed([memory.summary_sentence for memory in summarized])
+            for memory, embedding in zip(summarized, embeddings):
+                memory.summary_embedding = embedding
+                memory._summary_task_done = True
+            self._stats["summarized"] += len(summarized)
+
+        missing = [memory for item_id, memory in data["memories"].items() if item_id not in data["summarized"]]
+        for memory in missing:
+            memory._summary_attempts += 1
+            if memory._summary_attempts < SUMMARY_MAX_ATTEMPTS:
+                self._stats["retried"] += 1
+                self._pending.append(memory)
+                self._pending_chars += len(memory.text)
+            else:
+                self._stats["failed"] += 1
+                logging.warning(f'MemorySummarizer: giving up on summary for Memory {memory.uid}')
+
+        # Anything still pending has already waited its window.
+        if self._pending:
+            self.flush()
+
+
+summarizer = MemorySummarizer()
+
+
 class MemoryStore:
     def __init__(self):
         self._memories = {}
@@ -147,7 +326,8 @@ class MemoryStore:
         return results
     
 
-    def save(self, filename: str):
+    def snapshot(self) -> dict:
+        """The memories as plain JSON-able values, e.g. for a WorkspaceSaver to write out."""
         json_data = {"version": 0.1, "memories": []}
         for uid, memory in self._memories.items():
 
@@ -160,8 +340,11 @@ class MemoryStore:
                                           "keywords": memory.keywords,
                                           "summary": memory.summary_sentence,
                                           "summary_embedding": summary_embedding})
-        with open(filename, "w") as f:
-            json.dump(json_data, f, indent=2)
+        return json_data
+
+
+    def save(self, filename: str):
+        write_atomically(filename, json.dumps(self.snapshot(), indent=2))
 
 
     def load(self, filename: str):
@@ -1,5 +1,26 @@
 import pystache
-from typing import Optional
+from pystache.parsed import ParsedTemplate
+from typing import Dict, Optional
+
+
+# Parsed templates, keyed by template text. Prompt templates are long string literals that
+# are filled on every turn, so we parse each distinct template once per process and share
+# the result between all PromptTemplate instances and render_template() callers.
+_parsed_templates: Dict[str, ParsedTemplate] = {}
+_renderer = pystache.Renderer()
+
+
+def compile_template(template_text: str) -> ParsedTemplate:
+    parsed = _parsed_templates.get(template_text)
+    if parsed is None:
+        parsed = pystache.parse(template_text)
+        _parsed_templates[template_text] = parsed
+    return parsed
+
+
+def render_template(template_text: str, context: Optional[Dict] = None, **kwargs) -> str:
+    """Same as pystache.render(), but the template is only parsed the first time it's seen."""
+    return _renderer.render(compile_template(template_text), context, **kwargs)
 
 
 class Prompt:
@@ -18,8 +39,8 @@ class LiteralPrompt(Prompt):
 
     def set_prompt_text(self, prompt_text: str) -> None:
         self._prompt_text = prompt_text
-    
-    
+
+
 class PromptTemplate(Prompt):
     def __init__(self, template_text: Optional[str]):
         self.set_template(template_text)
@@ -27,11 +48,11 @@ class PromptTemplate(Prompt):
 
     def set_template(self, template_text: str) -> None:
         self._template = template_text
+        self._parsed_template = compile_template(template_text)
         self._prompt_text = ""
 
 
     def fill(self, **kwargs) -> str:
-        self._prompt_text = pystache.render(self._template, kwargs)
+        self._prompt_text = _renderer.render(self._parsed_template, kwargs)
         return self.get_prompt_text()
-    
 
@@ -0,0 +1,107 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bounded subscriber queues for Session's publish/subscribe channels.
+
+Each Subscription holds at most maxlen events. When a slow, or forgotten, subscriber
+fills up, its drop policy decides whether the oldest queued event or the new one is
+lost, and the loss is counted. A coalesce function can merge an event into the one
+queued before it, e.g. so that a newer partial transcript replaces an unread one."""
+
+from collections import deque
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DEFAULT_MAXLEN = 256
+
+
+def coalesce_partials(queued, new) -> bool:
+    """For (text, is_final) transcript events: any event replaces an unread partial,
+    because it supersedes it."""
+    _, queued_is_final = queued
+    return not queued_is_final
+
+
+class Subscription:
+    """Events published to a channel, for one subscriber. Reads like a queue.Queue:
+    get_nowait() raises queue.Empty when there's nothing to read."""
+
+    def __init__(self, channel_name: str,
+                 maxlen: int = DEFAULT_MAXLEN,
+                 drop_policy: str = DROP_OLDEST,
+                 coalesce: Optional[Callable[[Any, Any], bool]] = None):
+        """coalesce(queued, new) returns True if new should replace queued, the newest
+        unread event, rather than be queued after it."""
+        assert(maxlen > 0)
+        assert(drop_policy in (DROP_OLDEST, DROP_NEWEST))
+        self.channel_name = channel_name
+        self.maxlen = maxlen
+        self.drop_policy = drop_policy
+        self.coalesce = coalesce
+
+        # Publishers and the subscriber may be on different threads.
+        self._lock = threading.Lock()
+        self._events = deque()
+
+        self.n_received = 0
+        self.n_dropped = 0
+        self.n_coalesced = 0
+        self.max_depth = 0
+
+
+    def put(self, obj) -> None:
+        with self._lock:
+            self.n_received += 1
+            if self._events and self.coalesce is not None and self.coalesce(self._events[-1], obj):
+                self._events[-1] = obj
+                self.n_coalesced += 1
+                return
+
+            if len(self._events) >= self.maxlen:
+                self.n_dropped += 1
+                if self.drop_policy == DROP_NEWEST:
+                    return
+                self._events.popleft()
+
+            self._events.append(obj)
+            self.max_depth = max(self.max_depth, len(self._events))
+
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._events:
+                raise queue.Empty
+            return self._events.popleft()
+
+
+    def empty(self) -> bool:
+        return len(self._events) == 0
+
+
+    def qsize(self) -> int:
+        return len(self._events)
+
+
+    def get_stats(self) -> dict:
+        return {
+            "depth": len(self._events),
+            "max_depth": self.max_depth,
+            "n_received": self.n_received,
+            "n_dropped": self.n_dropped,
+            "n_coalesced": self.n_coalesced,
+        }
@@ -1,6 +1,10 @@
 import ctypes
-import queue
+import threading
+import time
+from typing import Callable, Optional
+import wave
 
+from audio_buffer import PCMRingBuffer
 from audio_service import AudioService
 import pyaudio
 
@@ -9,18 +13,22 @@ N_SAMPLES_PER_SECOND = 16_000
 N_SAMPLE_BYTES = ctypes.sizeof(ctypes.c_int16)  # pyaudio.paInt16
 N_CHANNELS = 1
 N_CHUNK_SAMPLES = int(N_SAMPLES_PER_SECOND / 5)  # 200ms
+RING_BUFFER_SECONDS = 30    # Audio kept for a reader that falls behind, before it's dropped
 
 
 class MicrophoneStream(object):
-    """Opens a recording stream as a generator yielding the audio chunks."""
+    """Opens a recording stream. The PyAudio callback writes audio into a ring buffer,
+    and get_nowait() / read() hand it out as memoryviews, without copying."""
 
-    def __init__(self, rate, chunk):
+    def __init__(self, rate, chunk, ring_buffer_seconds=RING_BUFFER_SECONDS, on_audio: Optional[Callable[[], None]] = None):
+        """on_audio is called, on PyAudio's thread, each time new audio is available."""
         self._rate = rate
         self._chunk = chunk
+        self._on_audio = on_audio
         # self._quit_event = quit_event
 
-        # Create a thread-safe buffer of audio data
-        self._buff = queue.Queue()
+        # Single-producer, single-consumer buffer of audio data
+        self._buff = PCMRingBuffer(rate * N_SAMPLE_BYTES * N_CHANNELS * ring_buffer_seconds)
         self._audio_stream = None
         self.closed = True
 
@@ -44,22 +52,36 @@ class MicrophoneStream(object):
 
     def _fill_buffer(self, in_data, frame_count, time_info, status_flags):
         """Continuously collect data from the audio stream, into the buffer."""
-        self._buff.put(in_data)
+        # PyAudio calls this as soon as the buffer's last frame has been captured.
+        self._buff.write(in_data, time.perf_counter())
+        if self._on_audio is not None:
+            self._on_audio()
         return None, pyaudio.paContinue
 
 
-    def get_nowait(self):
-        chunks = []
-        try:
-            while True:
-                chunk = self._buff.get_nowait()
-                assert(chunk is not None)
-                chunks.append(chunk)
-        except queue.Empty:
-            if not len(chunks):
-                return b""
+    def read(self, max_bytes: Optional[int] = None, multiple_of: int = 1) -> memoryview:
+        """The oldest audio not read yet, up to the end of the ring buffer. Call again until
+        it's empty. See PCMRingBuffer.read()."""
+        return self._buff.read(max_bytes, multiple_of)
 
-        return b"".join(chunks)
+
+    @property
+    def t_last_read_captured(self) -> Optional[float]:
+        """When the last byte returned by read() was captured, by time.perf_counter()."""
+        return self._buff.t_last_read_captured
+
+
+    def get_nowait(self) -> memoryview:
+        """All audio not read yet. Only copies if it wraps around the ring buffer."""
+        first = self._buff.read()
+        rest = self._buff.read()
+        if not rest:
+            return first
+        return memoryview(b"".join((first, rest)))
+
+
+    def get_overrun_bytes(self) -> int:
+        return self._buff.n_overrun_bytes
 
 
     def start(self):
@@ -71,6 +93,107 @@ class MicrophoneStream(object):
         self._audio_stream.stop_stream()
         self._audio_stream.close()
         self.closed = True
-        # Signal the generator to terminate so that the client's
-        # streaming_recognize method will not block the process termination.
-        self._buff.put(None)
+
+
+class WavReplaySource:
+    """Plays a recorded WAV file in place of the microphone, with the same interface as
+    MicrophoneStream. speed is how many times faster than real time to feed it, or 0 for
+    as fast as the reader keeps up. Must be 16-bit mono at the rate asked for."""
+
+    def __init__(self, filename: str, rate: int = N_SAMPLES_PER_SECOND, chunk: int = N_CHUNK_SAMPLES,
+                 speed: float = 1.0, on_audio: Optional[Callable[[], None]] = None,
+                 ring_buffer_seconds=RING_BUFFER_SECONDS):
+        self.filename = filename
+        self._rate = rate
+        self._chunk = chunk
+        self._speed = speed
+        self._on_audio = on_audio
+        self._buff = PCMRingBuffer(rate * N_SAMPLE_BYTES * N_CHANNELS * ring_buffer_seconds)
+        self._thread = None
+        self._stopping = threading.Event()
+        self.finished = threading.Event()
+        self.closed = True
+
+        with wave.open(filename, 'rb') as wf:
+            if wf.getsampwidth() != N_SAMPLE_BYTES or wf.getnchannels() != N_CHANNELS or wf.getframerate() != rate:
+                raise ValueError(f"{filename}: need {rate} Hz, 16-bit mono audio")
+            self.n_frames = wf.getnframes()
+
+
+    def _play(self):
+        t_start = time.perf_counter()
+        n_fed = 0
+        with wave.open(self.filename, 'rb') as wf:
+            while not self._stopping.is_set():
+                pcm = wf.readframes(self._chunk)
+                if not pcm:
+                    break
+
+                if self._speed > 0:
+                    # Keep to the schedule, rather than sleeping a chunk's time after each.
+                    t_due = t_start + n_fed / (self._rate * self._speed)
+                    self._stopping.wait(max(0.0, t_due - time.perf_counter()))
+                else:
+                    # Flat out, but don't lap the reader.
+                    while self._buff.available() + len(pcm) > self._buff.capacity and not self._stopping.wait(0.001):
+                        pass
+
+                self._buff.write(pcm, time.perf_counter())
+                n_fed += len(pcm) // N_SAMPLE_BYTES
+                if self._on_audio is not None:
+                    self._on_audio()
+        self.finished.set()
+
+
+    def read(self, max_bytes: Optional[int] = None, multiple_of: int = 1) -> memoryview:
+        return self._buff.read(max_bytes, multiple_of)
+
+
+    @property
+    def t_last_read_captured(self) -> Optional[float]:
+        return self._buff.t_last_read_captured
+
+
+    def get_overrun_bytes(self) -> int:
+        return self._buff.n_overrun_bytes
+
+
+    def start(self):
+        self._stopping.clear()
+        self.finished.clear()
+        self._thread = threading.Thread(target=self._play, name="WavReplaySource", daemon=True)
+        self._thread.start()
+        self.closed = False
+
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.closed = True
+
+
+class WavStreamWriter:
+    """Writes PCM audio to a WAV file as it arrives, instead of collecting it all in
+    memory first. The wave module fixes up the header on close()."""
+
+    def __init__(self, filename: str, rate: int = N_SAMPLES_PER_SECOND, channels: int = N_CHANNELS, sample_bytes: int = N_SAMPLE_BYTES):
+        self.filename = filename
+        self.n_bytes = 0
+        self._wf = wave.open(filename, 'wb')
+        self._wf.setnchannels(channels)
+        self._wf.setsampwidth(sample_bytes)
+        self._wf.setframerate(rate)
+
+
+    def write(self, pcm) -> None:
+        self._wf.writeframesraw(pcm)
+        self.n_bytes += len(pcm)
+
+
+    def close(self) -> None:
+        if self._wf is not None:
+            self._wf.close()
+            self._wf = None
+
@@ -3,10 +3,11 @@ import logging
 
 from openai import OpenAI, chat
 import os
-from queue import Queue
 from typing import Callable, Dict, List, Optional
+import weakref
 
 from audio_service import AudioService
+from pubsub import DEFAULT_MAXLEN, DROP_OLDEST, Subscription
 
 
 class Session:
@@ -26,7 +27,11 @@ class Session:
         self._tasks = []
         
         self._audio = AudioService()
-        self._channels = {}
+
+        # Channel name -> weak references to its subscriptions, so that a subscriber that
+        # forgets to unsubscribe doesn't keep its queue alive, or filling up, forever.
+        self._channels: Dict[str, List[weakref.ref]] = {}
+        self._n_published: Dict[str, int] = {}
 
         self.gui = None
 
@@ -42,14 +47,50 @@ class Session:
 
 
     def publish(self, channel_name, obj):
-        if channel_name in self._channels:
-            for q in self._channels[channel_name]:
-                q.put(obj)
+        self._n_published[channel_name] = self._n_published.get(channel_name, 0) + 1
+        for subscription in self._subscriptions(channel_name):
+            subscription.put(obj)
+
+
+    def subscribe(self, channel_name: str,
+                  maxlen: int = DEFAULT_MAXLEN,
+                  drop_policy: str = DROP_OLDEST,
+                  coalesce: Optional[Callable] = None) -> Subscription:
+        """Returns a bounded queue of what's published to channel_name from now on. It's
+        only weakly held here: it stops receiving once unsubscribe()d, or once the
+        subscriber lets go of it."""
+        subscription = Subscription(channel_name, maxlen=maxlen, drop_policy=drop_policy, coalesce=coalesce)
+        self._channels.setdefault(channel_name, []).append(weakref.ref(subscription))
+        return subscription
+
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        refs = self._channels.get(subscription.channel_name, [])
+        refs[:] = [r for r in refs if r() is not None and r() is not subscription]
+
+
+    def get_channel_stats(self) -> Dict[str, dict]:
+        """Per channel: events published, and across its subscribers, how many are
+        queued now, the deepest any queue has been, and events dropped and coalesced."""
+        stats = {}
+        for channel_name in sorted(set(self._channels) | set(self._n_published)):
+            subscriptions = [s.get_stats() for s in self._subscriptions(channel_name)]
+            stats[channel_name] = {
+                "n_published": self._n_published.get(channel_name, 0),
+                "n_subscribers": len(subscriptions),
+                "depth": sum(s["depth"] for s in subscriptions),
+                "max_depth": max((s["max_depth"] for s in subscriptions), default=0),
+                "n_dropped": sum(s["n_dropped"] for s in subscriptions),
+                "n_coalesced": sum(s["n_coalesced"] for s in subscriptions),
+            }
+        return stats
 
 
-    def subscribe(self, channel_name: str) -> Queue:
-        q = Queue()
-        if channel_name not in self._channels:
-            self._channels[channel_name] = []
-        self._channels[channel_name].append(q)
-        return q
+    def _subscriptions(self, channel_name: str) -> List[Subscription]:
+        refs = self._channels.get(channel_name)
+        if not refs:
+            return []
+        subscriptions = [r() for r in refs]
+        if None in subscriptions:
+            refs[:] = [r for r in refs if r() is not None]
+        return [s for s in subscriptions if s is not None]
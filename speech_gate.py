@@ -0,0 +1,126 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Energy pre-gate in front of webrtcvad.
+
+SpeechGate.process() takes a block of 16-bit mono PCM, made of whole frames, and
+decides which frames are speech. RMS energy and zero-crossing rate are computed for
+every frame at once with NumPy. Only frames clearly above the background noise floor
+are passed to the VAD. Speech frames are then widened by a few frames of pre-roll and
+hangover, so that onsets and word tails aren't clipped."""
+
+import numpy as np
+
+
+NOISE_FLOOR_INITIAL_RMS = 100.0 # Until we've heard some quiet frames. int16 units.
+NOISE_FLOOR_RISE_RATE = 0.02    # Per frame: how fast the floor follows a louder background up
+ENERGY_OVER_FLOOR_RATIO = 2.0   # ~6 dB. Frames quieter than this, relative to the floor, are silence.
+MIN_SPEECH_RMS = 150.0          # About -47 dBFS. Quieter frames are always silence.
+HISS_ZCR = 0.3                  # Zero crossings per sample. Above this, a frame looks like hiss...
+HISS_ENERGY_FACTOR = 2.0        # ...and has to be this much louder again to count.
+PREROLL_FRAMES = 2              # Frames kept before a speech onset
+HANGOVER_FRAMES = 8             # Frames kept after speech, e.g. 160 ms of 20 ms frames
+
+
+class SpeechGate:
+    def __init__(self, frame_samples: int, sample_rate: int, vad=None,
+                 preroll_frames: int = PREROLL_FRAMES, hangover_frames: int = HANGOVER_FRAMES):
+        """vad is a webrtcvad.Vad, or None to go by energy alone. frame_samples must be a
+        frame length it accepts: 10, 20 or 30 ms."""
+        self.frame_samples = frame_samples
+        self.frame_bytes = frame_samples * 2
+        self.sample_rate = sample_rate
+        self.vad = vad
+        self.preroll_frames = preroll_frames
+        self.hangover_frames = hangover_frames
+
+        self.noise_floor = NOISE_FLOOR_INITIAL_RMS
+        self._frames_since_speech = hangover_frames + 1
+
+        self.n_frames = 0           # Frames processed
+        self.n_vad_frames = 0       # Frames that got past the energy gate to the VAD
+        self.n_speech_frames = 0    # Frames returned as speech, including pre-roll and hangover
+
+
+    def process(self, pcm) -> np.ndarray:
+        """pcm is any buffer of whole frames. Returns a bool per frame: is it speech?"""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        n_frames = len(samples) // self.frame_samples
+        frames = samples[:n_frames * self.frame_samples].reshape(n_frames, self.frame_samples)
+        if n_frames == 0:
+            return np.zeros(0, dtype=bool)
+
+        x = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(x * x, axis=1))
+        zcr = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / self.frame_samples
+
+        threshold = max(self.noise_floor * ENERGY_OVER_FLOOR_RATIO, MIN_SPEECH_RMS)
+        loud = rms > np.where(zcr > HISS_ZCR, threshold * HISS_ENERGY_FACTOR, threshold)
+
+        self._update_noise_floor(rms)
+
+        speech = loud
+        if self.vad is not None and loud.any():
+            speech = np.zeros(n_frames, dtype=bool)
+            view = memoryview(pcm).cast('B')
+            for i in np.flatnonzero(loud):
+                start = i * self.frame_bytes
+                speech[i] = self.vad.is_speech(view[start:start + self.frame_bytes], self.sample_rate)
+            self.n_vad_frames += int(np.count_nonzero(loud))
+
+        smoothed = self._smooth(speech)
+        self.n_frames += n_frames
+        self.n_speech_frames += int(np.count_nonzero(smoothed))
+        return smoothed
+
+
+    def _update_noise_floor(self, rms: np.ndarray) -> None:
+        # Minimum statistics: even during speech there are quiet frames between syllables,
+        # so the block's quietest frame is a fair guess at the background. Drop straight
+        # to it if it's quieter. If it's louder, e.g. a fan came on, rise towards it
+        # slowly, as an exponential moving average over the block's frames would.
+        quietest = float(rms.min())
+        if quietest <= self.noise_floor:
+            self.noise_floor = quietest
+        else:
+            alpha = 1.0 - (1.0 - NOISE_FLOOR_RISE_RATE) ** len(rms)
+            self.noise_floor += alpha * (quietest - self.noise_floor)
+
+
+    def _smooth(self, speech: np.ndarray) -> np.ndarray:
+        n = len(speech)
+        i = np.arange(n)
+
+        # Hangover: frames within hangover_frames after the last speech frame, carrying on
+        # from the end of the previous block.
+        last_speech_before = -1 - self._frames_since_speech
+        last_speech = np.maximum.accumulate(np.where(speech, i, last_speech_before))
+        out = (i - last_speech) <= self.hangover_frames
+
+        # Pre-roll: frames within preroll_frames before the next speech frame.
+        next_speech = np.where(speech, i, n + self.preroll_frames + 1)
+        next_speech = np.minimum.accumulate(next_speech[::-1])[::-1]
+        out |= (next_speech - i) <= self.preroll_frames
+
+        self._frames_since_speech = min(int(n - 1 - last_speech[-1]), self.hangover_frames + 1)
+        return out
+
+
+    def get_stats(self) -> dict:
+        return {
+            "n_frames": self.n_frames,
+            "n_vad_frames": self.n_vad_frames,
+            "n_speech_frames": self.n_speech_frames,
+            "noise_floor_rms": self.noise_floor,
+        }
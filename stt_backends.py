@@ -0,0 +1,171 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Speech-to-text engines that VoiceTranscriber can stream audio to.
+
+A backend is given 16-bit mono PCM with stream(), and calls back on_transcript(text,
+is_final, audio_end_ms) with partial and final transcripts. audio_end_ms is where the
+transcript ends, in milliseconds of audio streamed so far. Backends may call back on
+any thread.
+
+config.STT_BACKEND picks one. "assemblyai" streams to AssemblyAI's real-time service.
+"vosk" runs Kaldi models locally, on the CPU, via the optional vosk package, with the
+model directory given by VOSK_MODEL_PATH. It recognizes on the thread that calls
+stream(), i.e. VoiceTranscriber's audio thread."""
+
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+
+TranscriptCallback = Callable[[str, bool, Optional[float]], None]
+
+
+class STTBackend:
+    name = None
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._on_transcript: Optional[TranscriptCallback] = None
+
+
+    def connect(self, on_transcript: TranscriptCallback) -> None:
+        self._on_transcript = on_transcript
+
+
+    def stream(self, pcm: bytes) -> None:
+        raise NotImplementedError
+
+
+    def close(self) -> None:
+        pass
+
+
+    def _emit(self, text: str, is_final: bool, audio_end_ms: Optional[float]) -> None:
+        if text and self._on_transcript is not None:
+            self._on_transcript(text, is_final, audio_end_ms)
+
+
+class AssemblyAIBackend(STTBackend):
+    name = "assemblyai"
+
+    def __init__(self, sample_rate: int):
+        super().__init__(sample_rate)
+        import assemblyai as aai
+        aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY")
+        self._aai = aai
+        self._transcriber = None
+
+
+    def connect(self, on_transcript: TranscriptCallback) -> None:
+        super().connect(on_transcript)
+        self._transcriber = self._aai.RealtimeTranscriber(
+            sample_rate=self.sample_rate,
+            on_data=self._on_transcribe_data,
+            on_error=self._on_transcribe_error,
+            on_open=self._on_transcribe_open,
+            on_close=self._on_transcribe_close
+        )
+        self._transcriber.connect()
+
+
+    def stream(self, pcm: bytes) -> None:
+        # AssemblyAI queues what it's given, so pcm must not be a view of a buffer that
+        # will change.
+        self._transcriber.stream(pcm)
+
+
+    def close(self) -> None:
+        if self._transcriber is not None:
+            self._transcriber.close()
+            self._transcriber = None
+
+
+    # @note: this is executing on a different thread than my app functions
+    # like on_update()
+    def _on_transcribe_data(self, transcript) -> None:
+        logging.debug(transcript)
+        if isinstance(transcript, self._aai.RealtimeFinalTranscript):
+            self._emit(transcript.text, True, transcript.audio_end)
+        elif isinstance(transcript, self._aai.RealtimePartialTranscript):
+            self._emit(transcript.text, False, transcript.audio_end)
+
+
+    def _on_transcribe_error(self, error) -> None:
+        logging.error(f"Assembly AI Error: {error}")
+
+
+    def _on_transcribe_open(self, session_opened) -> None:
+        logging.debug(f"Assembly AI session opened with ID: {session_opened.session_id}")
+
+
+    def _on_transcribe_close(self) -> None:
+        # @note @bug whiy is this called twice on stop_recording?
+        logging.debug("Assembly AI session closed.")
+
+
+class VoskBackend(STTBackend):
+    name = "vosk"
+
+    def __init__(self, sample_rate: int, model_path: Optional[str] = None):
+        super().__init__(sample_rate)
+        try:
+            import vosk
+        except ImportError as e:
+            raise RuntimeError("The vosk STT backend needs the vosk package (pip install vosk).") from e
+
+        model_path = model_path or os.getenv("VOSK_MODEL_PATH")
+        if not model_path:
+            raise RuntimeError("Set VOSK_MODEL_PATH to a Vosk model directory to use the vosk STT backend.")
+
+        vosk.SetLogLevel(-1)
+        self._model = vosk.Model(model_path)
+        self._recognizer = vosk.KaldiRecognizer(self._model, sample_rate)
+        self._streamed_ms = 0.0
+        self._last_partial = ""
+
+
+    def stream(self, pcm: bytes) -> None:
+        self._streamed_ms += 1000 * len(pcm) / (2 * self.sample_rate)
+        if self._recognizer.AcceptWaveform(bytes(pcm)):
+            self._last_partial = ""
+            self._emit(json.loads(self._recognizer.Result()).get("text", ""), True, self._streamed_ms)
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+            if partial != self._last_partial:
+                self._last_partial = partial
+                self._emit(partial, False, self._streamed_ms)
+
+
+    def close(self) -> None:
+        if self._recognizer is not None:
+            self._emit(json.loads(self._recognizer.FinalResult()).get("text", ""), True, self._streamed_ms)
+            self._recognizer = None
+
+
+_backends = {
+    AssemblyAIBackend.name: AssemblyAIBackend,
+    VoskBackend.name: VoskBackend,
+}
+
+
+def register_stt_backend(name: str, backend_class) -> None:
+    _backends[name] = backend_class
+
+
+def create_stt_backend(name: str, sample_rate: int) -> STTBackend:
+    if name not in _backends:
+        raise ValueError(f'Unknown STT backend "{name}". Known: {", ".join(sorted(_backends))}')
+    return _backends[name](sample_rate)
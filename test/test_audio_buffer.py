@@ -0,0 +1,98 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import tempfile
+import unittest
+import wave
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_buffer import PCMRingBuffer
+
+
+def read_all(ring, **kwargs):
+    chunks = []
+    while True:
+        chunk = ring.read(**kwargs)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(bytes(chunk))
+
+
+class TestPCMRingBuffer(unittest.TestCase):
+    def test_reads_are_views_and_stop_at_the_end(self):
+        ring = PCMRingBuffer(10)
+        ring.write(b"0123456")
+        self.assertEqual(bytes(ring.read()), b"0123456")
+
+        ring.write(b"789abc")   # Wraps
+        self.assertEqual(ring.available(), 6)
+        first = ring.read()
+        self.assertIsInstance(first, memoryview)
+        self.assertEqual(bytes(first), b"789")
+        self.assertEqual(bytes(ring.read()), b"abc")
+        self.assertEqual(len(ring.read()), 0)
+
+
+    def test_multiple_of_keeps_reads_aligned(self):
+        ring = PCMRingBuffer(8)
+        ring.write(b"abcde")
+        self.assertEqual(bytes(ring.read(multiple_of=4)), b"abcd")
+        ring.write(b"fghij")
+        self.assertEqual(read_all(ring, multiple_of=4), b"efgh")
+        self.assertEqual(ring.available(), 2)
+
+
+    def test_overrun_drops_oldest(self):
+        ring = PCMRingBuffer(8)
+        ring.write(b"abcdef")
+        ring.write(b"ghijkl")
+        self.assertEqual(read_all(ring), b"efghijkl")
+        self.assertEqual(ring.n_overrun_bytes, 4)
+
+        ring.write(b"0123456789AB")  # Bigger than the buffer
+        self.assertEqual(read_all(ring), b"456789AB")
+        self.assertEqual(ring.n_overrun_bytes, 8)
+
+
+    def test_reads_know_when_their_audio_was_captured(self):
+        ring = PCMRingBuffer(8)
+        self.assertIsNone(ring.t_last_read_captured)
+        ring.write(b"abc", t_captured=1.0)
+        ring.write(b"def", t_captured=2.0)
+
+        self.assertEqual(bytes(ring.read(max_bytes=2)), b"ab")
+        self.assertEqual(ring.t_last_read_captured, 1.0)
+        self.assertEqual(bytes(ring.read(max_bytes=1)), b"c")
+        self.assertEqual(ring.t_last_read_captured, 1.0)
+        self.assertEqual(bytes(ring.read()), b"def")
+        self.assertEqual(ring.t_last_read_captured, 2.0)
+
+        # Empty reads leave it alone.
+        self.assertEqual(len(ring.read()), 0)
+        self.assertEqual(ring.t_last_read_captured, 2.0)
+
+
+class TestWavStreamWriter(unittest.TestCase):
+    def test_streams_frames_to_file(self):
+        from record_audio import WavStreamWriter
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "audio.wav")
+            writer = WavStreamWriter(filename)
+            ring = PCMRingBuffer(640)
+            for i in range(5):
+                ring.write(bytes([i]) * 320)
+                writer.write(ring.read())
+            writer.close()
+
+            with wave.open(filename, 'rb') as wf:
+                self.assertEqual(wf.getframerate(), 16_000)
+                self.assertEqual(wf.getnframes(), 5 * 160)
+                self.assertEqual(wf.readframes(1), b"\x00\x00")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_bench(script, *args):
+    """Runs a benchmark script, and returns what it printed to stdout, parsed as JSON."""
+    completed = subprocess.run([sys.executable, os.path.join(REPO_DIR, "bench", script), *args],
+                               cwd=REPO_DIR, capture_output=True, text=True, timeout=300)
+    if completed.returncode != 0:
+        raise AssertionError(f"{script} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout)
+
+
+class TestBenchOutput(unittest.TestCase):
+    def test_gui_bench_prints_only_json(self):
+        self.assertEqual(run_bench("bench_gui.py", "--quick")["benchmark"], "gui")
+
+
+    def test_prompt_assembly_bench_prints_only_json(self):
+        result = run_bench("bench_prompt_assembly.py", "--percepts", "50", "--repeats", "3")
+        self.assertEqual(result["benchmark"], "prompt_assembly")
+
+
+    def test_stt_bench_prints_only_json(self):
+        self.assertEqual(run_bench("bench_stt.py", "--quick")["benchmark"], "stt")
+
+
+if __name__ == '__main__':
+    unittest.main()
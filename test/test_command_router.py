@@ -0,0 +1,114 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import gc
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blinker import signal
+import sdl2.sdlttf as ttf
+
+from gui import GUI, FontRegistry
+from command_router import CommandRouter, command_router, parse_command
+from session import Session
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+
+    def on_command(self, args):
+        self.calls.append(args)
+
+
+class TestParseCommand(unittest.TestCase):
+    def test_parse_command(self):
+        self.assertEqual(parse_command("stop_listening"), ("stop_listening", None))
+        self.assertEqual(parse_command(" open_file( my file (1).txt ) "), ("open_file", "my file (1).txt"))
+        self.assertEqual(parse_command("create_new_label()"), ("create_new_label", ""))
+        self.assertEqual(parse_command("recall_memory(unclosed"), ("recall_memory", None))
+
+
+class TestCommandRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = CommandRouter()
+
+
+    def test_dispatches_only_to_the_named_command(self):
+        memorize, recall = Recorder(), Recorder()
+        self.router.register("memorize_text", memorize.on_command)
+        self.router.register("recall_memory", recall.on_command)
+
+        self.assertTrue(self.router.dispatch("memorize_text(the quick brown fox)"))
+        self.assertFalse(self.router.dispatch("no_such_command"))
+        self.assertEqual(memorize.calls, ["the quick brown fox"])
+        self.assertEqual(recall.calls, [])
+
+        stats = self.router.get_stats()
+        self.assertEqual(list(stats), ["memorize_text"])
+        self.assertEqual(stats["memorize_text"]["n"], 1)
+        self.assertGreaterEqual(stats["memorize_text"]["max_ms"], stats["memorize_text"]["p50_ms"])
+
+
+    def test_dispatch_count_is_not_capped_by_latency_history(self):
+        recorder = Recorder()
+        self.router.register("stop_listening", recorder.on_command)
+        with mock.patch("command_router.LATENCY_HISTORY_COUNT", 3):
+            for _ in range(5):
+                self.router.dispatch("stop_listening")
+
+        stats = self.router.get_stats()["stop_listening"]
+        self.assertEqual(stats["n"], 5)
+        self.assertEqual(stats["n_samples"], 3)
+
+
+    def test_failing_handler_does_not_stop_the_others(self):
+        def fail(args):
+            raise ValueError(args)
+        recorder = Recorder()
+        self.router.register("pan_screen_left", fail)
+        self.router.register("pan_screen_left", recorder.on_command)
+        with self.assertLogs(level="ERROR"):
+            self.router.dispatch("pan_screen_left(650)")
+        self.assertEqual(recorder.calls, ["650"])
+
+
+    def test_handlers_are_held_weakly_and_can_be_unregistered(self):
+        kept, dropped, forgotten = Recorder(), Recorder(), Recorder()
+        self.router.register("stop_listening", kept.on_command)
+        self.router.register("stop_listening", dropped.on_command)
+        self.router.register("stop_listening", forgotten.on_command)
+        self.router.unregister("stop_listening", dropped.on_command)
+        del forgotten
+        gc.collect()
+
+        self.router.dispatch("stop_listening")
+        self.assertEqual(kept.calls, [None])
+        self.assertEqual(dropped.calls, [])
+        self.assertEqual(len(self.router._handlers["stop_listening"]), 1)
+
+
+class TestGUICommands(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ttf.TTF_Init()
+        cls.font_descriptor = FontRegistry().create_fontmanager("FiraCode-Regular.ttf", 12, string_key="default")
+
+
+    def test_pan_commands_reach_the_gui(self):
+        g = GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=Session())
+        g.set_view_pos(0, 0)
+
+        signal('channel_command').send("pan_screen_right(650)")
+        signal('channel_command').send("pan_screen_up")
+        self.assertEqual(tuple(g.get_view_pos()), (650, -300))
+        self.assertIn("pan_screen_right", command_router.get_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
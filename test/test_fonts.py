@@ -0,0 +1,55 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sdl2
+import sdl2.sdlttf as ttf
+
+from gui import GUI, FontRegistry
+from draw import get_char_width
+from session import Session
+import textarea
+
+
+class TestFontRegistryMetrics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ttf.TTF_Init()
+        cls.font_descriptor = FontRegistry().create_fontmanager("FiraCode-Regular.ttf", 12, string_key="default")
+
+
+    def test_metrics_are_shared(self):
+        metrics = FontRegistry().get_metrics(self.font_descriptor)
+        self.assertIs(FontRegistry().get_metrics(self.font_descriptor), metrics)
+        self.assertIs(FontRegistry().get_ttf_font(self.font_descriptor), metrics.ttf_font)
+        self.assertIsNone(FontRegistry().get_metrics("no-such-font"))
+
+
+    def test_metrics_match_rendered_text(self):
+        metrics = FontRegistry().get_metrics(self.font_descriptor)
+        font_manager = FontRegistry().get_fontmanager(self.font_descriptor)
+
+        for char in "aW @é→":
+            surface = font_manager.render(char)
+            self.assertEqual(metrics.advance(char), surface.w)
+            self.assertEqual(metrics.line_height, surface.h)
+            self.assertEqual(get_char_width(self.font_descriptor, char), surface.w)
+            sdl2.SDL_FreeSurface(surface)
+
+        self.assertEqual(metrics.text_width("abc"), sum(metrics.advance(c) for c in "abc"))
+        self.assertGreater(metrics.ascent, 0)
+
+
+    def test_text_area_row_spacing_from_registry(self):
+        g = GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=Session())
+        ta = g.create_control("TextArea", w=100, h=100)
+        self.assertEqual(ta.row_spacing, FontRegistry().get_metrics(self.font_descriptor).line_height)
+
+
+if __name__ == '__main__':
+    unittest.main()
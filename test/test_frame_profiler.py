@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_profiler import FrameProfiler
+
+
+class TestFrameProfiler(unittest.TestCase):
+    def _run_frames(self, profiler, n_frames):
+        for _ in range(n_frames):
+            profiler.begin_frame()
+            with profiler.section("update"):
+                pass
+            for _ in range(2):
+                with profiler.section("TextArea", "draw"):
+                    time.sleep(0.001)
+            profiler.end_frame()
+
+
+    def test_disabled_records_nothing(self):
+        profiler = FrameProfiler()
+        self._run_frames(profiler, 3)
+        self.assertEqual(profiler.n_frames, 0)
+        self.assertEqual(profiler.report(), {})
+
+
+    def test_per_frame_totals_and_percentiles(self):
+        profiler = FrameProfiler()
+        profiler.set_enabled(True)
+        self._run_frames(profiler, 5)
+
+        self.assertEqual(profiler.n_frames, 5)
+        report = profiler.report()
+        self.assertEqual(set(report), {"frame:frame", "frame:update", "draw:TextArea"})
+
+        # Two 1ms draws per frame are summed into one per-frame total.
+        draw = profiler.percentiles("draw:TextArea")
+        self.assertGreaterEqual(draw["p50"], 0.002)
+        self.assertLessEqual(draw["p50"], draw["p95"])
+        self.assertLessEqual(draw["p99"], draw["max"])
+
+        # Slowest first
+        self.assertEqual(list(report)[0], "frame:frame")
+
+
+    def test_history_is_rolling(self):
+        profiler = FrameProfiler(history_frames=3, trace_frames=2)
+        profiler.set_enabled(True)
+        self._run_frames(profiler, 10)
+        self.assertEqual(len(profiler._history["frame:update"]), 3)
+        self.assertEqual(len(profiler._trace), 2)
+
+
+    def test_chrome_trace_dump(self):
+        profiler = FrameProfiler()
+        profiler.set_enabled(True)
+        self._run_frames(profiler, 2)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "trace.json")
+            profiler.dump_chrome_trace(filename)
+            with open(filename) as f:
+                trace = json.load(f)
+
+        events = trace["traceEvents"]
+        self.assertEqual(len(events), 2 * 4)
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in events))
+        self.assertEqual([e["name"] for e in events if e["cat"] == "draw"], ["TextArea"] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -388,5 +388,44 @@ class TestGUICoordinateTransforms(unittest.TestCase):
         self.assertEqual(chain[-1], cnt2)
 
 
+    def _uncached_local_to_world(self, g, control, lx, ly):
+        wx = lx + control._inset[0] + control.bounding_rect.x
+        wy = ly + control._inset[1] + control.bounding_rect.y
+        for a in g.get_ancestor_chain(control):
+            wx += a.bounding_rect.x + a._inset[0]
+            wy += a.bounding_rect.y + a._inset[1]
+        return wx, wy
+
+
+    def test_cached_world_transform_invalidation(self):
+        s = Session()
+        g = GUI(renderer=None, font_descriptor=None, client_session=s)
+
+        cnt0 = GUIContainer(gui=g, x=10, y=20, inset=(3, 4))
+        g.content().add_child(cnt0, updateLayout=False)
+        cnt1 = GUIContainer(gui=g, x=5, y=6, inset=(1, 2))
+        cnt0.add_child(cnt1, updateLayout=False)
+        c = GUIControl(gui=g, x=7, y=8, inset=(0, 0))
+        cnt1.add_child(c, updateLayout=False)
+
+        def check():
+            self.assertEqual(c.local_to_world(1, 1), self._uncached_local_to_world(g, c, 1, 1))
+            self.assertEqual(c.world_to_local(*c.local_to_world(1, 1)), (1, 1))
+
+        check()
+
+        # Moving an ancestor moves the cached world position of the whole subtree.
+        cnt0.set_position(100, 200)
+        check()
+        cnt1.set_bounds(-5, -6, 50, 50)
+        check()
+
+        # Reparenting.
+        cnt1.remove_child(c)
+        self.assertEqual(c.local_to_world(1, 1), (8, 9))
+        cnt0.add_child(c, updateLayout=False)
+        check()
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
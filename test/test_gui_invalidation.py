@@ -0,0 +1,135 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sdl2
+import sdl2.ext
+import sdl2.sdlttf as ttf
+
+from gui import GUI, GUIContainer, GUIControl, FontRegistry
+from session import Session
+
+
+class CountingControl(GUIControl):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.n_draws = 0
+
+
+    def draw(self):
+        self.n_draws += 1
+        sdl2.SDL_SetRenderDrawColor(self.renderer.sdlrenderer, 255, 0, 0, 255)
+        sdl2.SDL_RenderFillRect(self.renderer.sdlrenderer, self.get_view_rect())
+
+
+class TestDirtyFlags(unittest.TestCase):
+    def setUp(self):
+        self.gui = GUI(renderer=None, font_descriptor=None, client_session=Session())
+        self.outer = GUIContainer(gui=self.gui)
+        self.inner = GUIContainer(gui=self.gui)
+        self.leaf = GUIControl(gui=self.gui, x=5, y=5, w=10, h=10)
+        self.gui.content().add_child(self.outer)
+        self.outer.add_child(self.inner)
+        self.inner.add_child(self.leaf)
+
+        for c in (self.gui.content(), self.outer, self.inner, self.leaf):
+            c._dirty = False
+
+
+    def test_mark_dirty_propagates_to_ancestors(self):
+        self.leaf.set_needs_redraw()
+        self.assertTrue(self.leaf.is_dirty())
+        self.assertTrue(self.inner.is_dirty())
+        self.assertTrue(self.outer.is_dirty())
+        self.assertTrue(self.gui.content().is_dirty())
+
+
+    def test_move_dirties_parent_not_self(self):
+        self.leaf.set_position(6, 6)
+        self.assertFalse(self.leaf.is_dirty())
+        self.assertTrue(self.inner.is_dirty())
+        self.assertTrue(self.outer.is_dirty())
+
+
+    def test_focus_change_dirties(self):
+        self.gui.set_focus(self.leaf)
+        self.assertTrue(self.leaf.is_dirty())
+        self.assertTrue(self.outer.is_dirty())
+
+
+    def test_no_renderer_draws_directly(self):
+        self.assertFalse(self.outer._draw_layer(lambda: None))
+
+
+class TestCachedLayers(unittest.TestCase):
+    def setUp(self):
+        # Software renderer drawing into a surface, so no window is needed.
+        self.surface = sdl2.SDL_CreateRGBSurface(0, 200, 200, 32, 0, 0, 0, 0)
+        self.renderer = sdl2.ext.Renderer(self.surface.contents)
+        self.gui = GUI(renderer=self.renderer, font_descriptor=None, client_session=Session())
+
+        self.container = GUIContainer(gui=self.gui)
+        self.container.cache_layer = True
+        self.child = CountingControl(gui=self.gui, x=10, y=10, w=20, h=20)
+        self.gui.content().add_child(self.container)
+        self.container.add_child(self.child)
+
+
+    def tearDown(self):
+        self.container.release_layer()
+        sdl2.SDL_FreeSurface(self.surface)
+
+
+    def _red_at(self, x, y):
+        self.renderer.clear()
+        self.gui.draw()
+        color = sdl2.ext.pixels2d(self.surface.contents, transpose=False)[y][x]
+        return (color >> 16) & 0xFF == 255
+
+
+    def test_layer_is_only_redrawn_when_dirty(self):
+        wr = self.child.get_world_rect()
+        self.assertTrue(self._red_at(wr.x + 1, wr.y + 1))
+        self.assertEqual(self.child.n_draws, 1)
+
+        # Clean: the layer is copied, the child isn't drawn again.
+        self.assertTrue(self._red_at(wr.x + 1, wr.y + 1))
+        self.assertEqual(self.child.n_draws, 1)
+
+        # Panning moves the layer without re-rendering it.
+        self.gui.set_view_pos(5, 0)
+        self.assertTrue(self._red_at(wr.x - 4, wr.y + 1))
+        self.assertEqual(self.child.n_draws, 1)
+
+        self.child.set_needs_redraw()
+        self.assertTrue(self._red_at(wr.x - 4, wr.y + 1))
+        self.assertEqual(self.child.n_draws, 2)
+
+
+class TestTextAreaSetText(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ttf.TTF_Init()
+        cls.font_descriptor = FontRegistry().create_fontmanager("FiraCode-Regular.ttf", 12, string_key="default")
+
+
+    def test_set_text_marks_dirty(self):
+        g = GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=Session())
+        ta = g.create_control("TextArea", w=100, h=100)
+        g.content().add_child(ta)
+        ta._dirty = False
+        g.content()._dirty = False
+
+        ta.set_text("new text")
+        self.assertEqual(ta.get_text(), "new text")
+        self.assertTrue(ta.is_dirty())
+        self.assertTrue(g.content().is_dirty())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sdl2.sdlttf as ttf
+
+from gui import GUI, FontRegistry
+from session import Session
+import large_file_viewer
+from large_file_viewer import MappedFile
+
+
+class TestMappedFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def _write(self, data: bytes) -> str:
+        path = os.path.join(self.tmp_dir.name, "big.log")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+    def test_index_and_lines(self):
+        lines = [f"line {i}\t{'x' * (i % 7)}" for i in range(5000)]
+        path = self._write("\n".join(lines).encode("utf-8"))
+
+        mf = MappedFile(path)
+        self.assertTrue(mf.wait_until_indexed(timeout=10))
+        self.assertEqual(mf.get_line_count(), len(lines))
+        for row in (0, 1, 2500, 4999):
+            self.assertEqual(mf.get_line(row), lines[row])
+        with self.assertRaises(IndexError):
+            mf.get_line(5000)
+        mf.close()
+
+
+    def test_index_across_chunks(self):
+        old_chunk = large_file_viewer.LARGE_FILE_INDEX_CHUNK_BYTES
+        large_file_viewer.LARGE_FILE_INDEX_CHUNK_BYTES = 64
+        try:
+            lines = [f"{i:05d} some text" for i in range(300)]
+            path = self._write(("\r\n".join(lines) + "\r\n").encode("utf-8"))
+            mf = MappedFile(path, start_indexing=False)
+            mf.wait_until_indexed()
+        finally:
+            large_file_viewer.LARGE_FILE_INDEX_CHUNK_BYTES = old_chunk
+
+        # Same rows as str.split('\n'): a trailing newline gives an empty last line.
+        self.assertEqual(mf.get_line_count(), len(lines) + 1)
+        self.assertEqual(mf.get_line(123), lines[123])
+        self.assertEqual(mf.get_line(len(lines)), "")
+        mf.close()
+
+
+    def test_excerpt_and_empty_file(self):
+        path = self._write(b"".join(f"row {i}\n".encode() for i in range(2000)))
+        mf = MappedFile(path)
+        excerpt = mf.excerpt(100)
+        self.assertLessEqual(len(excerpt), 100)
+        self.assertTrue(excerpt.startswith("row 0\nrow 1\n"))
+        self.assertFalse(excerpt.endswith("\n"))
+        mf.close()
+
+        mf = MappedFile(self._write(b""))
+        self.assertTrue(mf.wait_until_indexed(timeout=10))
+        self.assertEqual(mf.get_line_count(), 1)
+        self.assertEqual(mf.get_line(0), "")
+        self.assertEqual(mf.excerpt(), "")
+        mf.close()
+
+
+class TestLargeFileViewer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ttf.TTF_Init()
+        cls.font_descriptor = FontRegistry().create_fontmanager("FiraCode-Regular.ttf", 12, string_key="default")
+
+
+    def test_viewer_is_read_only_and_saves_path(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "big.log")
+            with open(path, "w") as f:
+                f.write("\n".join(f"entry {i}" for i in range(1000)))
+
+            g = GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=Session())
+            viewer = g.create_control("LargeFileViewer", path=path, w=400, h=10 * 20)
+            g.content().add_child(viewer)
+            viewer.mapped_file.wait_until_indexed(timeout=10)
+
+            viewer.set_text("ignored")
+            self.assertEqual(viewer.text_buffer.get_line(10), "entry 10")
+            self.assertIsNone(viewer.point_at(5, 5))
+
+            viewer.y_scroll = 500 * viewer.row_spacing
+            first_row, _ = viewer.visible_row_range()
+            self.assertEqual(viewer.text_buffer.get_line(first_row), "entry 500")
+
+            json = viewer.__json__()
+            self.assertEqual(json["class"], "LargeFileViewer")
+            self.assertEqual(json["path"], path)
+            self.assertNotIn("text", json)
+
+            restored = GUI.control_class("LargeFileViewer").from_json(json, gui=g)
+            self.assertEqual(restored.y_scroll, viewer.y_scroll)
+
+            viewer._on_quit()
+            restored._on_quit()
+
+
+if __name__ == '__main__':
+    unittest.main()
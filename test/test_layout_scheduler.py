@@ -0,0 +1,60 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gui import GUI, GUIContainer, GUIControl
+from gui_layout import ColumnLayout
+from session import Session
+
+
+class TestDeferredLayout(unittest.TestCase):
+    def _build(self, defer_layout):
+        g = GUI(renderer=None, font_descriptor=None, client_session=Session())
+        g.defer_layout = defer_layout
+
+        outer = GUIContainer(gui=g, layout=ColumnLayout())
+        g.content().add_child(outer)
+        inner = GUIContainer(gui=g, layout=ColumnLayout())
+        outer.add_child(inner)
+        for i in range(10):
+            inner.add_child(GUIControl(gui=g, w=50 + i, h=10))
+        outer.add_child(GUIControl(gui=g, w=30, h=20))
+        return g, outer, inner
+
+
+    def test_layout_deferred_until_resolved(self):
+        g, outer, inner = self._build(defer_layout=True)
+        passes_before = g.layout_passes
+        self.assertGreater(g.layout_requests, 0)
+
+        # Nothing has been laid out yet.
+        self.assertEqual(inner.children[9].bounding_rect.y, 0)
+
+        n_passes = g.resolve_layouts()
+        self.assertEqual(g.layout_passes - passes_before, n_passes)
+        self.assertEqual(g.layout_passes_last_resolve, n_passes)
+        self.assertEqual(n_passes, 3)  # inner, outer, content: once each
+        self.assertEqual(g.resolve_layouts(), 0)
+
+
+    def test_deferred_matches_immediate(self):
+        g_immediate, outer_immediate, inner_immediate = self._build(defer_layout=False)
+        g, outer, inner = self._build(defer_layout=True)
+        g.resolve_layouts()
+
+        def rects(container):
+            return [tuple(c.get_world_rect()) for c in container.children]
+
+        self.assertEqual(rects(inner), rects(inner_immediate))
+        self.assertEqual(rects(outer), rects(outer_immediate))
+        self.assertEqual(tuple(outer.bounding_rect), tuple(outer_immediate.bounding_rect))
+        self.assertLess(g.layout_passes, g_immediate.layout_passes)
+
+
+if __name__ == '__main__':
+    unittest.main()
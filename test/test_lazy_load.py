@@ -0,0 +1,117 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sdl2
+import sdl2.sdlttf as ttf
+
+from gui import GUI, FontRegistry, LazyControl
+from session import Session
+from textarea import TextArea
+from workspace_reader import JSONStreamReader, read_workspace
+
+
+class TestWorkspaceReader(unittest.TestCase):
+    def test_streams_children_in_small_chunks(self):
+        doc = {
+            "version": "0.2",
+            "gui": {
+                "class": "GUI",
+                "content": {
+                    "class": "GUIContainer",
+                    "children": [{"class": "TextArea", "text": "x" * 300, "n": 12345}, None, {"class": "Label"}],
+                    "inset": [0, 0],
+                },
+            },
+            "viewport_pos": [10, -20],
+        }
+        children = []
+        f = io.StringIO(json.dumps(doc, indent=2))
+        f.read = (lambda read: lambda n=-1: read(min(n, 7)))(f.read)
+        result = read_workspace(f, children.append)
+
+        self.assertEqual(children, [doc["gui"]["content"]["children"][0], {"class": "Label"}])
+        self.assertEqual(result["gui"]["content"], {"class": "GUIContainer", "children": [], "inset": [0, 0]})
+        self.assertEqual(result["viewport_pos"], [10, -20])
+
+
+    def test_numbers_split_across_chunks(self):
+        reader = JSONStreamReader(io.StringIO("[123456789, 2.5e10]"), chunk_chars=4)
+        values = [reader.read_value() for _ in reader.iter_array()]
+        self.assertEqual(values, [123456789, 2.5e10])
+
+
+class TestLazyLoad(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ttf.TTF_Init()
+        cls.font_descriptor = FontRegistry().create_fontmanager("FiraCode-Regular.ttf", 12, string_key="default")
+
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.workspace_path = os.path.join(self.tmp_dir.name, "workspace.json")
+
+        g = GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=Session())
+        for i in range(5):
+            text_area = g.create_control("TextArea", x=0, y=i * 2000, w=200, h=100)
+            text_area.set_text(f"text area {i}")
+            g.content().add_child(text_area)
+        g.workspace_filename = self.workspace_path
+        g.save(wait=True)
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def _load(self, lazy_load):
+        return GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=Session(),
+                   workspace_filename=self.workspace_path, lazy_load=lazy_load)
+
+
+    def test_only_controls_in_view_are_materialized(self):
+        g = self._load(lazy_load=True)
+        children = g.content().children
+        self.assertEqual(len(children), 5)
+        self.assertTrue(all(isinstance(c, LazyControl) for c in children))
+        self.assertIsNone(g.check_hit(10, 10))
+
+        g.materialize_lazy_controls(sdl2.SDL_Rect(0, 0, 800, 600))
+        self.assertIsInstance(children[0], TextArea)
+        self.assertEqual(children[0].get_text(), "text area 0")
+        self.assertTrue(all(isinstance(c, LazyControl) for c in children[1:]))
+
+        # Same place in the hierarchy and the same bounds as the placeholder had.
+        self.assertIs(children[0].parent, g.content())
+        self.assertEqual(tuple(children[0].bounding_rect), (0, 0, 200, 100))
+
+
+    def test_save_round_trips_unmaterialized_controls(self):
+        g = self._load(lazy_load=True)
+        g.materialize_lazy_controls(sdl2.SDL_Rect(0, 3900, 800, 600))
+        g.save(wait=True)
+
+        g = self._load(lazy_load=False)
+        texts = [c.get_text() for c in g.content().children]
+        self.assertEqual(texts, [f"text area {i}" for i in range(5)])
+
+
+    def test_find_controls_materializes_everything(self):
+        g = self._load(lazy_load=True)
+        found = g.find_controls(lambda c: isinstance(c, TextArea) and c.get_text().endswith("3"))
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0].uid, g.content().children[3].uid)
+        self.assertFalse(any(isinstance(c, LazyControl) for c in g.content().children))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm
+from llm import LLMRequest, LLMLatencyStats
+from prompt import LiteralPrompt
+
+
+def make_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    def __init__(self, texts, delay=0.0):
+        self._texts = list(texts)
+        self._delay = delay
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(self._delay)
+        if not self._texts:
+            raise StopAsyncIteration
+        return make_chunk(self._texts.pop(0))
+
+
+class TestLLMRequest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(llm, "backoff_delay", return_value=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request(self, **kwargs):
+        self.events = []
+        handlers = [("start", lambda rq: self.events.append("start")),
+                    ("next", lambda rq, text: self.events.append(text)),
+                    ("stop", lambda rq: self.events.append("stop")),
+                    ("error", lambda rq, error: self.events.append("error"))]
+        return LLMRequest(prompt=LiteralPrompt("hi"), handlers=handlers, **kwargs)
+
+    async def test_streams_and_records_metrics(self):
+        async def fake_acompletion(**kwargs):
+            return FakeStream([None, "Hello", ", ", "world"])
+
+        with mock.patch.object(llm, "acompletion", fake_acompletion):
+            rq = self._request()
+            await rq.send_nowait()
+
+        self.assertEqual(self.events, ["start", "Hello", ", ", "world", "stop"])
+        self.assertEqual(rq.response_text, "Hello, world")
+        self.assertEqual(rq.metrics["attempts"], 1)
+        self.assertEqual(rq.metrics["n_tokens"], 3)
+        self.assertIn("ttft", rq.metrics)
+        self.assertIn("tokens_per_second", rq.metrics)
+
+    async def test_retries_transient_failure(self):
+        calls = []
+
+        async def flaky_acompletion(**kwargs):
+            calls.append(1)
+            if len(calls) < 3:
+                raise ConnectionError("transient")
+            return FakeStream(["ok"])
+
+        with mock.patch.object(llm, "acompletion", flaky_acompletion):
+            rq = self._request(max_retries=3)
+            await rq.send_nowait()
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.events, ["start", "ok", "stop"])
+        self.assertEqual(rq.metrics["attempts"], 3)
+
+    async def test_error_handlers_called_when_retries_exhausted(self):
+        async def failing_acompletion(**kwargs):
+            raise ConnectionError("down")
+
+        with mock.patch.object(llm, "acompletion", failing_acompletion):
+            rq = self._request(max_retries=2)
+            await rq.send_nowait()
+
+        self.assertEqual(self.events, ["start", "error"])
+        self.assertEqual(rq.metrics["attempts"], 3)
+
+    async def test_ttft_timeout_triggers_retry(self):
+        calls = []
+
+        async def stalled_then_ok(**kwargs):
+            calls.append(1)
+            return FakeStream(["late"], delay=10.0 if len(calls) == 1 else 0.0)
+
+        with mock.patch.object(llm, "acompletion", stalled_then_ok):
+            rq = self._request(max_retries=1, ttft_timeout=0.05)
+            await rq.send_nowait()
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.events, ["start", "late", "stop"])
+        # The stalled attempt counts as retry time, not as time to first token.
+        self.assertGreaterEqual(rq.metrics["retry_time"], 0.05)
+        self.assertLess(rq.metrics["ttft"], 0.05)
+
+    async def test_hedged_request_wins(self):
+        calls = []
+
+        async def slow_then_fast(**kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                return FakeStream(["slow"], delay=10.0)
+            return FakeStream(["fast"])
+
+        with mock.patch.object(llm, "acompletion", slow_then_fast), \
+             mock.patch.object(llm.latency_stats, "hedge_delay", return_value=0.02):
+            rq = self._request(hedge=True, ttft_timeout=5.0)
+            await rq.send_nowait()
+
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(rq.metrics["hedged"])
+        self.assertEqual(self.events, ["start", "fast", "stop"])
+
+
+class TestLLMLatencyStats(unittest.TestCase):
+    def test_hedge_delay_needs_history(self):
+        stats = LLMLatencyStats()
+        self.assertEqual(stats.hedge_delay("m"), llm.HEDGE_DEFAULT_DELAY_SECONDS)
+
+        for i in range(100):
+            stats.record_ttft("m", i / 100.0)
+        self.assertAlmostEqual(stats.hedge_delay("m"), 0.95)
+
+
+if __name__ == '__main__':
+    unittest.main()
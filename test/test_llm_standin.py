@@ -0,0 +1,71 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm
+import llm_standin
+from llm import LLMRequest
+from llm_standin import StandInBackend
+from prompt import LiteralPrompt
+
+
+class TestStandInBackend(unittest.IsolatedAsyncioTestCase):
+    async def _send(self, backend, text="hello"):
+        with mock.patch.object(llm, "acompletion", backend.acompletion):
+            rq = LLMRequest(prompt=LiteralPrompt(text))
+            await rq.send_nowait()
+        return rq
+
+    async def test_synthetic_is_deterministic(self):
+        def make_backend():
+            return StandInBackend(mode="synthetic", ttft=0.0, tokens_per_second=0, n_tokens=12, seed=7)
+
+        rq0 = await self._send(make_backend())
+        rq1 = await self._send(make_backend())
+        self.assertEqual(rq0.response_text, rq1.response_text)
+        self.assertEqual(rq0.metrics["n_tokens"], 12)
+
+    async def test_scripted_response(self):
+        backend = StandInBackend(mode="synthetic", ttft=0.0, tokens_per_second=0,
+                                 scripts=[("COMMAND", ""), ("weather", "It is sunny.")])
+        rq = await self._send(backend, "what's the weather?")
+        self.assertEqual(rq.response_text, "It is sunny.")
+
+        rq = await self._send(backend, "find the COMMAND")
+        self.assertEqual(rq.response_text, "")
+
+    async def test_replay_recording(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "recording.jsonl")
+            args = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]}
+            llm_standin.append_recording(path, args, [(0.0, "Hel"), (0.001, "lo")])
+            llm_standin.append_recording(path, args, [(0.0, "Second")])
+
+            backend = StandInBackend(mode="replay", recording_path=path, speedup=10.0)
+
+        rq = await self._send(backend, "no exact match")
+        self.assertEqual(rq.response_text, "Hello")
+        rq = await self._send(backend, "no exact match")
+        self.assertEqual(rq.response_text, "Second")
+
+    async def test_speedup_only_scales_replay(self):
+        # At this speedup, a synthetic 10 ms TTFT would take 10 s.
+        backend = StandInBackend(mode="synthetic", ttft=0.01, tokens_per_second=0, n_tokens=2, speedup=0.001)
+        rq = await self._send(backend)
+        self.assertLess(rq.metrics["ttft"], 1.0)
+
+    def test_speedup_must_be_positive(self):
+        for speedup in (0.0, -1.0):
+            with self.assertRaises(ValueError):
+                StandInBackend(mode="synthetic", speedup=speedup)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm
+import memory
+from memory import Memory, MemorySummarizer
+
+
+def make_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+async def stream(texts, fail_after=None):
+    for i, text in enumerate(texts):
+        if i == fail_after:
+            raise ConnectionError("connection reset")
+        await asyncio.sleep(0)
+        yield make_chunk(text)
+
+
+def fake_embed(sentences):
+    return [np.full(3, float(len(s))) for s in sentences]
+
+
+class TestMemorySummarizer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.summarizer = MemorySummarizer(max_items=3, window=0.01)
+        self.prompts = []
+        self.embed_calls = []
+
+        def embed(sentences):
+            self.embed_calls.append(list(sentences))
+            return fake_embed(sentences)
+
+        for patcher in [mock.patch.object(memory, "summarizer", self.summarizer),
+                        mock.patch.object(memory, "embed", embed),
+                        mock.patch.object(llm, "acompletion", self._acompletion)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.skip_ids = set()
+        self.fail_after_lines = None
+
+
+    async def _acompletion(self, **kwargs):
+        prompt = kwargs["messages"][-1]["content"]
+        self.prompts.append(prompt)
+
+        # Answer one JSON line per TEXT, split across chunks mid-line.
+        lines = []
+        for i in range(1, prompt.count("<TEXT id=") + 1):
+            if str(i) not in self.skip_ids:
+                lines.append(json.dumps({"id": str(i), "summary": f"summary {i}"}))
+        response = "\n".join(lines)
+        chunks = [response[i:i + 7] for i in range(0, len(response), 7)]
+
+        # Optionally, the stream breaks once some lines have come in. Only the first time.
+        fail_after = None
+        if self.fail_after_lines is not None:
+            n_chars = len("\n".join(lines[:self.fail_after_lines])) + 1
+            fail_after = -(-n_chars // 7)
+            self.fail_after_lines = None
+        return stream(chunks, fail_after)
+
+
+    async def _wait_idle(self):
+        for _ in range(200):
+            await asyncio.sleep(0.005)
+            if self.summarizer.pending_count == 0 and self.summarizer._n_in_flight == 0:
+                return
+
+
+    async def test_batches_within_window(self):
+        memories = [Memory(text=f"text {i}") for i in range(2)]
+        self.assertEqual(self.summarizer.pending_count, 2)
+        await self._wait_idle()
+
+        self.assertEqual(len(self.prompts), 1)
+        self.assertEqual([m.summary_sentence for m in memories], ["summary 1", "summary 2"])
+        self.assertEqual(self.embed_calls, [["summary 1", "summary 2"]])
+        self.assertTrue(np.array_equal(memories[1].summary_embedding, fake_embed(["summary 2"])[0]))
+
+
+    async def test_full_batch_sent_immediately(self):
+        memories = [Memory(text=f"text {i}") for i in range(7)]
+        # Two full batches went out right away. The last memory waits for the window.
+        self.assertEqual(self.summarizer.pending_count, 1)
+        await self._wait_idle()
+
+        self.assertEqual(len(self.prompts), 3)
+        self.assertTrue(all(m.summary_sentence is not None for m in memories))
+        self.assertEqual(self.summarizer.stats["summarized"], 7)
+
+
+    async def test_skipped_memory_is_retried(self):
+        self.skip_ids = {"2"}
+        memories = [Memory(text=f"text {i}") for i in range(2)]
+        await self._wait_idle()
+
+        # The retry goes out alone, as id 1, and gets "summary 1".
+        self.assertEqual(len(self.prompts), 2)
+        self.assertEqual(memories[1].summary_sentence, "summary 1")
+        self.assertEqual(self.summarizer.stats["retried"], 1)
+
+
+    async def test_summaries_before_stream_error_are_embedded(self):
+        self.fail_after_lines = 1
+        memories = [Memory(text=f"text {i}") for i in range(2)]
+        await self._wait_idle()
+
+        self.assertEqual(self.embed_calls[0], ["summary 1"])
+        self.assertTrue(memories[0]._summary_task_done)
+        self.assertTrue(np.array_equal(memories[0].summary_embedding, fake_embed(["summary 1"])[0]))
+
+        # Only the memory that got no summary is sent again.
+        self.assertEqual(len(self.prompts), 2)
+        self.assertEqual(self.prompts[1].count("<TEXT id="), 1)
+        self.assertTrue(memories[1]._summary_task_done)
+        self.assertEqual(self.summarizer.stats["retried"], 1)
+
+
+    async def test_existing_summary_not_queued(self):
+        Memory(text="text", summary_sentence="already summarized")
+        self.assertEqual(self.summarizer.pending_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pystache
+
+import prompt
+from prompt import PromptTemplate, compile_template, render_template
+
+
+TEMPLATE = """
+User: {{ User }}
+Message:
+'''{{ Message }}'''
+{{#Items}}- {{.}}
+{{/Items}}"""
+
+
+class TestPromptTemplate(unittest.TestCase):
+    def test_matches_pystache_render(self):
+        data = {'User': 'ann', 'Message': 'a < b & "c"', 'Items': ['one', 'two']}
+
+        t = PromptTemplate(TEMPLATE)
+        self.assertEqual(t.fill(**data), pystache.render(TEMPLATE, data))
+        self.assertEqual(t.get_prompt_text(), pystache.render(TEMPLATE, data))
+        self.assertEqual(render_template(TEMPLATE, data), pystache.render(TEMPLATE, data))
+        self.assertEqual(render_template(TEMPLATE, **data), pystache.render(TEMPLATE, **data))
+
+
+    def test_template_parsed_once(self):
+        parsed = compile_template(TEMPLATE)
+        self.assertIs(compile_template(TEMPLATE), parsed)
+
+        t0 = PromptTemplate(TEMPLATE)
+        t1 = PromptTemplate(TEMPLATE)
+        self.assertIs(t0._parsed_template, t1._parsed_template)
+
+        t0.fill(User='a', Message='x', Items=[])
+        t1.fill(User='b', Message='y', Items=[])
+        self.assertIn('User: a', t0.get_prompt_text())
+        self.assertIn('User: b', t1.get_prompt_text())
+
+
+    def test_set_template(self):
+        t = PromptTemplate("Hello {{ Name }}")
+        self.assertEqual(t.fill(Name="there"), "Hello there")
+        t.set_template("Bye {{ Name }}")
+        self.assertEqual(t.get_prompt_text(), "")
+        self.assertEqual(t.fill(Name="now"), "Bye now")
+        self.assertIn("Bye {{ Name }}", prompt._parsed_templates)
+
+
+if __name__ == '__main__':
+    unittest.main()
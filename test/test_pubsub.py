@@ -0,0 +1,106 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import gc
+import os
+import queue
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sdl2.sdlttf as ttf
+
+from gui import GUI, FontRegistry
+from pubsub import DROP_NEWEST, coalesce_partials
+from session import Session
+
+
+class TestSubscriptions(unittest.TestCase):
+    def setUp(self):
+        self.session = Session()
+
+
+    def _drain(self, q):
+        events = []
+        while True:
+            try:
+                events.append(q.get_nowait())
+            except queue.Empty:
+                return events
+
+
+    def test_bounded_queues_drop_by_policy(self):
+        oldest_dropped = self.session.subscribe("numbers", maxlen=3)
+        newest_dropped = self.session.subscribe("numbers", maxlen=3, drop_policy=DROP_NEWEST)
+        for i in range(5):
+            self.session.publish("numbers", i)
+
+        self.assertEqual(self._drain(oldest_dropped), [2, 3, 4])
+        self.assertEqual(self._drain(newest_dropped), [0, 1, 2])
+        self.assertEqual(oldest_dropped.n_dropped, 2)
+
+
+    def test_partial_transcripts_are_coalesced(self):
+        q = self.session.subscribe("transcribed_text", coalesce=coalesce_partials)
+        for event in [("hel", False), ("hello", False), ("hello there", True), ("how", False), ("how are", False)]:
+            self.session.publish("transcribed_text", event)
+
+        self.assertEqual(self._drain(q), [("hello there", True), ("how are", False)])
+        self.assertEqual(q.n_coalesced, 3)
+
+
+    def test_unsubscribed_and_forgotten_queues_stop_receiving(self):
+        kept = self.session.subscribe("channel")
+        dropped = self.session.subscribe("channel")
+        forgotten = self.session.subscribe("channel")
+        self.session.unsubscribe(dropped)
+        del forgotten
+        gc.collect()
+
+        self.session.publish("channel", "x")
+        self.assertEqual(self._drain(kept), ["x"])
+        self.assertTrue(dropped.empty())
+        self.assertEqual(self.session.get_channel_stats()["channel"]["n_subscribers"], 1)
+
+
+    def test_channel_stats(self):
+        q = self.session.subscribe("channel", maxlen=2)
+        for i in range(3):
+            self.session.publish("channel", i)
+        self.session.publish("nobody_listening", 0)
+
+        stats = self.session.get_channel_stats()
+        self.assertEqual(stats["channel"], {"n_published": 3, "n_subscribers": 1, "depth": 2,
+                                            "max_depth": 2, "n_dropped": 1, "n_coalesced": 0})
+        self.assertEqual(stats["nobody_listening"]["n_published"], 1)
+
+
+class TestTextAreaTranscripts(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ttf.TTF_Init()
+        cls.font_descriptor = FontRegistry().create_fontmanager("FiraCode-Regular.ttf", 12, string_key="default")
+
+
+    def test_focus_changes_do_not_leak_subscriptions(self):
+        session = Session()
+        g = GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=session)
+        a = g.create_control("TextArea", x=0, y=0, w=200, h=100)
+        b = g.create_control("TextArea", x=0, y=200, w=200, h=100)
+        g.content().add_child(a)
+        g.content().add_child(b)
+
+        for _ in range(5):
+            g.set_focus(a)
+            g.set_focus(b)
+        self.assertEqual(session.get_channel_stats()["transcribed_text"]["n_subscribers"], 1)
+
+        session.publish("transcribed_text", ("hel", False))
+        session.publish("transcribed_text", ("hello", False))
+        b.on_update(0.0)
+        self.assertEqual(b.get_text(), "hello")
+
+
+if __name__ == '__main__':
+    unittest.main()
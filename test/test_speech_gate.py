@@ -0,0 +1,75 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from speech_gate import SpeechGate
+
+
+RATE = 16_000
+FRAME = 320     # 20 ms
+
+
+def tone(n_frames, amplitude, freq=200.0):
+    t = np.arange(n_frames * FRAME) / RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def noise(n_frames, amplitude, seed=0):
+    rng = np.random.default_rng(seed)
+    return (amplitude * rng.standard_normal(n_frames * FRAME)).clip(-32768, 32767).astype(np.int16)
+
+
+class TestSpeechGate(unittest.TestCase):
+    def test_energy_gate_with_preroll_and_hangover(self):
+        gate = SpeechGate(FRAME, RATE, preroll_frames=2, hangover_frames=3)
+        pcm = np.concatenate([noise(10, 20), tone(5, 8000), noise(10, 20)])
+        speech = gate.process(pcm.tobytes())
+
+        self.assertEqual(len(speech), 25)
+        self.assertEqual(np.flatnonzero(speech).tolist(), list(range(8, 18)))
+        self.assertEqual(gate.get_stats()["n_speech_frames"], 10)
+
+
+    def test_hangover_carries_across_blocks(self):
+        gate = SpeechGate(FRAME, RATE, preroll_frames=0, hangover_frames=3)
+        first = gate.process(np.concatenate([noise(4, 20), tone(2, 8000)]).tobytes())
+        second = gate.process(noise(6, 20).tobytes())
+        self.assertEqual(first.tolist(), [False] * 4 + [True] * 2)
+        self.assertEqual(second.tolist(), [True] * 3 + [False] * 3)
+
+
+    def test_noise_floor_adapts(self):
+        gate = SpeechGate(FRAME, RATE, preroll_frames=0, hangover_frames=0)
+        # Steady background that's loud at first...
+        self.assertTrue(gate.process(tone(1, 1000).tobytes()).all())
+        # ...then becomes the floor, once a quieter stretch shows what silence is like.
+        gate.process(noise(50, 600, seed=1).tobytes())
+        self.assertGreater(gate.noise_floor, 300)
+        self.assertFalse(gate.process(noise(20, 600, seed=2).tobytes()).any())
+        self.assertTrue(gate.process(tone(5, 8000).tobytes()).all())
+
+
+    def test_only_loud_frames_reach_the_vad(self):
+        class CountingVad:
+            n_calls = 0
+
+            def is_speech(self, buf, rate):
+                CountingVad.n_calls += 1
+                assert(len(buf) == 2 * FRAME)
+                return True
+
+        gate = SpeechGate(FRAME, RATE, vad=CountingVad(), preroll_frames=0, hangover_frames=0)
+        speech = gate.process(np.concatenate([noise(20, 20), tone(3, 8000), noise(20, 20)]).tobytes())
+        self.assertEqual(CountingVad.n_calls, 3)
+        self.assertEqual(int(speech.sum()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
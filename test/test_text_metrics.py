@@ -0,0 +1,152 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sdl2.sdlttf as ttf
+
+from gui import GUI, FontRegistry
+from draw import draw_cursor
+from session import Session
+from text_edit_buffer import TextEditBuffer
+import text_metrics
+import textarea
+
+
+class TestTextMetrics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ttf.TTF_Init()
+        cls.font_descriptor = FontRegistry().create_fontmanager("FiraCode-Regular.ttf", 12, string_key="default")
+        cls.metrics = FontRegistry().get_metrics(cls.font_descriptor)
+
+
+    def setUp(self):
+        text_metrics.clear_cache()
+
+
+    def test_line_offsets_are_prefix_sums(self):
+        line = "ab\tc"
+        offsets = text_metrics.line_offsets(self.font_descriptor, line, tab_spaces=4)
+        a, b, c, space = (self.metrics.advance(ch) for ch in "abc ")
+        self.assertEqual(offsets, [0, a, a + b, a + b + 4 * space, a + b + 4 * space + c])
+        self.assertEqual(text_metrics.text_width(self.font_descriptor, line, tab_spaces=4), offsets[-1])
+        self.assertEqual(text_metrics.line_offsets(self.font_descriptor, "", tab_spaces=4), [0])
+
+
+    def test_offsets_cached_per_line(self):
+        offsets = text_metrics.line_offsets(self.font_descriptor, "hello")
+        self.assertIs(text_metrics.line_offsets(self.font_descriptor, "hello"), offsets)
+
+        # An edited line is a different key, so its offsets are rebuilt.
+        edited = text_metrics.line_offsets(self.font_descriptor, "hellox")
+        self.assertIsNot(edited, offsets)
+        self.assertEqual(edited[:-1], offsets)
+
+
+    def test_column_to_x_clamps(self):
+        offsets = text_metrics.line_offsets(self.font_descriptor, "abc")
+        self.assertEqual(text_metrics.column_to_x(self.font_descriptor, "abc", 2), offsets[2])
+        self.assertEqual(text_metrics.column_to_x(self.font_descriptor, "abc", 10), offsets[3])
+        self.assertEqual(text_metrics.column_to_x(self.font_descriptor, "abc", -1), 0)
+
+
+    def test_x_to_column_snaps_to_nearest_boundary(self):
+        line = "abcd"
+        offsets = text_metrics.line_offsets(self.font_descriptor, line)
+        for col in range(len(line) + 1):
+            self.assertEqual(text_metrics.x_to_column(self.font_descriptor, line, offsets[col]), col)
+
+        # Just left or right of the middle of glyph 1.
+        left_half = (offsets[1] + offsets[2]) // 2 - 1
+        self.assertEqual(text_metrics.x_to_column(self.font_descriptor, line, left_half), 1)
+        self.assertEqual(text_metrics.x_to_column(self.font_descriptor, line, offsets[2] - 1), 2)
+
+        self.assertEqual(text_metrics.x_to_column(self.font_descriptor, line, -50), 0)
+        self.assertEqual(text_metrics.x_to_column(self.font_descriptor, line, 10000), len(line))
+
+
+    def test_draw_cursor_uses_column_offsets(self):
+        tb = TextEditBuffer("first\n\tsecond line")
+        tb.set_point(len("first\n\tsec"))
+        x, y = draw_cursor(None, self.font_descriptor, tb, 20, 100, 50, dont_draw_just_calculate=True)
+        self.assertEqual(x, 100 + text_metrics.column_to_x(self.font_descriptor, "\tsecond line", 4))
+        self.assertEqual(y, 50 + 20)
+
+
+    def test_text_area_point_at(self):
+        g = GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=Session())
+        ta = g.create_control("TextArea", w=400, h=200, x=10, y=20)
+        g.content().add_child(ta)
+        ta.set_text("one\ntwo words\nthree")
+
+        wr = ta.get_world_rect()
+        offsets = text_metrics.line_offsets(self.font_descriptor, "two words")
+        wy = wr.y + ta.row_spacing + ta.row_spacing // 2
+        self.assertEqual(ta.point_at(wr.x + offsets[4], wy), len("one\n") + 4)
+
+        # Below the last line: clamps to the last line, and to its end.
+        self.assertEqual(ta.point_at(wr.x + wr.w - 1, wr.y + wr.h - 1), len(ta.get_text()))
+
+        # Scrolled down by one row, the same position hits the next line.
+        ta.y_scroll = ta.row_spacing
+        self.assertEqual(ta.point_at(wr.x, wy), len("one\ntwo words\n"))
+
+        self.assertIsNone(ta.point_at(wr.x - 5, wy))
+
+
+    def test_text_area_visible_row_range(self):
+        g = GUI(renderer=None, font_descriptor=self.font_descriptor, client_session=Session())
+        ta = g.create_control("TextArea", w=400, h=10 * self.metrics.line_height, x=0, y=0)
+        ta.set_text("\n".join(str(i) for i in range(1000)))
+        ta.y_scroll = 0
+        self.assertEqual(ta.visible_row_range(), (0, 11))
+
+        ta.y_scroll = 500 * ta.row_spacing + ta.row_spacing // 2
+        self.assertEqual(ta.visible_row_range(), (500, 511))
+
+        ta.y_scroll = 995 * ta.row_spacing
+        self.assertEqual(ta.visible_row_range(), (995, 1000))
+
+
+class TestTextEditBufferLineIndex(unittest.TestCase):
+    def _naive_row_col(self, text, point):
+        before = text[:point].split('\n')
+        return len(before) - 1, len(before[-1])
+
+
+    def test_row_col_matches_naive(self):
+        tb = TextEditBuffer("ab\n\ncd\tef\n")
+        text = tb.get_text()
+        for point in range(len(text) + 1):
+            self.assertEqual(tb.get_row_col(point), self._naive_row_col(text, point))
+
+        self.assertEqual(tb.get_line_count(), 4)
+        self.assertEqual([tb.get_line_start(row) for row in range(4)], [0, 3, 4, 10])
+        self.assertEqual(tb.get_line(2, expand_tabs=False), "cd\tef")
+        self.assertEqual(tb.get_line(3), "")
+        with self.assertRaises(IndexError):
+            tb.get_line(4)
+
+
+    def test_line_index_follows_edits(self):
+        tb = TextEditBuffer("abc")
+        self.assertEqual(tb.get_line_count(), 1)
+
+        tb.set_point(1)
+        tb.insert("\nxy\n")
+        self.assertEqual(tb.get_line_count(), 3)
+        self.assertEqual(tb.get_line(1), "xy")
+        self.assertEqual(tb.get_row_col(tb.get_point()), (2, 0))
+
+        tb.delete_char()
+        self.assertEqual(tb.get_line_count(), 2)
+        self.assertEqual(tb.get_line(1), "xybc")
+
+
+if __name__ == '__main__':
+    unittest.main()
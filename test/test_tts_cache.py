@@ -0,0 +1,63 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_cache import TTSCache
+
+
+class TestTTSCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+
+    def _key(self, text, pitch=-20.0):
+        return TTSCache.key(text, "en-GB-Neural2-D", 1.2, pitch, 44_100)
+
+
+    def test_round_trip_through_mmap(self):
+        cache = TTSCache(self.tmp_dir.name)
+        self.assertIsNone(cache.get(self._key("Okay")))
+        cache.put(self._key("Okay"), b"\x01\x02\x03\x04")
+
+        with cache.get(self._key("Okay")) as mapped:
+            self.assertEqual(mapped[:], b"\x01\x02\x03\x04")
+        self.assertIsNone(cache.get(self._key("Okay", pitch=0.0)))
+        self.assertEqual(cache.get_stats(), {"n_entries": 1, "total_bytes": 4, "n_hits": 1, "n_misses": 2})
+
+
+    def test_evicts_least_recently_used(self):
+        cache = TTSCache(self.tmp_dir.name, max_bytes=8)
+        cache.put(self._key("a"), b"aaaa")
+        cache.put(self._key("b"), b"bbbb")
+        cache.get(self._key("a")).close()
+        cache.put(self._key("c"), b"cccc")
+
+        self.assertIsNone(cache.get(self._key("b")))
+        self.assertIsNotNone(cache.get(self._key("a")))
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 2)
+
+
+    def test_recency_survives_reopening(self):
+        cache = TTSCache(self.tmp_dir.name, max_bytes=8)
+        cache.put(self._key("a"), b"aaaa")
+        cache.put(self._key("b"), b"bbbb")
+        time.sleep(0.01)
+        cache.get(self._key("a")).close()
+
+        cache = TTSCache(self.tmp_dir.name, max_bytes=8)
+        self.assertEqual(cache.get_stats()["total_bytes"], 8)
+        cache.put(self._key("c"), b"cccc")
+        self.assertIsNone(cache.get(self._key("b")))
+        self.assertIsNotNone(cache.get(self._key("a")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import io
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+import unittest
+from unittest import mock
+import wave
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyaudio
+
+from audio_service import AudioService
+from tts_cache import TTSCache
+from voice_out import SentenceSplitter, VoiceOut, pcm_from_linear16
+
+
+def wav_bytes(pcm: bytes) -> bytes:
+    f = io.BytesIO()
+    with wave.open(f, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(VoiceOut.N_SAMPLES_PER_SECOND)
+        w.writeframes(pcm)
+    return f.getvalue()
+
+
+class FakeTTSClient:
+    """Synthesizes each character as one sample of its code."""
+    def __init__(self):
+        self.texts = []
+
+
+    def synthesize_speech(self, input, voice, audio_config):
+        self.texts.append(input.text)
+        pcm = b"".join(ord(c).to_bytes(2, "little") for c in input.text)
+        return SimpleNamespace(audio_content=wav_bytes(pcm))
+
+
+class FakeOutputStream:
+    def __init__(self):
+        self.closed = False
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def wait_for(condition, timeout=2.0):
+    t_end = time.time() + timeout
+    while not condition():
+        if time.time() > t_end:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+class TestSentenceSplitter(unittest.TestCase):
+    def test_sentences_come_out_as_tokens_complete_them(self):
+        splitter = SentenceSplitter()
+        tokens = ["Hello", " there", ". How", " are you", "?", " I'm", " fine", ".\n", "- item one\n", "No end"]
+        sentences = [s for token in tokens for s in splitter.feed(token)]
+        self.assertEqual(sentences, ["Hello there.", "How are you?", "I'm fine.", "- item one"])
+        self.assertEqual(splitter.flush(), "No end")
+
+
+    def test_decimal_points_do_not_end_sentences(self):
+        self.assertEqual(SentenceSplitter().feed("Pi is 3.14 or so. "), ["Pi is 3.14 or so."])
+
+
+    def test_run_on_text_is_cut_at_a_space(self):
+        splitter = SentenceSplitter(max_chars=12)
+        self.assertEqual(splitter.feed("one two three four five"), ["one two", "three four"])
+        self.assertEqual(splitter.flush(), "five")
+
+
+class TestVoiceOut(unittest.TestCase):
+    def setUp(self):
+        self.streams = []
+        def open_stream(handler, frames_per_buffer):
+            self.streams.append(FakeOutputStream())
+            return self.streams[-1]
+        patcher = mock.patch.object(AudioService, "get_voice_output_stream", side_effect=open_stream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Four samples per output buffer, and each character synthesizes to one sample.
+        patcher = mock.patch.object(VoiceOut, "N_FRAMES_PER_BUFFER", 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = FakeTTSClient()
+        self.n_done = 0
+        self.vo = VoiceOut(on_speech_done=[self._on_done], client=self.client)
+        self.addCleanup(self.vo.close)
+
+
+    def _on_done(self):
+        self.n_done += 1
+
+
+    def _play(self, status_flags=0):
+        data, status = self.vo._stream_callback(None, 4, None, status_flags)
+        samples = [int.from_bytes(data[i:i + 2], "little") for i in range(0, len(data or b""), 2)]
+        return "".join(chr(s) if s else "_" for s in samples), status
+
+
+    def test_pcm_from_linear16_strips_wav_header(self):
+        self.assertEqual(pcm_from_linear16(wav_bytes(b"\x01\x02\x03\x04")), b"\x01\x02\x03\x04")
+        self.assertEqual(pcm_from_linear16(b"\x01\x02"), b"\x01\x02")
+
+
+    def test_plays_first_sentence_while_the_rest_streams_in(self):
+        utterance = self.vo.begin()
+        utterance.feed("Hi. Th")
+        wait_for(lambda: self.streams)
+        self.assertEqual(self.client.texts, ["Hi."])
+
+        # The next sentence isn't ready, so there's silence after the first.
+        self.assertEqual(self._play(), ("Hi._", pyaudio.paContinue))
+        self.assertEqual(self._play(), ("____", pyaudio.paContinue))
+        self.assertEqual(self.vo.n_underruns, 1)
+
+        utterance.feed("ere. ")
+        utterance.end()
+        wait_for(lambda: len(self.vo._blocks) == 3)
+        self.assertEqual(self._play(), ("Ther", pyaudio.paContinue))
+        self.assertEqual(self._play(), ("e.__", pyaudio.paComplete))
+
+        wait_for(lambda: self.n_done == 1)
+        self.assertTrue(self.streams[0].closed)
+        self.assertIsNone(VoiceOut.get_current_speaker())
+
+
+    def test_next_sentence_is_synthesized_while_one_plays(self):
+        self.vo.say("One. Two. Three.")
+        wait_for(lambda: len(self.vo._blocks) == 5)
+        self.assertEqual(self.client.texts, ["One.", "Two.", "Three."])
+
+        played = [self._play() for _ in range(4)]
+        self.assertEqual([text for text, _ in played], ["One.", "Two.", "Thre", "e.__"])
+        self.assertEqual(played[-1][1], pyaudio.paComplete)
+        self.assertEqual(self.vo.n_underruns, 0)
+        wait_for(lambda: self.n_done == 1)
+
+
+    def test_utterances_are_spoken_in_order(self):
+        first = self.vo.begin()
+        self.vo.say("Second.")
+        first.feed("First.")
+        first.end()
+        wait_for(lambda: len(self.vo._blocks) == 6)
+
+        played = [self._play()[0] for _ in range(4)]
+        self.assertEqual(played, ["Firs", "t.__", "Seco", "nd._"])
+        wait_for(lambda: self.n_done == 2)
+
+
+    def test_callback_hands_over_blocks_without_copying(self):
+        self.vo.say("Abcd.")
+        wait_for(lambda: len(self.vo._blocks) == 3)
+        first_block = self.vo._blocks[0]
+        data, _ = self.vo._stream_callback(None, 4, None, pyaudio.paOutputUnderflow)
+        self.assertIs(data, first_block)
+        self.assertEqual(self.vo.get_stats(), {"n_callbacks": 1, "n_underruns": 0, "n_output_underflows": 1})
+
+
+    def test_cached_sentences_are_not_synthesized_again(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.vo.cache = TTSCache(tmp_dir)
+            self.vo.say("Okay. Sure.")
+            wait_for(lambda: len(self.vo._blocks) == 5)
+            self.vo._blocks.clear()
+
+            self.vo.say("Okay.")
+            wait_for(lambda: len(self.vo._blocks) == 3)
+            self.assertEqual(self.client.texts, ["Okay.", "Sure."])
+            self.assertEqual(self._play()[0], "Okay")
+            self.assertEqual(self.vo.cache.get_stats()["n_hits"], 1)
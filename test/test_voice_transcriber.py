@@ -0,0 +1,156 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import assemblyai as aai
+import numpy as np
+import webrtcvad
+
+from record_audio import MicrophoneStream, WavStreamWriter, N_SAMPLES_PER_SECOND, N_CHUNK_SAMPLES
+from session import Session
+from speech_gate import SpeechGate
+from stt_backends import AssemblyAIBackend, STTBackend, register_stt_backend
+from transcribe_audio import N_SAMPLES_PER_20_MS, VoiceTranscriber
+
+
+def voiced_pcm(seconds: float) -> bytes:
+    """A buzzy, syllable-modulated tone that the VAD takes for speech."""
+    t = np.arange(int(seconds * N_SAMPLES_PER_SECOND)) / N_SAMPLES_PER_SECOND
+    signal = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 20)) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))
+    return (signal / np.abs(signal).max() * 12000).astype(np.int16).tobytes()
+
+
+class FakeTranscriber:
+    def __init__(self):
+        self.sent = []
+
+
+    def stream(self, data):
+        self.sent.append(data)
+
+
+class ByteCountBackend(STTBackend):
+    """Transcribes audio as how many bytes of it there have been so far."""
+    name = "test_byte_count"
+
+    def __init__(self, sample_rate):
+        super().__init__(sample_rate)
+        self.n_bytes = 0
+
+
+    def stream(self, pcm):
+        self.n_bytes += len(pcm)
+        self._emit(str(self.n_bytes), False, 1000 * self.n_bytes / (2 * self.sample_rate))
+
+
+    def close(self):
+        self._emit(str(self.n_bytes), True, None)
+
+
+register_stt_backend(ByteCountBackend.name, ByteCountBackend)
+
+
+class TestVoiceTranscriberAudioThread(unittest.TestCase):
+    def setUp(self):
+        self.session = Session()
+        self.vt = VoiceTranscriber(session=self.session)
+        self.vt.vad = webrtcvad.Vad()
+        self.vt._speech_gate = SpeechGate(N_SAMPLES_PER_20_MS, N_SAMPLES_PER_SECOND, vad=self.vt.vad)
+        self.vt.transcriber = FakeTranscriber()
+        self.vt.stream = MicrophoneStream(N_SAMPLES_PER_SECOND, N_CHUNK_SAMPLES, on_audio=self.vt._audio_ready.set)
+
+
+    def _capture(self, pcm: bytes):
+        # As PyAudio's callback would.
+        self.vt.stream._fill_buffer(pcm, len(pcm) // 2, None, 0)
+
+
+    def test_speech_is_sent_from_audio_thread(self):
+        sent_from = []
+        transcriber_stream = self.vt.transcriber.stream
+        self.vt.transcriber.stream = lambda data: (sent_from.append(threading.current_thread()), transcriber_stream(data))
+
+        thread = threading.Thread(target=self.vt._run_audio_thread)
+        thread.start()
+        self._capture(voiced_pcm(0.5))
+        self._capture(voiced_pcm(0.5)[:100])     # Not a whole VAD window
+        time.sleep(0.05)
+        self.vt._stop_audio.set()
+        self.vt._audio_ready.set()
+        thread.join(timeout=5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(sent_from)
+        self.assertTrue(all(t is thread for t in sent_from))
+        self.assertEqual(sum(len(b) for b in self.vt.transcriber.sent), 16000)
+        self.assertAlmostEqual(self.vt._sent_audio_ms, 500.0)
+
+
+    def test_transcripts_reach_gui_with_latency(self):
+        self._capture(voiced_pcm(0.4))
+        self.vt._process_audio()
+
+        q = self.session.subscribe("transcribed_text")
+        backend = AssemblyAIBackend(N_SAMPLES_PER_SECOND)
+        backend._on_transcript = self.vt._on_transcript
+        transcript = aai.RealtimeFinalTranscript(message_type="FinalTranscript", audio_start=0, audio_end=400,
+                                                 confidence=0.9, text="hello there", words=[], created="2024-01-01T00:00:00",
+                                                 punctuated=True, text_formatted=True)
+        backend._on_transcribe_data(transcript)
+        self.vt.update()
+
+        self.assertEqual(q.get_nowait(), ("hello there", True))
+        stats = self.vt.latency_stats.summary()
+        self.assertEqual(stats["n"], 1)
+        self.assertGreaterEqual(stats["audio_to_text_p50"], 0.0)
+        self.assertIsNotNone(stats["text_to_gui_p50"])
+
+
+    def test_audio_to_text_includes_time_waiting_in_the_buffer(self):
+        self._capture(voiced_pcm(0.4))
+        time.sleep(0.05)    # The audio thread is late
+        self.vt._process_audio()
+        self.vt._on_transcript("hello", True, 400.0)
+
+        self.assertGreaterEqual(self.vt.latency_stats.audio_to_text[-1], 0.05)
+
+
+class TestWavReplay(unittest.TestCase):
+    def test_replayed_wav_is_transcribed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "speech.wav")
+            writer = WavStreamWriter(filename)
+            writer.write(voiced_pcm(2.0))
+            writer.close()
+
+            session = Session()
+            q = session.subscribe("transcribed_text")
+            vt = VoiceTranscriber(session=session, stt_backend=ByteCountBackend.name, replay_wav=filename, replay_speed=0)
+            vt.start_recording()
+            self.assertTrue(vt.stream.finished.wait(timeout=10))
+            vt.stop_recording()
+            vt.update()
+
+        transcripts = []
+        while not q.empty():
+            transcripts.append(q.get_nowait())
+
+        # Nearly all of the two seconds is speech. The gate may trim the quiet ends.
+        text, is_final = transcripts[-1]
+        self.assertTrue(is_final)
+        self.assertGreater(int(text), 48_000)
+        self.assertLessEqual(int(text), 64_000)
+        self.assertFalse(any(is_final for _, is_final in transcripts[:-1]))
+        self.assertEqual(vt.latency_stats.summary()["n"], len(transcripts) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+# Porcupine itself isn't needed to test the plumbing around it.
+with mock.patch.dict(sys.modules, {"pvporcupine": mock.MagicMock()}):
+    from voice_wakeup import PhraseListener, WAKEWORD_QUEUE_FRAMES
+
+
+FRAME_LENGTH = 512
+WAKE_SAMPLE = 1234
+
+
+class FakePorcupine:
+    """Hears the wake phrase in any frame that starts with WAKE_SAMPLE."""
+    def __init__(self):
+        self.frames = []
+
+
+    def process(self, pcm):
+        self.frames.append(pcm)
+        return 0 if pcm[0] == WAKE_SAMPLE else -1
+
+
+    def delete(self):
+        pass
+
+
+def frame(first_sample=0):
+    samples = np.zeros(FRAME_LENGTH, dtype=np.int16)
+    samples[0] = first_sample
+    return samples.tobytes()
+
+
+def wait_for(condition, timeout=2.0):
+    t_end = time.time() + timeout
+    while not condition():
+        if time.time() > t_end:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+class TestPhraseListener(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"PICOVOICE_ACCESS_KEY": "test"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.n_detected = 0
+        self.listener = PhraseListener(detected_callback=self._on_detected)
+
+
+    def _on_detected(self):
+        self.n_detected += 1
+
+
+    def _callback(self, data):
+        return self.listener._audio_input_stream_callback(data, FRAME_LENGTH, None, 0)
+
+
+    def test_queue_is_bounded_and_drops_oldest_frames(self):
+        for i in range(WAKEWORD_QUEUE_FRAMES + 6):
+            self._callback(frame(i))
+
+        self.assertEqual(self.listener.n_dropped_frames, 6)
+        oldest, _ = self.listener._audio_q.get_nowait()
+        self.assertEqual(np.frombuffer(oldest, dtype=np.int16)[0], 6)
+
+
+    def test_worker_processes_every_frame_without_update(self):
+        porcupine = FakePorcupine()
+        self.listener._pv_handle = porcupine
+        self.listener._start_worker()
+        self.addCleanup(self.listener.stop)
+
+        for i in range(10):
+            self._callback(frame(WAKE_SAMPLE if i in (4, 5) else 0))
+        wait_for(lambda: self.listener.n_frames == 10)
+
+        self.assertTrue(all(len(f) == FRAME_LENGTH and f.dtype == np.int16 for f in porcupine.frames))
+        self.assertEqual(self.n_detected, 0)
+
+        # Heard in two frames, but reported once, on the GUI thread.
+        self.listener.update()
+        self.listener.update()
+        self.assertEqual(self.n_detected, 1)
+
+        stats = self.listener.get_stats()
+        self.assertEqual((stats["n_frames"], stats["n_dropped_frames"], stats["queue_depth"]), (10, 0, 0))
+        self.assertGreaterEqual(stats["lag_max_ms"], stats["lag_p50_ms"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_stream import EventStream
+from gui import GUI, GUIControl
+from memory import Memory, MemoryStore
+from session import Session
+from workspace_writer import WorkspaceSaver, backup_filenames, write_atomically
+
+
+class TestWriteAtomically(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "workspace.json")
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_backups_are_bounded(self):
+        for i in range(6):
+            write_atomically(self.path, f"version {i}", max_backups=3)
+
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "version 5")
+
+        backups = backup_filenames(self.path)
+        self.assertEqual([os.path.basename(p) for p in backups],
+                         ["workspace_3.json", "workspace_4.json", "workspace_5.json"])
+        with open(backups[-1]) as f:
+            self.assertEqual(f.read(), "version 4")
+
+        # No temporary files left behind.
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 4)
+
+
+    def test_failed_write_leaves_file_alone(self):
+        write_atomically(self.path, "good")
+        with self.assertRaises(TypeError):
+            write_atomically(self.path, None)
+
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "good")
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["workspace.json"])
+
+
+class TestWorkspaceSaver(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "workspace.json")
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_skips_unchanged_snapshots(self):
+        saver = WorkspaceSaver(max_backups=2)
+        saver.submit(self.path, {"saved_at_utc": "1", "gui": {"n": 1}})
+        self.assertTrue(saver.wait(timeout=10))
+        saver.submit(self.path, {"saved_at_utc": "2", "gui": {"n": 1}}, skip_if_unchanged=True)
+        saver.close()
+
+        self.assertEqual(saver.n_saves, 1)
+        self.assertEqual(saver.n_skipped_unchanged, 1)
+        self.assertEqual(saver.get_stats()["n_saves"], 1)
+        self.assertIsNotNone(saver.get_stats()["last_s"])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)["saved_at_utc"], "1")
+
+
+    def test_files_do_not_supersede_each_other(self):
+        saver = WorkspaceSaver(max_backups=0)
+        other_path = os.path.join(self.tmp_dir.name, "percepts.json")
+        saver.submit(self.path, {"gui": {"n": 1}})
+        saver.submit(other_path, [{"type": "SessionStart"}])
+        saver.submit(self.path, {"gui": {"n": 2}})
+        saver.close()
+
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)["gui"]["n"], 2)
+        with open(other_path) as f:
+            self.assertEqual(json.load(f), [{"type": "SessionStart"}])
+        self.assertLessEqual(saver.n_superseded, 1)
+        self.assertEqual(saver.n_saves + saver.n_superseded, 3)
+
+
+    def test_gui_save_writes_memories_in_background(self):
+        memory_path = os.path.join(self.tmp_dir.name, "agent_memory.json")
+        percepts_path = os.path.join(self.tmp_dir.name, "agent_percepts.json")
+        store = MemoryStore()
+        store.store(Memory(text="remember this", summary_sentence="a summary",
+                           summary_embedding=np.array([0.25, 0.5])))
+        percepts = EventStream()
+        percepts.put({"type": "SessionStart"})
+
+        class FakeAgent:
+            def memory_snapshots(self):
+                return {memory_path: store.snapshot(), percepts_path: percepts.snapshot()}
+
+        g = GUI(renderer=None, font_descriptor=None, client_session=Session())
+        g.workspace_filename = self.path
+        g.agent = FakeAgent()
+        g.save(wait=True)
+        g.on_quit()
+
+        loaded = MemoryStore()
+        loaded.load(memory_path)
+        memory = next(iter(loaded._memories.values()))
+        self.assertEqual(memory.summary_sentence, "a summary")
+        self.assertEqual(memory.summary_embedding.tolist(), [0.25, 0.5])
+        with open(percepts_path) as f:
+            self.assertEqual(json.load(f), [{"type": "SessionStart"}])
+        self.assertEqual(g.get_save_stats()["n_saves"], 3)
+
+
+    def test_gui_save_in_background(self):
+        g = GUI(renderer=None, font_descriptor=None, client_session=Session())
+        g.workspace_filename = self.path
+        g.content().add_child(GUIControl(gui=g, x=3, y=4, w=50, h=60))
+
+        g.save(wait=True)
+        g.save(wait=True)
+        g.on_quit()
+
+        with open(self.path) as f:
+            saved = json.load(f)
+        self.assertEqual(saved["gui"]["content"]["children"][0]["bounding_rect"][2:], [50, 60])
+        self.assertEqual(len(backup_filenames(self.path)), 1)
+        self.assertEqual(g.get_save_stats()["n_saves"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from bisect import bisect_right
+
 
 class TextEditBuffer(object):
 
@@ -35,6 +37,11 @@ class TextEditBuffer(object):
         self.MARK = None
         self.desired_col = 0
 
+        # Offsets of the start of each line in TEXT_BUFFER. Rebuilt lazily, the first
+        # time they're needed after TEXT_BUFFER has been replaced by an edit.
+        self._line_starts = [0]
+        self._line_starts_text = ""
+
 
     def insert(self, text='\n'):
         self.TEXT_BUFFER = self.TEXT_BUFFER[:self.POINT] + text + self.TEXT_BUFFER[self.POINT:]
@@ -84,13 +91,40 @@ class TextEditBuffer(object):
         return text.replace('\t', ' ' * self.TAB_SPACES)
     
 
+    def _get_line_starts(self):
+        if self._line_starts_text is not self.TEXT_BUFFER:
+            text = self.TEXT_BUFFER
+            line_starts = [0]
+            i = text.find('\n')
+            while i != -1:
+                line_starts.append(i + 1)
+                i = text.find('\n', i + 1)
+            self._line_starts = line_starts
+            self._line_starts_text = text
+        return self._line_starts
+
+
+    def get_line_count(self):
+        return len(self._get_line_starts())
+
+
+    # @return the offset into TEXT_BUFFER of the first character of the given row.
+    def get_line_start(self, row):
+        line_starts = self._get_line_starts()
+        if 0 <= row < len(line_starts):
+            return line_starts[row]
+        raise IndexError("Row index out of range")
+
+
     def get_line(self, row, expand_tabs=True):
-        lines = self.get_lines(expand_tabs=expand_tabs)
-        if 0 <= row < len(lines):
+        line_starts = self._get_line_starts()
+        if 0 <= row < len(line_starts):
+            end = line_starts[row + 1] - 1 if row + 1 < len(line_starts) else len(self.TEXT_BUFFER)
+            line = self.TEXT_BUFFER[line_starts[row]:end]
             if expand_tabs:
-                return self.expand_tabs(lines[row])
+                return self.expand_tabs(line)
             else:
-                return lines[row]
+                return line
         raise IndexError("Row index out of range")
     
 
@@ -123,18 +157,13 @@ class TextEditBuffer(object):
     
     
     def get_row_col(self, point):
-        row = None
-        col = None
-
-        lines = self.get_lines(expand_tabs=False)
-        cumulative_length = 0
-        for row, line in enumerate(lines):
-            line_length = len(line) + 1   # +1 for the '\n' character
-            if cumulative_length <= point < cumulative_length + line_length:
-                col = point - cumulative_length
-                return row, col
-            cumulative_length += line_length
-        return len(lines) - 1, line_length
+        line_starts = self._get_line_starts()
+        if 0 <= point <= len(self.TEXT_BUFFER):
+            row = bisect_right(line_starts, point) - 1
+            return row, point - line_starts[row]
+
+        # Out of range. Past the end of the last line, counting its (virtual) newline.
+        return len(line_starts) - 1, len(self.TEXT_BUFFER) - line_starts[-1] + 1
     
 
     def get_point(self):
@@ -241,7 +270,7 @@ class TextEditBuffer(object):
 
     def move_point_down(self):
         row, col = self.get_row_col(self.POINT)
-        num_rows = len(self.get_lines())
+        num_rows = self.get_line_count()
         if row < num_rows - 1:
             from_line_length = len(self.get_line(row, expand_tabs=False))
 
@@ -0,0 +1,92 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bulk text measurement.
+
+For each line of text we build, once, the prefix sums of its glyph advances, i.e. the
+x offset of every column. Column -> x is then a list lookup, and x -> column is a
+binary search. Prefix sums are cached by line contents, so editing a line invalidates
+only that line's entry. Glyph advances come from the font's cached table in
+FontRegistry (see gui.fonts.FontMetrics).
+
+Tabs are measured as tab_spaces spaces, as TextEditBuffer expands them for drawing."""
+
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from typing import List, Tuple
+
+from gui.fonts import FontDescriptor, FontRegistry
+
+
+# Lines of prefix sums to keep. Enough for every visible line of every TextArea on
+# screen, plus the lines around the cursor in the rest.
+LINE_OFFSETS_CACHE_SIZE = 4096
+
+_line_offsets_cache: "OrderedDict[Tuple[FontDescriptor, int, str], List[int]]" = OrderedDict()
+
+
+def line_offsets(font_descriptor: FontDescriptor, line: str, tab_spaces: int = 4) -> List[int]:
+    """x offsets, in pixels, of every column boundary of an un-expanded line.
+    Element i is the x of the left edge of column i, and the last element is the width
+    of the whole line, so there are len(line) + 1 elements."""
+    key = (font_descriptor, tab_spaces, line)
+    offsets = _line_offsets_cache.get(key)
+    if offsets is not None:
+        _line_offsets_cache.move_to_end(key)
+        return offsets
+
+    metrics = FontRegistry().get_metrics(font_descriptor)
+    assert(metrics is not None)
+    advance = metrics.advance
+    tab_width = tab_spaces * advance(' ')
+
+    offsets = [0]
+    offsets.extend(accumulate(tab_width if char == '\t' else advance(char) for char in line))
+
+    _line_offsets_cache[key] = offsets
+    if len(_line_offsets_cache) > LINE_OFFSETS_CACHE_SIZE:
+        _line_offsets_cache.popitem(last=False)
+    return offsets
+
+
+def column_to_x(font_descriptor: FontDescriptor, line: str, col: int, tab_spaces: int = 4) -> int:
+    """x offset of the left edge of column col. Columns past the end of the line are
+    clamped to the end."""
+    offsets = line_offsets(font_descriptor, line, tab_spaces)
+    return offsets[max(0, min(col, len(offsets) - 1))]
+
+
+def x_to_column(font_descriptor: FontDescriptor, line: str, x: int, tab_spaces: int = 4) -> int:
+    """Column boundary nearest to x, for placing a cursor from a mouse position.
+    Returns a value between 0 and len(line)."""
+    offsets = line_offsets(font_descriptor, line, tab_spaces)
+    if x <= 0:
+        return 0
+    if x >= offsets[-1]:
+        return len(offsets) - 1
+
+    # offsets[col] <= x < offsets[col + 1]. Snap to whichever edge of that glyph is nearer.
+    col = bisect_right(offsets, x) - 1
+    if x - offsets[col] > offsets[col + 1] - x:
+        col += 1
+    return col
+
+
+def text_width(font_descriptor: FontDescriptor, line: str, tab_spaces: int = 4) -> int:
+    return line_offsets(font_descriptor, line, tab_spaces)[-1]
+
+
+def clear_cache() -> None:
+    _line_offsets_cache.clear()
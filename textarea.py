@@ -15,15 +15,18 @@
 
 import ctypes
 import sdl2
-from sdl2.ext.ttf import FontTTF
-from sdl2.sdlttf import TTF_FontHeight
 from draw import draw_cursor, draw_rectangle, draw_text, set_color
+from frame_profiler import profiler
 from gui import GUI, GUIControl
 from gui.fonts import FontRegistry
-import os
 from text_edit_buffer import TextEditBuffer
+import text_metrics
 import queue
 from platform_utils import is_cmd_pressed
+from pubsub import coalesce_partials
+
+
+TRANSCRIPT_QUEUE_LENGTH = 64    # Transcript events a focused TextArea can fall behind by before dropping the oldest
 
 
 class TextArea(GUIControl):
@@ -88,24 +91,10 @@ class TextArea(GUIControl):
         self._resize_start_size = None
         self._resize_edge = None
 
-        # @hack @todo FontManager is deprecated. Should use sdl2.ext.ttf.FontTTF
-        fm = FontRegistry().get_fontmanager(self.font_descriptor)
-        assert(fm is not None)
-        font_size_px = fm.size
-
-        # print('__file__:', __file__)
-        app_path = os.path.dirname(os.path.abspath(__file__))  # @todo DRY if this file location changes, then we'll need to update computation of app_path
-        # print(f'app_path: {app_path}')
-
-        font_filepath = os.path.abspath(os.path.join(app_path, "res/fonts/FiraCode-Regular.ttf"))
-        # print(f'font_filepath: {font_filepath}')
-
-        font = FontTTF(font_filepath, font_size_px, (255, 255, 255))
-        ttf_font = font.get_ttf_font()
-        line_height_px = TTF_FontHeight(ttf_font)
-        self.row_spacing = line_height_px
-        del ttf_font
-        font.close()
+        # Shared with every other control using this font. Don't open the font file here.
+        metrics = FontRegistry().get_metrics(self.font_descriptor)
+        assert(metrics is not None)
+        self.row_spacing = metrics.line_height
 
 
     def __json__(self):
@@ -118,9 +107,14 @@ class TextArea(GUIControl):
     
     def _change_focus(self, am_getting_focus: bool) -> bool:
         # @hack @todo make this optional
+        # Each partial transcript replaces the one before, so only the newest unread one matters.
         if am_getting_focus:
-            self.input_q = self.gui.session.subscribe("transcribed_text")
-        else:
+            if self.input_q is None:
+                self.input_q = self.gui.session.subscribe("transcribed_text",
+                                                          maxlen=TRANSCRIPT_QUEUE_LENGTH,
+                                                          coalesce=coalesce_partials)
+        elif self.input_q is not None:
+            self.gui.session.unsubscribe(self.input_q)
             self.input_q = None
 
         return super()._change_focus(am_getting_focus)
@@ -132,15 +126,18 @@ class TextArea(GUIControl):
     
     def set_text(self, text: str) -> None:
         self.text_buffer.set_text(text)
+        self.set_needs_redraw()
 
 
     def on_update(self, dt):
         if self.input_q is not None:
+            got_text = False
             try:
                 while True:
                     (text, is_final) = self.input_q.get_nowait()
                     if len(text) == 0:
                         continue
+                    got_text = True
 
                     # self.set_text(text)
 
@@ -164,7 +161,8 @@ class TextArea(GUIControl):
             except queue.Empty:
                 pass
             finally:
-                self.set_needs_redraw()
+                if got_text:
+                    self.set_needs_redraw()
         
 
 
@@ -180,6 +178,15 @@ class TextArea(GUIControl):
             if event.button.button == sdl2.SDL_BUTTON_LEFT:
                 mx, my = event.button.x, event.button.y
                 wx, wy = self.gui.view_to_world(mx, my)
+                if not self._get_edge(wx, wy):
+                    # Click inside the text: move the cursor there.
+                    point = self.point_at(wx, wy)
+                    if point is not None:
+                        self.text_buffer.clear_mark()
+                        self.text_buffer.set_point(point)
+                        self.text_buffer.desired_col = self.text_buffer.get_row_col(point)[1]
+                        self.set_needs_redraw()
+
                 if self._is_on_edge(wx, wy):
                     self._resizing = True
                     self._resize_start_pos = (wx, wy)
@@ -414,6 +421,21 @@ class TextArea(GUIControl):
         return self.parent_handle_event(event)
     
 
+    def point_at(self, wx, wy):
+        """Text buffer point nearest to world position (wx, wy), or None if it's outside
+        this TextArea. Rows beyond the text clamp to the first or last line."""
+        wr = self.get_world_rect()
+        if not (wr.x <= wx <= wr.x + wr.w and wr.y <= wy <= wr.y + wr.h):
+            return None
+
+        row = int((wy - wr.y + self.y_scroll) // self.row_spacing)
+        row = max(0, min(row, self.text_buffer.get_line_count() - 1))
+        line = self.text_buffer.get_line(row, expand_tabs=False)
+        col = text_metrics.x_to_column(self.font_descriptor, line, wx - wr.x + self.x_scroll,
+                                       self.text_buffer.get_tab_spaces())
+        return self.text_buffer.get_line_start(row) + col
+
+
     def _is_on_edge(self, wx, wy):
         rect = self.get_world_rect()
         leeway = 1
@@ -499,6 +521,7 @@ class TextArea(GUIControl):
 
 
     def set_needs_redraw(self):
+        super().set_needs_redraw()
         if self.combined_text_texture is not None:
             sdl2.SDL_DestroyTexture(self.combined_text_texture)
             self.combined_text_texture = None
@@ -537,13 +560,18 @@ class TextArea(GUIControl):
         sdl2.SDL_SetRenderDrawColor(self.renderer.sdlrenderer, old_color[0], old_color[1], old_color[2], old_color[3])
 
 
+    def visible_row_range(self):
+        """(first, last + 1) rows of text that overlap this TextArea at the current
+        y_scroll. Only these rows are drawn."""
+        first = max(0, int(self.y_scroll // self.row_spacing))
+        last = int((self.y_scroll + self.bounding_rect.h) // self.row_spacing)
+        return first, min(last + 1, self.text_buffer.get_line_count())
+
+
     def draw(self):
-        lines = self.text_buffer.get_lines()
-        
         vr = self.get_view_rect()
 
         vx = vr.x - self.x_scroll
-        vy = vr.y - self.y_scroll
 
         # Determine start and end of selection
         selected = self.text_buffer.get_selection()
@@ -553,45 +581,50 @@ class TextArea(GUIControl):
             sel_rc1 = self.text_buffer.get_row_col(i_end)
 
         if self.combined_text_texture is None:
-            surf = sdl2.SDL_CreateRGBSurface(0, self.bounding_rect.w, self.bounding_rect.h, 32, 0, 0, 0, 0)
-
-            # Draw the text
-            for i, line in enumerate(lines):
-                if len(line.strip()) != 0:
-                    if selected is not None:
-                        # Figure out where the selection starts and ends, line by line since
-                        # we can have multiline selections, and we are drawing the text a line
-                        # at a time.
-
-                        c_start = None
-                        if i < sel_rc0[0]:          # current line is before (not in) selection
-                            pass
-                        elif i == sel_rc0[0]:       # current line is first line of selection
-                            c_start = sel_rc0[1]
-                        elif i <= sel_rc1[0]:       # current line is internal to selection or last
-                            c_start = 0
-
-
-                        c_end = None
-                        if i > sel_rc1[0]:
-                            pass
-                        elif i < sel_rc1[0]:
-                            c_end = len(line)
-                        elif i == sel_rc1[0]:
-                            c_end = sel_rc1[1]
-
-                        draw_text(self.renderer, self.font_descriptor, 
-                                line, 
-                                vx, vy, bounding_rect=vr,
-                                dst_surface=surf, 
-                                selection_start=c_start, selection_end=c_end)
-                    else:
-                        draw_text(self.renderer, self.font_descriptor, line, vx, vy, bounding_rect=vr, dst_surface=surf)
-
-                vy += self.row_spacing
-
-            self.combined_text_texture = sdl2.SDL_CreateTextureFromSurface(self.renderer.sdlrenderer, surf)
-            sdl2.SDL_FreeSurface(surf)
+            with profiler.section(self.__class__.__name__, "texture"):
+                surf = sdl2.SDL_CreateRGBSurface(0, self.bounding_rect.w, self.bounding_rect.h, 32, 0, 0, 0, 0)
+
+                # Draw the text. Only the rows in view: lines above and below would be
+                # clipped away entirely.
+                first_row, end_row = self.visible_row_range()
+                vy = vr.y - self.y_scroll + first_row * self.row_spacing
+                for i in range(first_row, end_row):
+                    line = self.text_buffer.get_line(i)
+                    if len(line.strip()) != 0:
+                        if selected is not None:
+                            # Figure out where the selection starts and ends, line by line since
+                            # we can have multiline selections, and we are drawing the text a line
+                            # at a time.
+
+                            c_start = None
+                            if i < sel_rc0[0]:          # current line is before (not in) selection
+                                pass
+                            elif i == sel_rc0[0]:       # current line is first line of selection
+                                c_start = sel_rc0[1]
+                            elif i <= sel_rc1[0]:       # current line is internal to selection or last
+                                c_start = 0
+
+
+                            c_end = None
+                            if i > sel_rc1[0]:
+                                pass
+                            elif i < sel_rc1[0]:
+                                c_end = len(line)
+                            elif i == sel_rc1[0]:
+                                c_end = sel_rc1[1]
+
+                            draw_text(self.renderer, self.font_descriptor, 
+                                    line, 
+                                    vx, vy, bounding_rect=vr,
+                                    dst_surface=surf, 
+                                    selection_start=c_start, selection_end=c_end)
+                        else:
+                            draw_text(self.renderer, self.font_descriptor, line, vx, vy, bounding_rect=vr, dst_surface=surf)
+
+                    vy += self.row_spacing
+
+                self.combined_text_texture = sdl2.SDL_CreateTextureFromSurface(self.renderer.sdlrenderer, surf)
+                sdl2.SDL_FreeSurface(surf)
 
         assert(self.combined_text_texture is not None)
         sdl2.SDL_RenderCopy(self.renderer.sdlrenderer, self.combined_text_texture, None, vr)
@@ -599,9 +632,9 @@ class TextArea(GUIControl):
         self._draw_bounds(vr)
 
         # Draw cursor
-        if self.has_focus():
+        if self.has_focus() and self.is_editable:
             row, col = self.text_buffer.get_row_col(self.text_buffer.get_point())
-            line = lines[row]
+            line = self.text_buffer.get_line(row)
             if line is not None and col is not None:
                 old_color = set_color(self.renderer, (255, 255, 255, 255))
                 draw_cursor(self.renderer, self.font_descriptor, self.text_buffer, self.row_spacing, vr.x, vr.y, vr, self.x_scroll, self.y_scroll)
@@ -615,6 +648,9 @@ class TextArea(GUIControl):
 
 
     def scroll_cursor_into_view(self):
+        if not self.is_editable:
+            return
+
         # Where is the cursor?
         wr = self.get_world_rect()
         x_cursor, y_cursor = draw_cursor(self.renderer, self.font_descriptor, 
@@ -17,47 +17,116 @@ that the app configuration is loaded, before it's needed."""
 
 
 import sdl2
+from collections import deque
 import json
 import logging
 import os
 import openai
+import threading
+import time
+from typing import Deque, Optional
 
-from record_audio import MicrophoneStream, N_SAMPLES_PER_SECOND, N_CHUNK_SAMPLES, N_SAMPLE_BYTES
+from config import STT_BACKEND
+from record_audio import MicrophoneStream, WavReplaySource, WavStreamWriter, N_SAMPLES_PER_SECOND, N_CHUNK_SAMPLES, N_SAMPLE_BYTES
 
 # import pyaudio
-from multiprocessing import Process, Queue
 import os
-import assemblyai as aai
 import webrtcvad
-import queue
-import wave
 from datetime import datetime
+import numpy as np
+from speech_gate import SpeechGate
+from stt_backends import create_stt_backend
 from utils import unique_filename
 
 
-aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY")
-
-
 SAMPLE_RATE = 16000
 N_RECORDING_CHANNELS = 1
 
 N_BYTES_PER_20_MS = N_SAMPLES_PER_SECOND * N_SAMPLE_BYTES // 50  # The VAD can only handle chunks of 10, 20, or 30 ms.
+N_SAMPLES_PER_20_MS = N_BYTES_PER_20_MS // N_SAMPLE_BYTES
+
+AUDIO_THREAD_WAIT_SECONDS = 0.1     # Audio thread wakes at least this often, even without audio
+SENT_CHUNK_HISTORY_COUNT = 500      # Sent audio chunks remembered, to time the transcripts for them
+LATENCY_HISTORY_COUNT = 200
 
 
 PANEL_WIDTH = 350
 PANEL_HEIGHT = 120
 
 
+class TranscriptLatencyStats:
+    """Rolling history of how long speech takes to turn into text.
+    audio_to_text: from capturing the end of the audio a transcript covers, to receiving it.
+    text_to_gui: from receiving a transcript, to the GUI thread publishing it."""
+
+    def __init__(self, maxlen: int = LATENCY_HISTORY_COUNT):
+        self.audio_to_text: Deque[float] = deque(maxlen=maxlen)
+        self.text_to_gui: Deque[float] = deque(maxlen=maxlen)
+
+
+    @staticmethod
+    def percentile(samples, p: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        i = min(len(ordered) - 1, int(p / 100.0 * len(ordered)))
+        return ordered[i]
+
+
+    def summary(self) -> dict:
+        audio_to_text = list(self.audio_to_text)
+        text_to_gui = list(self.text_to_gui)
+        return {
+            "n": len(audio_to_text),
+            "audio_to_text_p50": self.percentile(audio_to_text, 50),
+            "audio_to_text_p95": self.percentile(audio_to_text, 95),
+            "text_to_gui_p50": self.percentile(text_to_gui, 50),
+            "text_to_gui_p95": self.percentile(text_to_gui, 95),
+        }
+
+
 class VoiceTranscriber:
+    """Streams microphone audio to a speech-to-text backend (see stt_backends.py), and
+    publishes the text that comes back as "transcribed_text" session events.
+
+    Three threads are involved. PyAudio's callback writes audio into the microphone
+    stream's ring buffer, and wakes our audio thread. The audio thread runs the VAD over
+    it, and sends speech to the transcriber. The transcriber calls _on_transcript(), on
+    its own thread or the audio thread, which appends to incoming_text. update(), on the GUI thread,
+    only has to drain incoming_text. A deque's append() and popleft() are atomic, so no
+    lock is needed between the two."""
 
     def __init__(self, **kwargs):
         logging.debug("VoiceTranscriber.__init__()")
         self.vad = None
+        self._speech_gate = None
         self.stream = None
         self.recording_start_dt = None
         self.transcriber = None
-        self.all_audio_bytes = b""
-        self.incoming_text = Queue()  # Entries are (text: str, is_final: bool)
+        self.incoming_text: Deque[tuple] = deque()  # Entries are (text: str, is_final: bool, t_received: float)
+
+        # If save_audio is set, each recording is streamed to a WAV file as it comes in.
+        self.save_audio = kwargs.get("save_audio", False)
+        self._audio_writer = None
+
+        # stt_backend names a speech-to-text backend. If replay_wav is given, recording
+        # plays that file, replay_speed times faster than real time, instead of using the
+        # microphone. E.g. for benchmarks.
+        self.stt_backend = kwargs.get("stt_backend", STT_BACKEND)
+        self.replay_wav = kwargs.get("replay_wav")
+        self.replay_speed = kwargs.get("replay_speed", 1.0)
+
+        self._audio_thread: Optional[threading.Thread] = None
+        self._audio_ready = threading.Event()
+        self._stop_audio = threading.Event()
+
+        # (end of chunk in ms of audio sent so far, time it was captured), to match
+        # transcripts' audio_end times back to when that audio was captured.
+        self._sent_chunks_lock = threading.Lock()
+        self._sent_chunks: Deque[tuple] = deque(maxlen=SENT_CHUNK_HISTORY_COUNT)
+        self._sent_audio_ms = 0.0
+
+        self.latency_stats = TranscriptLatencyStats()
 
         self.session = kwargs.get("session")
         assert(self.session is not None)
@@ -68,19 +137,30 @@ class VoiceTranscriber:
         assert(not self.is_recording())
 
         self.vad = webrtcvad.Vad()
+        self._speech_gate = SpeechGate(N_SAMPLES_PER_20_MS, N_SAMPLES_PER_SECOND, vad=self.vad)
 
-        self.stream = MicrophoneStream(N_SAMPLES_PER_SECOND, N_CHUNK_SAMPLES)
-        self.stream.start()
+        if self.replay_wav is not None:
+            self.stream = WavReplaySource(self.replay_wav, N_SAMPLES_PER_SECOND, N_CHUNK_SAMPLES,
+                                          speed=self.replay_speed, on_audio=self._audio_ready.set)
+        else:
+            self.stream = MicrophoneStream(N_SAMPLES_PER_SECOND, N_CHUNK_SAMPLES, on_audio=self._audio_ready.set)
         self.recording_start_dt = datetime.now()
 
-        self.transcriber = aai.RealtimeTranscriber(
-            sample_rate=N_SAMPLES_PER_SECOND,
-            on_data=self._on_transcribe_data,
-            on_error=self._on_transcribe_error,
-            on_open=self._on_transcribe_open,
-            on_close=self._on_transcribe_close
-        )
-        self.transcriber.connect()
+        if self.save_audio:
+            audio_filename = unique_filename(f"audio_in_{self.recording_start_dt.strftime('%Y-%m-%d_%H%Mh_%Ss')}.wav")
+            self._audio_writer = WavStreamWriter(audio_filename, N_SAMPLES_PER_SECOND, N_RECORDING_CHANNELS, N_SAMPLE_BYTES)
+
+        with self._sent_chunks_lock:
+            self._sent_chunks.clear()
+            self._sent_audio_ms = 0.0
+
+        self.transcriber = create_stt_backend(self.stt_backend, N_SAMPLES_PER_SECOND)
+        self.transcriber.connect(self._on_transcript)
+
+        self._stop_audio.clear()
+        self._audio_thread = threading.Thread(target=self._run_audio_thread, name="VoiceTranscriberAudio", daemon=True)
+        self._audio_thread.start()
+        self.stream.start()
 
         logging.debug("EXIT VoiceTranscriber.start_recording()")
 
@@ -91,24 +171,30 @@ class VoiceTranscriber:
             return
 
         self.stream.stop()
+
+        # The audio thread handles whatever audio is left, then exits.
+        self._stop_audio.set()
+        self._audio_ready.set()
+        self._audio_thread.join()
+        self._audio_thread = None
         self.stream = None
 
         assert(self.transcriber is not None)
         self.transcriber.close()
         self.transcriber = None
+        logging.info(f"VoiceTranscriber speech gate: {self._speech_gate.get_stats()}")
         self.vad = None
+        self._speech_gate = None
 
+        if self._audio_writer is not None:
+            self._audio_writer.close()
+            n_frames = self._audio_writer.n_bytes // N_SAMPLE_BYTES // N_RECORDING_CHANNELS
+            c_seconds = n_frames / N_SAMPLES_PER_SECOND
+            logging.info(f"Wrote {c_seconds} seconds ({n_frames} frames) of audio to {self._audio_writer.filename}")
+            self._audio_writer = None
 
-        # Write audio to file
-        # audio_filename = unique_filename(f"audio_in_{self.recording_start_dt.strftime('%Y-%m-%d_%H%Mh_%Ss')}.wav")
-        # self._write_audio_file(audio_filename, self.all_audio_bytes)
-        
-        # n_frames = len(self.all_audio_bytes) // N_SAMPLE_BYTES // N_RECORDING_CHANNELS
-        # c_seconds = n_frames / N_SAMPLES_PER_SECOND
-
-        # logging.info(f"Wrote {c_seconds} seconds ({n_frames} frames) of audio to {audio_filename}")
         self.recording_start_dt = None
-        self.all_audio_bytes = b""
+        logging.info(f"VoiceTranscriber latency: {self.latency_stats.summary()}")
 
         logging.debug("EXIT VoiceTranscriber.stop_recording()")
 
@@ -117,91 +203,88 @@ class VoiceTranscriber:
         return self.stream is not None
     
 
-    # @note: this is executing on a different thread than my app functions
-    # like on_update()
-    def _on_transcribe_data(self, transcript: aai.RealtimeTranscript):
-        # print(f"_on_transcribe_data(): tid={threading.current_thread().ident}")
-        # 
-        logging.debug(transcript)
-        if not transcript.text:
-            return
+    def _run_audio_thread(self):
+        while not self._stop_audio.is_set():
+            self._audio_ready.wait(AUDIO_THREAD_WAIT_SECONDS)
+            self._audio_ready.clear()
+            self._process_audio()
+
+        self._process_audio()
+
+
+    def _process_audio(self):
+        """Runs on the audio thread. Gate out silence, and send the speech for transcription."""
+        # Whole VAD windows only. The ring buffer's size is a multiple of the window
+        # size, so reads never split one. A partial window waits for the next wakeup.
+        while True:
+            audio_bytes = self.stream.read(multiple_of=N_BYTES_PER_20_MS)
+            n_audio_bytes = len(audio_bytes)
+            if n_audio_bytes == 0:
+                break
+
+            # When the end of this audio was captured, not read, so that audio_to_text
+            # includes the time it waited for this thread.
+            t_captured = self.stream.t_last_read_captured
+            if t_captured is None:
+                t_captured = time.perf_counter()
+
+            # logging.debug(f"Audio: {n_audio_bytes} bytes")
 
-        if isinstance(transcript, aai.RealtimePartialTranscript):
-            self.incoming_text.put((transcript.text, False))
-        elif isinstance(transcript, aai.RealtimeFinalTranscript):
-            self.incoming_text.put((transcript.text, True))
+            # Which 20 ms frames are speech? Silent ones aren't sent at all.
+            is_speech = self._speech_gate.process(audio_bytes)
+            n_speech_frames = int(np.count_nonzero(is_speech))
 
+            if n_speech_frames > 0:
+                # logging.debug(f'{n_speech_frames} speech frames. Sending for transcription.')
+                with self._sent_chunks_lock:
+                    self._sent_audio_ms += 20 * n_speech_frames
+                    self._sent_chunks.append((self._sent_audio_ms, t_captured))
 
-    def _on_transcribe_error(self, error: aai.RealtimeError):
-        logging.error(f"Assembly AI Error: {error}")
+                # The transcriber queues what it's given, so it needs its own copy anyway.
+                frames = np.frombuffer(audio_bytes, dtype=np.int16).reshape(-1, N_SAMPLES_PER_20_MS)
+                self.transcriber.stream(frames[is_speech].tobytes())
 
+            if self._audio_writer is not None:
+                self._audio_writer.write(audio_bytes)
 
-    def _on_transcribe_open(self, session_opened: aai.RealtimeSessionOpened):
-        logging.debug(f"Assembly AI session opened with ID: {session_opened.session_id}")
 
-    def _on_transcribe_close(self):
-        # @note @bug whiy is this called twice on stop_recording?
-        logging.debug("Assembly AI session closed.")
+    def _capture_time_of(self, audio_ms: float) -> Optional[float]:
+        """When the sent audio at audio_ms (from the start of the transcription session)
+        was captured. None if it's too old to remember."""
+        with self._sent_chunks_lock:
+            for end_ms, t_captured in self._sent_chunks:
+                if end_ms >= audio_ms:
+                    return t_captured
+        return None
+
+
+    # @note: this is executing on a different thread than my app functions
+    # like on_update()
+    def _on_transcript(self, text: str, is_final: bool, audio_end_ms: Optional[float]):
+        t_received = time.perf_counter()
+
+        if audio_end_ms is not None:
+            t_captured = self._capture_time_of(audio_end_ms)
+            if t_captured is not None:
+                self.latency_stats.audio_to_text.append(t_received - t_captured)
+
+        self.incoming_text.append((text, is_final, t_received))
 
 
     def update(self):
+        """Runs on the GUI thread. Publishes text that has come back from the transcriber."""
         # logging.debug('ENTER VoiceTranscriber.update()')
-        # logging.debug(f"self.is_recording(): {self.is_recording()}")
-        if self.is_recording():
-            assert(self.transcriber is not None)
+        while self.incoming_text:
+            (text, is_final, t_received) = self.incoming_text.popleft()
+            if len(text) == 0:
+                continue
 
-            audio_bytes = self.stream.get_nowait()
-            n_audio_bytes = len(audio_bytes)
-            n_audio_frames = n_audio_bytes // N_SAMPLE_BYTES // N_RECORDING_CHANNELS
-            n_ms = n_audio_frames * 1000 // SAMPLE_RATE
-
-            if len(audio_bytes) > 0:
-                # logging.debug(f"Audio: {len(audio_bytes)} bytes ({n_audio_frames} frames; {n_ms} ms)")
-                
-                # Any speech detected in this audio chunk?
-                is_speech = False
-                for i in range(0, n_audio_bytes, N_BYTES_PER_20_MS):
-                    vad_chunk = audio_bytes[i:i+N_BYTES_PER_20_MS]
-                    is_speech = self.vad.is_speech(vad_chunk, N_SAMPLES_PER_SECOND)
-                    if is_speech:
-                        break
-
-                if is_speech:
-                    # logging.debug('is_speech: True. Sending for transcription.')
-                    self.transcriber.stream(audio_bytes)
-                else:
-                    # logging.debug('is_speech: False.')
-                    pass
-
-                self.all_audio_bytes += audio_bytes
-                # print(f"Total audio: {len(self.all_audio_bytes)} bytes")
-
-        text = ""
-        was_final = False
-        try:
-            while True:
-                (text, is_final) = self.incoming_text.get_nowait()
-                if len(text) == 0:
-                    continue
-
-                if is_final:
-                    logging.debug(f"** FINAL text: '{text}'")
-                else:
-                    logging.debug(f"** PARTIAL text: '{text}'")
-                
-                self.session.publish("transcribed_text", (text, is_final))  # @todo use Blinker named signal instead
-                
-                was_final = is_final
-
-        except queue.Empty:
-            pass
+            if is_final:
+                logging.debug(f"** FINAL text: '{text}'")
+            else:
+                logging.debug(f"** PARTIAL text: '{text}'")
 
-        # logging.debug('EXIT VoiceTranscriber.update()')
+            self.session.publish("transcribed_text", (text, is_final))  # @todo use Blinker named signal instead
+            self.latency_stats.text_to_gui.append(time.perf_counter() - t_received)
 
-
-    def _write_audio_file(self, filename, audio_bytes):
-        with wave.open(filename, 'wb') as wf:
-            wf.setnchannels(N_RECORDING_CHANNELS)
-            wf.setsampwidth(N_SAMPLE_BYTES)
-            wf.setframerate(N_SAMPLES_PER_SECOND)
-            wf.writeframes(audio_bytes)
+        # logging.debug('EXIT VoiceTranscriber.update()')
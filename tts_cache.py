@@ -0,0 +1,136 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""On-disk cache of synthesized speech.
+
+Each entry is a file of raw PCM, named by a hash of everything that went into
+synthesizing it: the text, voice, speaking rate, pitch and sample rate. Hits are
+memory-mapped rather than read, so they can be played straight from the page cache.
+When the cache grows past its size limit, the least recently used entries are deleted.
+Recency is kept in the files' modification times, so it survives restarts."""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Optional
+
+from config import TTS_CACHE_MAX_BYTES
+
+
+PCM_EXT = ".pcm"
+
+
+class TTSCache:
+    def __init__(self, directory: str, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        # Key -> size in bytes, least recently used first.
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self.n_hits = 0
+        self.n_misses = 0
+
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(PCM_EXT):
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.name[:-len(PCM_EXT)], st.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+
+    @staticmethod
+    def key(text: str, voice: str, speaking_rate: float, pitch: float, sample_rate: int) -> str:
+        s = json.dumps([text, voice, speaking_rate, pitch, sample_rate])
+        return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+
+    def get(self, key: str) -> Optional[mmap.mmap]:
+        """The cached PCM, memory-mapped read-only, or None. Close it when done."""
+        if key not in self._entries:
+            self.n_misses += 1
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            # Deleted from under us, or empty.
+            logging.warning(f'TTSCache: dropping unreadable entry "{path}": {e}')
+            self._forget(key)
+            self.n_misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.n_hits += 1
+        return mapped
+
+
+    def put(self, key: str, pcm: bytes) -> None:
+        if not pcm or key in self._entries:
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pcm)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logging.warning(f'TTSCache: could not write entry: {e}')
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self._entries[key] = len(pcm)
+        self._total_bytes += len(pcm)
+        self._evict()
+
+
+    def get_stats(self) -> dict:
+        return {
+            "n_entries": len(self._entries),
+            "total_bytes": self._total_bytes,
+            "n_hits": self.n_hits,
+            "n_misses": self.n_misses,
+        }
+
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + PCM_EXT)
+
+
+    def _forget(self, key: str) -> None:
+        self._total_bytes -= self._entries.pop(key)
+
+
+    def _evict(self) -> None:
+        # Always keep the newest entry, even if it's bigger than the whole cache.
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._forget(key)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
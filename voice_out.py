@@ -1,15 +1,111 @@
+"""Text-to-speech output, via Google Cloud TTS.
+
+Text is spoken in utterances. say() speaks some text. begin() starts an utterance whose
+text is fed in a piece at a time, e.g. as tokens arrive from an LLMRequest, and ended
+with end(). Either way, the text is cut into sentences, and a worker thread synthesizes
+each sentence while the one before it plays. So speech starts once the first sentence
+has been synthesized, rather than the whole text. Synthesized PCM is queued for the
+PyAudio output callback. Utterances are spoken one after another, in the order they
+were begun.
+
+With a TTSCache, sentences that have been said before, like "Okay", are played from
+disk instead of being synthesized again."""
+
+from collections import deque
 from google.cloud import texttospeech
+import io
 import logging
 import pyaudio
-import pydub
+import queue
+import re
 import threading
+from typing import List, Optional
+import wave
 from audio_service import AudioService
+from tts_cache import TTSCache
+
+
+# A sentence ends with punctuation, maybe closing quotes or brackets, then whitespace. Or
+# at a line break, which also ends list items and headings.
+SENTENCE_END = re.compile(r'[.!?]+[\'")\]]*\s+|\n\s*')
+MAX_SENTENCE_CHARS = 300        # Run-on text is cut at a space before this many characters
+WORKER_POLL_SECONDS = 0.1       # How often the idle worker checks whether playback has finished
+CACHE_MAX_TEXT_CHARS = 120      # Longer sentences are unlikely to be said again. Don't cache them.
+
+_END_OF_UTTERANCE = None
+
+
+class SentenceSplitter:
+    """Cuts text into sentences as it's fed in, a token or so at a time."""
+    def __init__(self, max_chars: int = MAX_SENTENCE_CHARS):
+        self.max_chars = max_chars
+        self._pending = ""
+
+
+    def feed(self, text: str) -> List[str]:
+        """Adds text. Returns the sentences it completes."""
+        self._pending += text
+        sentences = []
+        while True:
+            m = SENTENCE_END.search(self._pending)
+            if m is not None and m.start() < self.max_chars:
+                end = m.end()
+            elif len(self._pending) > self.max_chars:
+                end = self._pending.rfind(' ', 0, self.max_chars) + 1 or self.max_chars
+            else:
+                break
+
+            sentence = self._pending[:end].strip()
+            self._pending = self._pending[end:]
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+
+    def flush(self) -> str:
+        """Whatever's left, once there's no more text to come."""
+        rest = self._pending.strip()
+        self._pending = ""
+        return rest
+
+
+def pcm_from_linear16(audio_content: bytes) -> bytes:
+    """Google returns LINEAR16 audio with a WAV header. Played as PCM, it clicks."""
+    if audio_content[:4] != b'RIFF':
+        return audio_content
+    with wave.open(io.BytesIO(audio_content)) as w:
+        return w.readframes(w.getnframes())
+
+
+class Utterance:
+    """Text that's being spoken. feed() it text, then end() it."""
+    def __init__(self):
+        self._splitter = SentenceSplitter()
+        self._sentences = queue.Queue()
+        self.is_ended = False
+
+
+    def feed(self, text: str) -> None:
+        assert(not self.is_ended)
+        for sentence in self._splitter.feed(text):
+            self._sentences.put(sentence)
+
+
+    def end(self) -> None:
+        if self.is_ended:
+            return
+        rest = self._splitter.flush()
+        if rest:
+            self._sentences.put(rest)
+        self._sentences.put(_END_OF_UTTERANCE)
+        self.is_ended = True
 
 
 class VoiceOut:
     N_SAMPLES_PER_SECOND = 44_100
     N_BYTES_PER_SAMPLE = 2
     N_CHANNELS = 1
+    N_FRAMES_PER_BUFFER = 1024      # ~23 ms. Each output callback plays exactly this much.
 
     _lock = threading.Lock()
     _current_speaker = None
@@ -19,10 +115,14 @@ class VoiceOut:
     def get_current_speaker(cls):
         with VoiceOut._lock:
             return VoiceOut._current_speaker
-        
 
-    def __init__(self, on_speech_done=[]):
-        self.client = texttospeech.TextToSpeechClient()
+
+    def __init__(self, on_speech_done=[], client=None, cache: Optional[TTSCache] = None):
+        """on_speech_done callbacks are called, on the worker thread, after each utterance
+        has been played. client is a TextToSpeechClient, or None for the default one.
+        cache, if given, is only used by the worker thread."""
+        self.client = client if client is not None else texttospeech.TextToSpeechClient()
+        self.cache = cache
         self.voice = texttospeech.VoiceSelectionParams(language_code='en-GB', name='en-GB-Neural2-D')
         self.audio_config = texttospeech.AudioConfig(
             audio_encoding=texttospeech.AudioEncoding.LINEAR16,
@@ -31,14 +131,40 @@ class VoiceOut:
             volume_gain_db=0.0,
             sample_rate_hertz=VoiceOut.N_SAMPLES_PER_SECOND,
             effects_profile_id=['headphone-class-device'])
-        
-        self._current_text = None
-        self._current_audio = None
-        self._current_byte_offset = None
+
+        # Utterances, in the order they were begun, for the worker to synthesize.
+        self._utterances = queue.Queue()
+
+        # Synthesized PCM, cut into blocks of exactly one output buffer each, and
+        # _END_OF_UTTERANCE markers, for the output callback. The worker appends, and the
+        # callback pops. PyAudio only takes bytes back from the callback, so the worker
+        # does all of the slicing, once per sentence, and the callback just hands blocks
+        # over.
+        self._blocks = deque()
+        self._block_bytes = VoiceOut.N_FRAMES_PER_BUFFER * VoiceOut.N_BYTES_PER_SAMPLE * VoiceOut.N_CHANNELS
+        self._silence = bytes(self._block_bytes)
+
+        # Utterances ever begun, and played. Only the main thread changes the first, and
+        # only the output callback the second, so neither needs a lock.
+        self._n_utterances_begun = 0
+        self._n_utterances_played = 0
+        self._n_utterances_reported = 0
+        self._playback_complete = threading.Event()
+
+        # Output callback stats. An underrun is a buffer of silence played because the next
+        # sentence wasn't ready. An output underflow is PortAudio telling us it ran dry,
+        # because a callback came back too late: an audible glitch.
+        self.n_callbacks = 0
+        self.n_underruns = 0
+        self.n_output_underflows = 0
 
         self.stream = None
         self._on_done = on_speech_done
 
+        self._stop_worker = threading.Event()
+        self._worker = threading.Thread(target=self._run_worker, name="VoiceOut", daemon=True)
+        self._worker.start()
+
 
     def grab_conch(self):
         logging.debug(f'ENTER VoiceOut.grab_conch')
@@ -61,72 +187,147 @@ class VoiceOut:
         self.stream = None
 
 
-    def say(self, text):
+    def say(self, text) -> Utterance:
         logging.debug(f'ENTER VoiceOut.say: """{text}"""')
-        self.grab_conch()
+        utterance = self.begin()
+        utterance.feed(text)
+        utterance.end()
+        logging.debug(f'EXIT VoiceOut.say')  # Demonstrate it's not blocking on synthesis or audio output
+        return utterance
 
-        self._current_text = text
 
-        # @todo this *is* a blocking call to get text -> audio
-        # consider processing smaller amounts of text at a time.
-        
-        synthesis_input = texttospeech.SynthesisInput(text=text)
-        response = self.client.synthesize_speech(input=synthesis_input, voice=self.voice, audio_config=self.audio_config)
+    def begin(self) -> Utterance:
+        utterance = Utterance()
+        self._n_utterances_begun += 1
+        self._utterances.put(utterance)
+        return utterance
 
-        audio_bytes = response.audio_content
-        logging.debug(f'audio_data: {len(audio_bytes)} bytes')
 
-        audio = pydub.AudioSegment(data=audio_bytes, 
-                                   sample_width=VoiceOut.N_BYTES_PER_SAMPLE, 
-                                   frame_rate=VoiceOut.N_SAMPLES_PER_SECOND, 
-                                   channels=VoiceOut.N_CHANNELS)
-        self._current_audio = audio
-        self._current_byte_offset = 0
+    def get_stats(self) -> dict:
+        return {
+            "n_callbacks": self.n_callbacks,
+            "n_underruns": self.n_underruns,
+            "n_output_underflows": self.n_output_underflows,
+        }
 
-        # We want to output what might be some long audio, but to do it without blocking our
-        # thread. So, we use a callback.
 
-        self.stream = AudioService.get_voice_output_stream(VoiceOut._stream_callback)
+    def close(self):
+        self._stop_worker.set()
+        self._worker.join()
+        if self.stream is not None:
+            self.drop_conch()
 
-        logging.debug(f'EXIT VoiceOut.say')  # Demonstrate it's not blocking on audio output
 
-    
-    # @note that this is called from/in a different thread
-    # Do not call logging or print from this function! It's time-critical!
+    def _run_worker(self):
+        utterance = None
+        while not self._stop_worker.is_set():
+            self._reap_playback()
+            try:
+                if utterance is None:
+                    utterance = self._utterances.get(timeout=WORKER_POLL_SECONDS)
+                item = utterance._sentences.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+            if item is _END_OF_UTTERANCE:
+                utterance = None
+                blocks = [_END_OF_UTTERANCE]
+            else:
+                blocks = self._blocks_for(item)
+
+            # A stream that's finished playing can't be restarted. Close it first.
+            self._reap_playback()
+            self._blocks.extend(blocks)
+            if self.stream is None:
+                self.grab_conch()
+                self.stream = AudioService.get_voice_output_stream(self._stream_callback,
+                                                                   frames_per_buffer=VoiceOut.N_FRAMES_PER_BUFFER)
+
+
+    def _blocks_for(self, text) -> List[bytes]:
+        key = None
+        if self.cache is not None and len(text) <= CACHE_MAX_TEXT_CHARS:
+            key = TTSCache.key(text, self.voice.name, self.audio_config.speaking_rate,
+                               self.audio_config.pitch, self.audio_config.sample_rate_hertz)
+            mapped = self.cache.get(key)
+            if mapped is not None:
+                with mapped:
+                    return self._cut_into_blocks(mapped)
 
-    @staticmethod
-    def _stream_callback(in_data, frame_count, time_info, status_flags):
-        # Log entry to _stream_callback, and thread id
-        # logging.debug(f'ENTER VoiceOut._stream_callback tid={threading.current_thread().ident}')
+        pcm = self._synthesize(text)
+        if key is not None:
+            self.cache.put(key, pcm)
+        return self._cut_into_blocks(pcm)
 
-        vo = VoiceOut.get_current_speaker()
-        audio = vo._current_audio
-        i = vo._current_byte_offset
 
-        n_bytes_requested = frame_count * VoiceOut.N_BYTES_PER_SAMPLE * VoiceOut.N_CHANNELS
-        assert(n_bytes_requested >= 0)
+    def _cut_into_blocks(self, pcm) -> List[bytes]:
+        # The last block is padded with silence: a pause of under one buffer between
+        # sentences.
+        with memoryview(pcm) as view:
+            blocks = [bytes(view[i:i + self._block_bytes]) for i in range(0, len(view), self._block_bytes)]
+        if blocks and len(blocks[-1]) < self._block_bytes:
+            blocks[-1] += self._silence[len(blocks[-1]):]
+        return blocks
 
-        n_bytes_remaining = max(0, len(audio.raw_data) - i)
-        is_last = n_bytes_remaining <= n_bytes_requested
 
-        n_bytes_to_send = min(n_bytes_requested, n_bytes_remaining)
+    def _synthesize(self, text) -> bytes:
+        synthesis_input = texttospeech.SynthesisInput(text=text)
+        try:
+            response = self.client.synthesize_speech(input=synthesis_input, voice=self.voice, audio_config=self.audio_config)
+        except Exception as e:
+            # Skip the sentence, rather than stop talking.
+            logging.error(f'VoiceOut: could not synthesize """{text}""": {e}')
+            return b""
+
+        pcm = pcm_from_linear16(response.audio_content)
+        logging.debug(f'VoiceOut: synthesized {len(pcm)} bytes for """{text}"""')
+        return pcm
 
-        audio_bytes = audio.raw_data[i:i + n_bytes_to_send]
-        i += n_bytes_to_send
-        vo._current_byte_offset = i
 
-        # logging.debug(f'n_bytes_requested: {n_bytes_requested}, n_bytes_remaining: {n_bytes_remaining}, n_bytes_to_send: {n_bytes_to_send}, is_last: {is_last} audio_bytes: {len(audio_bytes)} bytes')
-        if is_last:
-            return_code = pyaudio.paComplete
-            if n_bytes_remaining == 0:
-                audio_bytes = None
+    def _reap_playback(self):
+        if self._playback_complete.is_set():
+            self._playback_complete.clear()
+            self.drop_conch()
+            logging.debug(f'VoiceOut: playback complete. {self.get_stats()}')
 
-            # logging.debug('OUTPUT STREAMING AUDIO DONE')
-            vo.drop_conch()
-            for callback in vo._on_done:
+        while self._n_utterances_reported < self._n_utterances_played:
+            self._n_utterances_reported += 1
+            for callback in self._on_done:
                 callback()
-        else:
-            return_code = pyaudio.paContinue
 
-        # logging.debug(f'EXIT VoiceOut._stream_callback')
-        return (audio_bytes, return_code)
+
+    # @note that this is called from/in a different thread
+    # Do not call logging or print from this function! It's time-critical!
+    # Nor allocate, nor take locks. PortAudio asked for N_FRAMES_PER_BUFFER frames, so
+    # frame_count is always one block's worth.
+
+    def _stream_callback(self, in_data, frame_count, time_info, status_flags):
+        self.n_callbacks += 1
+        if status_flags & pyaudio.paOutputUnderflow:
+            self.n_output_underflows += 1
+
+        blocks = self._blocks
+        block = None
+        while blocks and block is None:
+            block = blocks.popleft()
+            if block is _END_OF_UTTERANCE:
+                self._n_utterances_played += 1
+                block = None
+
+        # Notice an utterance ending as its last block goes out, so that the stream can
+        # complete on that block, rather than with a buffer of silence after it.
+        while blocks and blocks[0] is _END_OF_UTTERANCE:
+            blocks.popleft()
+            self._n_utterances_played += 1
+
+        if self._n_utterances_played == self._n_utterances_begun and not blocks:
+            # Everything's been said. The worker closes the stream.
+            self._playback_complete.set()
+            return (block, pyaudio.paComplete)
+
+        if block is None:
+            # The next sentence is still being synthesized, or hasn't been fed in yet.
+            self.n_underruns += 1
+            return (self._silence, pyaudio.paContinue)
+
+        return (block, pyaudio.paContinue)
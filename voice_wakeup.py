@@ -1,38 +1,58 @@
+from collections import deque
 import logging
+import numpy as np
 import os
 import platform
 import pvporcupine
 import pyaudio
-from queue import Empty, Queue
-import struct
+from queue import Empty, Full, Queue
+import threading
+import time
 from audio_service import AudioService
 
 
-def bytes_to_ints(byte_data):
-    """Convert a byte array into a list of integers. Each integer is two bytes. Endeaness is unspecified."""
-    return struct.unpack(str(len(byte_data) // 2) + 'h', byte_data)
+WAKEWORD_QUEUE_FRAMES = 64      # ~2 s of 512-sample frames at 16 kHz. Older frames are dropped beyond this.
+WORKER_WAIT_SECONDS = 0.1       # How often the idle worker checks whether it should stop
+LAG_HISTORY_COUNT = 200         # Frames' capture-to-processed lags kept for get_stats()
 
 
 class PhraseListener:
+    """Listens for the wake phrase, with Picovoice Porcupine.
+
+    PyAudio's callback queues each frame of microphone audio as it arrives. A worker
+    thread drains the queue at audio rate, however fast the GUI is running, and runs
+    Porcupine over every frame. update(), on the GUI thread, only has to report a
+    detection. If the worker ever falls WAKEWORD_QUEUE_FRAMES behind, the oldest frames
+    are dropped, and counted, so that the lag stays bounded."""
 
     def __init__(self, detected_callback: callable = None):
         logging.debug('PhraseListener.__init__()')
         self._on_detected_callback = detected_callback
 
         self._pv_handle = None
+        self._in_stream = None
+        self._worker = None
+        self._stop_worker = threading.Event()
+
+        # (frame bytes, capture time) tuples, from the audio callback to the worker.
+        self._audio_q = Queue(maxsize=WAKEWORD_QUEUE_FRAMES)
+
+        # Only the audio callback changes n_dropped_frames, and only the worker the rest,
+        # so none of them needs a lock.
+        self.n_dropped_frames = 0
+        self.n_frames = 0
+        self.lags = deque(maxlen=LAG_HISTORY_COUNT)
+        self._n_detections = 0
+        self._n_detections_reported = 0
 
         PICOVOICE_ACCESS_KEY = os.getenv("PICOVOICE_ACCESS_KEY")
         if not PICOVOICE_ACCESS_KEY:
             logging.error("PICOVOICE_ACCESS_KEY is not set. Cannot enable voice input. Either set the environment variable, or disable voice input.")
             raise Exception("PICOVOICE_ACCESS_KEY is not set. Cannot enable voice input. Either set the environment variable, or disable voice input.")
 
-    
+
     def start(self):
         logging.debug('PhraseListener.start()')
-        self._in_stream = None
-
-        # @todo @bug what about multiple instance?
-        PhraseListener._audio_q = None
 
         keyword_paths = {"macOS": "./res/wake-phrases/Yar-assistant_en_mac_v2_2_0/Yar-assistant_en_mac_v2_2_0.ppn",
                 "RaspberryPi": "./res/wake-phrases/Yarr-Assistant_en_raspberry_pi_v3_0_0/Yarr-Assistant_en_raspberry_pi_v3_0_0.ppn",
@@ -53,43 +73,91 @@ class PhraseListener:
         logging.debug(f"PicoVoice expected sample rate (Hz): {self._pv_handle.sample_rate}")
         logging.debug(f"PicoVoice expected frame length: {self._pv_handle.frame_length}")
 
-        PhraseListener._audio_q = Queue()
+        self._start_worker()
+        self._in_stream = AudioService.get_wakeword_input_stream(self._audio_input_stream_callback)
 
-        self._in_stream = AudioService.get_wakeword_input_stream(PhraseListener._audio_input_stream_callback)
 
+    def _start_worker(self):
+        self._stop_worker.clear()
+        self._worker = threading.Thread(target=self._run_worker, name="PhraseListener", daemon=True)
+        self._worker.start()
 
-    def update(self):
-        # logging.debug('PhraseListener.update()')
-        if self._in_stream is None:
-            return
-        
-        try:
-            audio_ints = PhraseListener._audio_q.get_nowait()
-        except Empty:
-            return
-
-        # logging.debug(f"PhraseListener.update() audio_ints: {len(audio_ints)}")
 
-        i_keyword = self._pv_handle.process(audio_ints)
-        if i_keyword >= 0:
-            logging.info('Detected wakeup phrase.')
+    def update(self):
+        # The callback may well stop us, so call it on the GUI thread, and only once, however
+        # many frames the phrase was heard in.
+        n_detections = self._n_detections
+        if n_detections > self._n_detections_reported:
+            self._n_detections_reported = n_detections
             if self._on_detected_callback is not None:
                 self._on_detected_callback()
 
 
     def stop(self):
         logging.debug('PhraseListener.stop()')
-        self._in_stream.stop_stream()
-        self._in_stream.close()
-        self._in_stream = None
-        PhraseListener._audio_q = None
+        if self._in_stream is not None:
+            self._in_stream.stop_stream()
+            self._in_stream.close()
+            self._in_stream = None
+
+        # The worker must be done with Porcupine before it's deleted.
+        self._stop_worker.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        logging.info(f'PhraseListener stats: {self.get_stats()}')
+
+        if self._pv_handle is not None:
+            self._pv_handle.delete()
+            self._pv_handle = None
+
+
+    def get_stats(self) -> dict:
+        lags = sorted(self.lags)
+        def lag_ms(p):
+            return 1000 * lags[min(len(lags) - 1, int(p / 100.0 * len(lags)))] if lags else None
+        return {
+            "n_frames": self.n_frames,
+            "n_dropped_frames": self.n_dropped_frames,
+            "queue_depth": self._audio_q.qsize(),
+            "lag_p50_ms": lag_ms(50),
+            "lag_p95_ms": lag_ms(95),
+            "lag_max_ms": 1000 * lags[-1] if lags else None,
+        }
 
-        self._pv_handle.delete()
-        self._pv_handle = None
 
+    def _run_worker(self):
+        while not self._stop_worker.is_set():
+            try:
+                in_data, t_captured = self._audio_q.get(timeout=WORKER_WAIT_SECONDS)
+            except Empty:
+                continue
 
-    @staticmethod
-    def _audio_input_stream_callback(in_data, frame_count, time_info, status_flags):
-        audio_ints = bytes_to_ints(in_data)
-        PhraseListener._audio_q.put(audio_ints)
+            i_keyword = self._pv_handle.process(np.frombuffer(in_data, dtype=np.int16))
+            self.n_frames += 1
+            self.lags.append(time.perf_counter() - t_captured)
+            if i_keyword >= 0:
+                logging.info('Detected wakeup phrase.')
+                self._n_detections += 1
+
+
+    # @note that this is called from/in a different thread
+    # Do not call logging or print from this function! It's time-critical!
+
+    def _audio_input_stream_callback(self, in_data, frame_count, time_info, status_flags):
+        item = (in_data, time.perf_counter())
+        try:
+            self._audio_q.put_nowait(item)
+        except Full:
+            # The worker has fallen behind. Drop the oldest frame, so that what it does
+            # hear is as recent as possible.
+            try:
+                self._audio_q.get_nowait()
+                self.n_dropped_frames += 1
+            except Empty:
+                pass
+            try:
+                self._audio_q.put_nowait(item)
+            except Full:
+                self.n_dropped_frames += 1
         return (None, pyaudio.paContinue)
@@ -0,0 +1,164 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streaming reader for workspace files.
+
+json.load() needs the whole document as one string, and builds every value before
+returning any. JSONStreamReader walks objects and arrays a key or an item at a time,
+reading the file in chunks, so the caller can deal with each top-level control as soon
+as it's decoded. Only the value currently being decoded is held as text."""
+
+import json
+from typing import Any, Callable, Iterator, TextIO
+
+
+READ_CHUNK_CHARS = 64 * 1024
+_WHITESPACE = ' \t\r\n'
+
+
+class JSONStreamReader:
+    def __init__(self, f: TextIO, chunk_chars: int = READ_CHUNK_CHARS):
+        self._f = f
+        self._chunk_chars = chunk_chars
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+
+    def _fill(self) -> bool:
+        """Read more of the file. Reads at least as much as is already buffered, so a
+        large value is re-decoded only O(log n) times. Returns False at end of file."""
+        if self._eof:
+            return False
+
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+
+        chunk = self._f.read(max(self._chunk_chars, len(self._buf)))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf += chunk
+        return True
+
+
+    def peek(self) -> str:
+        """The next non-whitespace character, without consuming it. '' at end of file."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+
+    def expect(self, ch: str) -> None:
+        got = self.peek()
+        if got != ch:
+            raise ValueError(f'JSONStreamReader: expected {ch!r} but got {got!r}')
+        self._pos += 1
+
+
+    def read_value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Probably cut off at the end of the buffer. If not, we'll raise at EOF.
+                if not self._fill():
+                    raise
+                continue
+
+            # A number at the very end of the buffer may carry on in the next chunk.
+            if end == len(self._buf) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+
+    def iter_object(self) -> Iterator[str]:
+        """Yields the keys of the next JSON object. The caller must consume each key's
+        value (with read_value() or another iter_*()) before asking for the next key."""
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+
+            if self.peek() == ',':
+                self._pos += 1
+                continue
+            self.expect('}')
+            return
+
+
+    def iter_array(self) -> Iterator[int]:
+        """Yields the indices of the next JSON array. The caller must consume each item
+        before asking for the next one."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+
+        i = 0
+        while True:
+            yield i
+            i += 1
+
+            if self.peek() == ',':
+                self._pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def read_workspace(f: TextIO, on_content_child: Callable[[dict], None]) -> dict:
+    """Read a workspace file saved by GUI.save(). Each child of gui.content is passed to
+    on_content_child() as soon as it's decoded, instead of being kept in the result.
+    Returns everything else, with gui.content.children left empty."""
+    reader = JSONStreamReader(f)
+
+    workspace = {}
+    for key in reader.iter_object():
+        if key != "gui":
+            workspace[key] = reader.read_value()
+            continue
+
+        gui_json = workspace[key] = {}
+        for gui_key in reader.iter_object():
+            if gui_key != "content":
+                gui_json[gui_key] = reader.read_value()
+                continue
+
+            content_json = gui_json[gui_key] = {"children": []}
+            for content_key in reader.iter_object():
+                if content_key != "children":
+                    content_json[content_key] = reader.read_value()
+                    continue
+
+                for _ in reader.iter_array():
+                    child_json = reader.read_value()
+                    if child_json is not None:
+                        on_content_child(child_json)
+
+    return workspace
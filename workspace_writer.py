@@ -0,0 +1,214 @@
+# Copyright 2023-2024 Jabavu W. Adams
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Background, atomic saving of workspace files.
+
+The UI thread hands WorkspaceSaver a snapshot of the workspace: the plain dicts, lists
+and strings that the controls' __json__() methods return. The agent's memories and
+percepts are snapshotted and saved the same way. A worker thread turns it
+into text and writes it to a temporary file next to the workspace, which then replaces
+the workspace with os.replace(). A crash mid-save leaves the old file intact. The old
+file is kept as a numbered backup, and only the newest few backups are kept."""
+
+from collections import deque
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from config import WORKSPACE_MAX_BACKUPS
+
+
+SAVE_STATS_WINDOW = 100     # Save durations kept for get_stats()
+
+# Top-level keys that change on every save, and so don't count when deciding whether
+# anything has changed since the last one.
+_TIMESTAMP_KEYS = ("saved_at_utc", "saved_at_local")
+
+
+def _numbered_backups(path: str) -> "list[tuple[int, str]]":
+    dir_name = os.path.dirname(os.path.abspath(path))
+    name, ext = os.path.splitext(os.path.basename(path))
+    pattern = re.compile(re.escape(name) + r'_(\d+)' + re.escape(ext) + '$')
+
+    numbered = []
+    for entry in os.listdir(dir_name):
+        m = pattern.match(entry)
+        if m:
+            numbered.append((int(m.group(1)), os.path.join(dir_name, entry)))
+    return sorted(numbered)
+
+
+def backup_filenames(path: str) -> "list[str]":
+    """Existing backups of path, oldest first. Named like utils.unique_filename() names
+    them: workspace_1.json, workspace_2.json, ..."""
+    return [p for _, p in _numbered_backups(path)]
+
+
+def back_up(path: str, max_backups: int = WORKSPACE_MAX_BACKUPS) -> Optional[str]:
+    """Keep a copy of path as its next numbered backup, then delete the oldest backups
+    beyond max_backups. Returns the new backup's filename."""
+    existing = _numbered_backups(path)
+    next_number = existing[-1][0] + 1 if existing else 1
+
+    name, ext = os.path.splitext(os.path.abspath(path))
+    backup = f"{name}_{next_number}{ext}"
+    try:
+        # The file is about to be replaced, not changed, so a hard link is a free copy.
+        os.link(path, backup)
+    except OSError:
+        shutil.copy2(path, backup)
+
+    backups = [p for _, p in existing] + [backup]
+    for old in backups[:max(0, len(backups) - max_backups)]:
+        logging.info(f'Deleting old workspace backup "{old}"')
+        os.remove(old)
+    return backup
+
+
+def write_atomically(path: str, text: str, max_backups: int = WORKSPACE_MAX_BACKUPS) -> None:
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=dir_name)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+            if max_backups > 0:
+                back_up(path, max_backups)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class WorkspaceSaver:
+    """Writes workspace snapshots on a worker thread, in the order they were submitted.
+    If saves to a file come in faster than they can be written, only the latest waiting
+    snapshot of that file is written."""
+
+    def __init__(self, max_backups: int = WORKSPACE_MAX_BACKUPS, json_encoder=None):
+        self.max_backups = max_backups
+        self._json_encoder = json_encoder
+
+        self._cond = threading.Condition()
+        self._pending = {}      # path -> (snapshot, skip_if_unchanged, t_submitted)
+        self._busy = False
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        self._last_written = {} # path -> snapshot, without timestamps
+
+        self.n_saves = 0
+        self.n_skipped_unchanged = 0
+        self.n_superseded = 0
+        self.last_error: Optional[Exception] = None
+        self.save_durations = deque(maxlen=SAVE_STATS_WINDOW)  # Submit to written, seconds
+
+
+    def submit(self, path: str, snapshot, skip_if_unchanged: bool = False) -> None:
+        """Queue snapshot to be written to path. Don't hold on to or change snapshot
+        afterwards: the worker thread reads it. snapshot is a dict or a list."""
+        with self._cond:
+            if path in self._pending:
+                self.n_superseded += 1
+            self._pending[path] = (snapshot, skip_if_unchanged, time.perf_counter())
+
+            if self._thread is None:
+                self._closing = False
+                self._thread = threading.Thread(target=self._run, name="WorkspaceSaver", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything submitted so far has been written. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+
+    def close(self) -> None:
+        """Finish writing anything pending, then stop the worker thread."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            self._thread = None
+
+
+    def get_stats(self) -> dict:
+        durations = sorted(self.save_durations)
+        return {
+            "n_saves": self.n_saves,
+            "n_skipped_unchanged": self.n_skipped_unchanged,
+            "n_superseded": self.n_superseded,
+            "last_s": self.save_durations[-1] if durations else None,
+            "p50_s": durations[len(durations) // 2] if durations else None,
+            "max_s": durations[-1] if durations else None,
+        }
+
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closing)
+                if not self._pending:
+                    return
+                path = next(iter(self._pending))
+                snapshot, skip_if_unchanged, t_submitted = self._pending.pop(path)
+                self._busy = True
+
+            try:
+                self._save(path, snapshot, skip_if_unchanged, t_submitted)
+            except Exception as e:
+                self.last_error = e
+                logging.exception(f'WorkspaceSaver: failed to save "{path}"')
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+    def _save(self, path: str, snapshot, skip_if_unchanged: bool, t_submitted: float) -> None:
+        contents = snapshot
+        if isinstance(snapshot, dict):
+            contents = {k: v for k, v in snapshot.items() if k not in _TIMESTAMP_KEYS}
+        if skip_if_unchanged and self._last_written.get(path) == contents:
+            self.n_skipped_unchanged += 1
+            return
+
+        t_start = time.perf_counter()
+        text = json.dumps(snapshot, indent=2, cls=self._json_encoder)
+        t_serialized = time.perf_counter()
+        write_atomically(path, text, self.max_backups)
+        t_written = time.perf_counter()
+
+        self._last_written[path] = contents
+        self.n_saves += 1
+        self.save_durations.append(t_written - t_submitted)
+        logging.info(f'WorkspaceSaver: saved "{path}" ({len(text)} chars). '
+                     f'Queued {1000 * (t_start - t_submitted):.1f} ms, '
+                     f'serialized {1000 * (t_serialized - t_start):.1f} ms, '
+                     f'wrote {1000 * (t_written - t_serialized):.1f} ms')